@@ -0,0 +1,165 @@
+"""
+Admission control for background jobs.
+
+Workers already bound how many jobs run at once (WHISPER_WORKERS processes for
+CPU-bound transcription, LLM_WORKERS threads for LLM calls). This module bounds
+how much work can pile up behind them. A submission is refused with 429 when:
+
+- its queue already holds its limit of waiting jobs (WHISPER_QUEUE_LIMIT,
+  LLM_QUEUE_LIMIT), or
+- its client already has CLIENT_MAX_ACTIVE_JOBS unfinished jobs.
+
+The response carries Retry-After and an estimate of the queueing delay.
+Accepted jobs get a priority class from their size, so short clips are
+transcribed ahead of long videos.
+"""
+import hmac
+import math
+import time
+
+from flask import jsonify
+
+import job_queue
+import metrics
+from cloud_log import cloud_logger
+from config import (
+    WHISPER_QUEUE_LIMIT, LLM_QUEUE_LIMIT, WHISPER_WORKERS, LLM_WORKERS, CLIENT_MAX_ACTIVE_JOBS, CLIENT_KEYS,
+    PRIORITY_SHORT_MEDIA_BYTES, PRIORITY_LONG_MEDIA_BYTES,
+)
+from redis_store import get_redis
+
+QUEUE_LIMITS = {job_queue.QUEUE_WHISPER: WHISPER_QUEUE_LIMIT, job_queue.QUEUE_LLM: LLM_QUEUE_LIMIT}
+QUEUE_WORKERS = {job_queue.QUEUE_WHISPER: WHISPER_WORKERS, job_queue.QUEUE_LLM: LLM_WORKERS}
+# Quota entries for jobs that never reached complete() or fail() stop counting after this long
+STALE_CLIENT_JOB_SECONDS = 6 * 3600
+
+REASON_QUEUE_FULL = "queue_full"
+REASON_CLIENT_QUOTA = "client_quota"
+
+# Check the queue limit and the client's quota and take a quota slot in one step.
+# KEYS: client's job set, then the queue's pending lists.
+# ARGV: job id, now, stale cutoff, quota, queue limit, set TTL.
+# Returns {0 admitted | 1 queue full | 2 over quota, queue depth}.
+_RESERVE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+local depth = 0
+for i = 2, #KEYS do
+    depth = depth + redis.call('LLEN', KEYS[i])
+end
+if tonumber(ARGV[5]) > 0 and depth >= tonumber(ARGV[5]) then
+    return {1, depth}
+end
+if tonumber(ARGV[4]) > 0 and redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[4]) then
+    return {2, depth}
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+return {0, depth}
+"""
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, message, retry_after, estimated_wait):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.estimated_wait = estimated_wait
+
+
+def client_id(request):
+    """
+    Who a submission counts against: the X-Client-ID header when X-Client-Key
+    carries that client's key from CLIENT_KEYS, else the caller's IP.
+    remote_addr comes from X-Forwarded-For only for the TRUSTED_PROXIES hops
+    app.py's ProxyFix accepts, so neither header can be forged to dodge the quota.
+    """
+    client = (request.headers.get("X-Client-ID") or "").strip()
+    expected = CLIENT_KEYS.get(client)
+    if expected and hmac.compare_digest(request.headers.get("X-Client-Key", "").encode(), expected.encode()):
+        return f"key:{client}"
+    return request.remote_addr or "unknown"
+
+
+def priority_for_size(size_bytes):
+    if size_bytes is None:
+        return job_queue.PRIORITY_NORMAL
+    if size_bytes <= PRIORITY_SHORT_MEDIA_BYTES:
+        return job_queue.PRIORITY_HIGH
+    if size_bytes >= PRIORITY_LONG_MEDIA_BYTES:
+        return job_queue.PRIORITY_LOW
+    return job_queue.PRIORITY_NORMAL
+
+
+def _workers(queue):
+    return max(1, QUEUE_WORKERS[queue])
+
+
+def estimated_wait(queue=job_queue.QUEUE_WHISPER, priority=job_queue.PRIORITY_NORMAL):
+    """
+    Seconds before a job submitted now would start on `queue`: the jobs of equal
+    or higher priority ahead of it, plus the running ones, drained `workers` at
+    a time at the queue's average job duration.
+    """
+    ahead_classes = job_queue.PRIORITIES[:job_queue.PRIORITIES.index(priority) + 1]
+    ahead = job_queue.queue_depth(queue, ahead_classes) + job_queue.running_count(queue)
+    waves = max(0, ahead - _workers(queue) + 1) / _workers(queue)
+    return round(waves * job_queue.average_duration(queue), 1)
+
+
+def _reject(reason, message, retry_after, priority):
+    metrics.inc("admission_total", outcome=reason, priority=priority)
+    cloud_logger.warning(f"[ADMISSION] Rejected job ({reason}): {message}")
+    return AdmissionRejected(
+        reason, message, max(1, math.ceil(retry_after)),
+        estimated_wait(job_queue.QUEUE_WHISPER, priority),
+    )
+
+
+def admit(job_id, client, priority=job_queue.PRIORITY_NORMAL):
+    """
+    Reserve a place for a new transcription job, or raise AdmissionRejected.
+    Returns the estimated wait in seconds. Call release() if the job is then
+    not created.
+    """
+    queue = job_queue.QUEUE_WHISPER
+    # Every job moves on to the LLM queue, so a long LLM backlog refuses new work too
+    llm_depth = job_queue.queue_depth(job_queue.QUEUE_LLM)
+    if 0 < LLM_QUEUE_LIMIT <= llm_depth:
+        excess = llm_depth - LLM_QUEUE_LIMIT + 1
+        retry_after = excess * job_queue.average_duration(job_queue.QUEUE_LLM) / _workers(job_queue.QUEUE_LLM)
+        raise _reject(REASON_QUEUE_FULL, "The summarization queue is full; retry later", retry_after, priority)
+
+    now = time.time()
+    outcome, depth = get_redis().eval(
+        _RESERVE_SCRIPT, 1 + len(job_queue.PRIORITIES),
+        job_queue.client_jobs_key(client),
+        *[job_queue.pending_key(queue, p) for p in job_queue.PRIORITIES],
+        job_id, now, now - STALE_CLIENT_JOB_SECONDS, CLIENT_MAX_ACTIVE_JOBS, WHISPER_QUEUE_LIMIT,
+        STALE_CLIENT_JOB_SECONDS,
+    )
+    if outcome == 1:
+        retry_after = (depth - WHISPER_QUEUE_LIMIT + 1) * job_queue.average_duration(queue) / _workers(queue)
+        raise _reject(REASON_QUEUE_FULL, "The transcription queue is full; retry later", retry_after, priority)
+    if outcome == 2:
+        # Roughly when the client's oldest job will have gone through both stages
+        retry_after = job_queue.average_duration(queue) + job_queue.average_duration(job_queue.QUEUE_LLM)
+        message = f"Too many unfinished jobs for this client (limit {CLIENT_MAX_ACTIVE_JOBS})"
+        raise _reject(REASON_CLIENT_QUOTA, message, retry_after, priority)
+    metrics.inc("admission_total", outcome="admitted", priority=priority)
+    return estimated_wait(queue, priority)
+
+
+def release(job_id, client):
+    job_queue.release_client(job_id, client)
+
+
+def rejection_response(error):
+    response = jsonify({
+        "error": str(error),
+        "reason": error.reason,
+        "retry_after": error.retry_after,
+        "estimated_wait_seconds": error.estimated_wait,
+    })
+    response.status_code = 429
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
@@ -1,44 +1,43 @@
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import TranscriptsDisabled, VideoUnavailable
 import re
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import job_processor
-from summarize import summarize_text
-from transcriber import transcribe_with_whisper
-import subprocess
+import upload_sessions
+import job_queue
+import metrics
+from summarize import summary_engine, summary_version
+from mindmap_prefetch import summarize_with_mindmap
+from transcriber import transcribe_audio, transcribe_segments
+from audio_io import decode_ytdlp_audio_to_pcm
 import tempfile
 import os
-import whisper
-import yt_dlp
-from mindmap_generator import generate_mindmap_transformer, generate_mindmap_mistral, generate_mindmap_gemini
-import hashlib
+from mindmap_generator import MINDMAP_GENERATORS
 import json
-import redis
-from config import REDIS_URL
-import os
-from google.cloud import storage
-import logging
-import google.cloud.logging
-from google.cloud.logging.handlers import CloudLoggingHandler
-
-# Set up Google Cloud Logging
-client = google.cloud.logging.Client()
-handler = CloudLoggingHandler(client)
-cloud_logger = logging.getLogger("cloudLogger")
-cloud_logger.setLevel(logging.INFO)
-cloud_logger.addHandler(handler)
-
-cache_store = {}
-
-# Initialize Redis client for summary persistence
-redis_client = redis.from_url(REDIS_URL, decode_responses=True)
-
-
-# Rename Whisper model variable to whisper_model
-import torch
-device = "cuda" if torch.cuda.is_available() else "cpu"
-whisper_model = whisper.load_model("tiny", device=device)
+from redis_store import get_redis
+from config import MINDMAP_CACHE_TTL, MODEL_WARMUP, LIST_SUMMARIES_DEFAULT_LIMIT, LIST_SUMMARIES_MAX_LIMIT, BATCH_MAX_ITEMS, TRUSTED_PROXIES
+import summary_store
+from cache import get_cache, get_transcript, set_transcript, file_content_id, video_content_id, text_content_id, whisper_transcript_key, captions_transcript_key, summary_key, mindmap_key
+from batch import resolve_batch
+from singleflight import compute_once
+from structured_output import dumps
+import model_registry
+from uploads import get_upload, spool_stream
+from storage import get_bucket
+from youtube_ingest import ingest_video
+from cloud_log import cloud_logger, setup_cloud_logging
+
+# Heavy libraries (torch, whisper, transformers, yt_dlp, Google Cloud clients)
+# are imported on first use so the app starts serving quickly.
+setup_cloud_logging()
+
+# Initialize Redis client for summary persistence (connects on first command)
+redis_client = get_redis()
+
+
+# Whisper and T5 are loaded on first use by the shared model registry
+if MODEL_WARMUP:
+    model_registry.warmup(MODEL_WARMUP)
 
 # Add Zephyr model and tokenizer initialization
 # from transformers import AutoModelForCausalLM, AutoTokenizer
@@ -49,28 +48,116 @@ whisper_model = whisper.load_model("tiny", device=device)
 
 
 app = Flask(__name__)
-# Google Cloud Storage setup
-GCS_BUCKET = os.environ['GCS_BUCKET_NAME']
-storage_client = storage.Client()
-bucket = storage_client.bucket(GCS_BUCKET)
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor"])
+if TRUSTED_PROXIES:
+    # Take the client IP from the entries our own proxies appended to X-Forwarded-For
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+metrics.init_app(app)
+metrics.start_flusher()
+metrics.register_collector(
+    lambda: [
+        ("queue_depth", {"queue": queue, "priority": priority}, job_queue.queue_depth(queue, (priority,)))
+        for queue in job_queue.QUEUES for priority in job_queue.PRIORITIES
+    ]
+)
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """
+    Liveness: the process is up and serving requests.
+    """
+    return jsonify({"status": "ok"}), 200
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """
+    Readiness: Redis answers and any models listed in MODEL_WARMUP are loaded.
+    """
+    checks = {}
+    try:
+        checks["redis"] = bool(redis_client.ping())
+    except Exception as e:
+        cloud_logger.error(f"[READYZ] Redis ping failed: {e}")
+        checks["redis"] = False
+    for name in MODEL_WARMUP:
+        checks[f"model:{name}"] = model_registry.is_loaded(name)
+    ready = all(checks.values())
+    return jsonify({"status": "ready" if ready else "not ready", "checks": checks}), 200 if ready else 503
+
 
 @app.route("/summarize-text", methods=["POST"])
 def summarize():
     data = request.get_json()
     text = data.get("text", "").strip()
+    model_name = data.get("model_name", "gemini")
 
     cloud_logger.info(f"Received text: {text[:100]}")  # Debug log
     if not text:
         return jsonify({"error": "Empty input"}), 400
 
     try:
-        summary = summarize_text(text)
+        engine = summary_engine(model_name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cached_key = summary_key(text_content_id(text), engine, summary_version(engine))
+    cached_summary = get_cache().get(cached_key)
+    if cached_summary:
+        return jsonify({"summary": cached_summary})
+
+    body, status = summarize_text_uncached(text, model_name, cached_key)
+    return jsonify(body), status
+
+
+# Slow paths of the I/O-bound routes. Each returns (response body, status) so
+# the async server (asgi.py) can run it off its event loop after its own cache lookup.
+
+def summarize_text_uncached(text, model_name, cached_key):
+    try:
+        with metrics.stage("summarize"):
+            summary = summarize_with_mindmap(text, model_name)
         cloud_logger.info(f"Generated summary: {summary}")
-        return jsonify({"summary": summary})
+        get_cache().set(cached_key, summary)
+        return {"summary": summary}, 200
     except Exception as e:
         cloud_logger.error(f"Error: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
+
+
+@app.route("/summarize-text/batch", methods=["POST"])
+def summarize_text_batch():
+    """
+    Summarize several texts in one request.
+    Expects {"texts": [...], "model_name": optional} and returns
+    {"results": [{"summary": ...} or {"error": ...}, ...]} in input order.
+    """
+    data = request.get_json() or {}
+    texts = data.get("texts")
+    model_name = data.get("model_name", "gemini")
+    if not isinstance(texts, list) or not texts:
+        return jsonify({"error": "Expected a non-empty 'texts' list"}), 400
+    if len(texts) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} texts per batch"}), 400
+    try:
+        engine = summary_engine(model_name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    version = summary_version(engine)
+
+    valid = [i for i, text in enumerate(texts) if isinstance(text, str) and text.strip()]
+    resolved = resolve_batch(
+        [texts[i].strip() for i in valid],
+        key_fn=lambda text: summary_key(text_content_id(text), engine, version),
+        # Same function as /summarize-text, so both share cache entries (fused or not)
+        compute_fn=lambda text: summarize_with_mindmap(text, model_name),
+    )
+    results = [{"error": "Empty input"} for _ in texts]
+    for i, (summary, error) in zip(valid, resolved):
+        results[i] = {"error": error} if error else {"summary": summary}
+    cloud_logger.info(f"[DEBUG] Batch summarized {len(texts)} texts")
+    return jsonify({"results": results})
 
 
 # New route: /summarize-url
@@ -90,30 +177,53 @@ def summarize_url():
     video_id = match.group(1)
     cloud_logger.info(f"Extracted Video ID: {video_id}")  #  Debug log
 
+    cached_key = summary_key(video_content_id(video_id), "gemini", summary_version("gemini"))
+    cached_summary = get_cache().get(cached_key)
+    if cached_summary:
+        cloud_logger.info(f"✅ Returning cached summary for {video_id}.")
+        return jsonify({"summary": cached_summary})
+
+    body, status = summarize_url_uncached(video_id, cached_key)
+    return jsonify(body), status
+
+
+def summarize_url_uncached(video_id, cached_key):
+    content_id = video_content_id(video_id)
+    transcript = get_transcript(captions_transcript_key(content_id))
+    if transcript is None:
+        from youtube_transcript_api import YouTubeTranscriptApi
+        from youtube_transcript_api._errors import TranscriptsDisabled, VideoUnavailable
+        try:
+            with metrics.stage("fetch_captions"):
+                transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
+            transcript = {
+                "text": " ".join([entry["text"] for entry in transcript_list]),
+                "segments": [
+                    {"start": entry["start"], "end": entry["start"] + entry.get("duration", 0), "text": entry["text"]}
+                    for entry in transcript_list
+                ],
+            }
+        except VideoUnavailable:
+            return {"error": "Video unavailable"}, 404
+        except TranscriptsDisabled:
+            return {"error": "Transcript is disabled for this video"}, 403
+        except Exception as e:
+            return {"error": f"Transcript fetch failed: {str(e)}"}, 500
+        if transcript["text"].strip():
+            set_transcript(captions_transcript_key(content_id), transcript)
+
+    if len(transcript["text"].strip().split()) == 0:
+        return {"error": "Transcript is empty"}, 400
+
+    # The whole transcript is summarized; long ones are chunked by summarize_transcript_gemini
     try:
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-        full_text = " ".join([entry["text"] for entry in transcript_list])
-    except VideoUnavailable:
-        return jsonify({"error": "Video unavailable"}), 404
-    except TranscriptsDisabled:
-        return jsonify({"error": "Transcript is disabled for this video"}), 403
-    except Exception as e:
-        return jsonify({"error": f"Transcript fetch failed: {str(e)}"}), 500
-
-    if len(full_text.strip().split()) == 0:
-        return jsonify({"error": "Transcript is empty"}), 400
-
-    # Truncate and summarize using existing summarize_text function
-    if len(full_text.split()) > 400:
-        full_text = " ".join(full_text.split()[:400])
-        cloud_logger.info("Transcript truncated to 400 words")  #  Debug log
-
-    try:
-        summary = summarize_text(full_text)
-        return jsonify({"summary": summary})
+        with metrics.stage("summarize"):
+            summary = summarize_with_mindmap(transcript)
+        get_cache().set(cached_key, summary)
+        return {"summary": summary}, 200
     except Exception as e:
         cloud_logger.error(f"Summarization failed: {str(e)}")  #  Debug log
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
 @app.route("/summarize-url-whisper", methods=["POST"])
 def summarize_url_whisper():
@@ -123,100 +233,114 @@ def summarize_url_whisper():
     if not url:
         return jsonify({"error": "No URL provided"}), 400
 
-    cloud_logger.info(f"Downloading audio from URL: {url}")
+    # Results are shared with the other routes when the URL names a YouTube video
+    content_id = url_content_id(url)
+    cached_key = summary_key(content_id, "gemini", summary_version("gemini")) if content_id else None
+    if cached_key:
+        cached_summary = get_cache().get(cached_key)
+        if cached_summary:
+            cloud_logger.info("✅ Returning cached summary.")
+            return jsonify({"summary": cached_summary})
 
-    try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            output_template = os.path.join(tmpdir, "audio.%(ext)s")
-            final_audio_path = os.path.join(tmpdir, "audio.mp3")
-            cookie_path = "youtube_cookies.txt"
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'outtmpl': output_template,
-                'quiet': True,
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-            }
+    body, status = summarize_url_whisper_uncached(url, content_id, cached_key)
+    return jsonify(body), status
 
-            if os.path.exists(cookie_path):
-                cloud_logger.info("✅ Using cookiefile for authentication.")
-                ydl_opts['cookiefile'] = cookie_path
-            else:
-                cloud_logger.info("⚠️ No cookiefile found. Proceeding without cookies.")
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+def url_content_id(url):
+    match = re.search(r"(?:v=|youtu\.be/)([a-zA-Z0-9_-]{11})", url)
+    return video_content_id(match.group(1)) if match else None
 
-            cloud_logger.info("Audio downloaded, transcribing with Whisper...")
-            cloud_logger.info(f"Checking if file exists: {os.path.exists(final_audio_path)}")
-            result = whisper_model.transcribe(final_audio_path)
-            full_text = result["text"]
-            cloud_logger.info(f"Transcription complete. Word count: {len(full_text.split())}")
-    except Exception as e:
-        cloud_logger.error(f"Whisper transcription failed: {str(e)}")
-        return jsonify({"error": f"Whisper transcription failed: {str(e)}"}), 500
 
-    if len(full_text.split()) > 400:
-        full_text = " ".join(full_text.split()[:400])
-        cloud_logger.info("Transcript truncated to 400 words")  # 🔍 Debug log
+def summarize_url_whisper_uncached(url, content_id, cached_key):
+    transcript = get_transcript(whisper_transcript_key(content_id)) if content_id else None
+    if transcript is None:
+        try:
+            transcript = transcribe_url_audio(decode_url_audio(url))
+        except Exception as e:
+            cloud_logger.error(f"Whisper transcription failed: {str(e)}")
+            return {"error": f"Whisper transcription failed: {str(e)}"}, 500
+        if content_id:
+            set_transcript(whisper_transcript_key(content_id), transcript)
+    return summarize_whisper_transcript(transcript, cached_key)
+
 
+def summarize_whisper_transcript(transcript, cached_key):
     try:
-        summary = summarize_text(full_text)
-        return jsonify({"summary": summary})
+        with metrics.stage("summarize"):
+            summary = summarize_with_mindmap(transcript)
+        if cached_key:
+            get_cache().set(cached_key, summary)
+        return {"summary": summary}, 200
     except Exception as e:
         cloud_logger.error(f"Summarization failed: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
 
+def decode_url_audio(url):
+    """
+    Decode the smallest suitable audio-only stream of `url` straight into memory.
+    """
+    cloud_logger.info(f"Decoding audio from URL: {url}")
+    cookie_path = "youtube_cookies.txt"
+    if os.path.exists(cookie_path):
+        cloud_logger.info("✅ Using cookiefile for authentication.")
+    else:
+        cloud_logger.info("⚠️ No cookiefile found. Proceeding without cookies.")
+        cookie_path = None
+
+    audio, _ = decode_ytdlp_audio_to_pcm(url, cookiefile=cookie_path)
+    return audio
+
+
+def transcribe_url_audio(audio):
+    """
+    Transcribe audio from decode_url_audio with Whisper.
+    Returns {"text": ..., "segments": [...]}.
+    """
+    cloud_logger.info("Audio decoded, transcribing with Whisper...")
+    with metrics.stage("transcribe"):
+        transcript = transcribe_audio(audio)
+    cloud_logger.info(f"Transcription complete. Word count: {len(transcript['text'].split())}")
+    return transcript
 
 
 # New route: /summarize-upload
 @app.route("/summarize-upload", methods=["POST"])
 def summarize_upload():
-    if "file" not in request.files:
+    stream, filename = get_upload(request)
+    if stream is None:
         return jsonify({"error": "No file uploaded"}), 400
 
-    file = request.files["file"]
-    if file.filename == "":
+    if filename == "":
         return jsonify({"error": "Empty filename"}), 400
 
     try:
-        file_content = file.read()
-        file_hash = hashlib.md5(file_content).hexdigest()
-
-        if file_hash in cache_store:
-            cloud_logger.info("✅ Returning cached summary.")
-            return jsonify({"summary": cache_store[file_hash]})
-
-        file.seek(0)
-
         with tempfile.TemporaryDirectory() as tmpdir:
-            file_path = os.path.join(tmpdir, file.filename)
-            with open(file_path, "wb") as f:
-                f.write(file_content)
-
-            cloud_logger.info("Transcribing uploaded file with Whisper...")
-            import time
-            whisper_start = time.time()
-            full_text = transcribe_with_whisper(file_path)
-            whisper_duration = time.time() - whisper_start
-            cloud_logger.info(f"[TIMING] transcribe_with_whisper took {whisper_duration:.2f} seconds")
-            cloud_logger.info(f"Transcription complete. Word count: {len(full_text.split())}")
-
-            if len(full_text.split()) > 400:
-                full_text = " ".join(full_text.split()[:400])
-                cloud_logger.info("Transcript truncated to 400 words")
-
-            summarize_start = time.time()
-            summary = summarize_text(full_text)
-            summarize_duration = time.time() - summarize_start
-            cloud_logger.info(f"[TIMING] summarize_text took {summarize_duration:.2f} seconds")
-            cache_store[file_hash] = summary
-            cloud_logger.info(f"Sending summary response: {summary}")
-            return jsonify({"summary": summary})
+            file_path = os.path.join(tmpdir, os.path.basename(filename))
+            file_hash, file_size = spool_stream(stream, file_path)
+            cloud_logger.info(f"Spooled upload of {file_size} bytes")
+            content_id = file_content_id(file_hash)
+            cache = get_cache()
+            cached_key = summary_key(content_id, "gemini", summary_version("gemini"))
+
+            cached_summary = cache.get(cached_key)
+            if cached_summary:
+                cloud_logger.info("✅ Returning cached summary.")
+                return jsonify({"summary": cached_summary})
+
+            transcript = get_transcript(whisper_transcript_key(content_id))
+            if transcript is None:
+                cloud_logger.info("Transcribing uploaded file with Whisper...")
+                with metrics.stage("transcribe"):
+                    transcript = transcribe_segments(file_path)
+                cloud_logger.info(f"Transcription complete. Word count: {len(transcript['text'].split())}")
+                set_transcript(whisper_transcript_key(content_id), transcript)
+
+        with metrics.stage("summarize"):
+            summary = summarize_with_mindmap(transcript)
+        cache.set(cached_key, summary)
+        cloud_logger.info(f"Sending summary response: {summary}")
+        return jsonify({"summary": summary})
     except Exception as e:
         cloud_logger.error(f"Upload summarization failed: {str(e)}")
         return jsonify({"error": f"Upload summarization failed: {str(e)}"}), 500
@@ -246,8 +370,8 @@ def submit_video_to_summarize():
 @app.route("/download-youtube-and-submit", methods=["POST"])
 def download_youtube_and_submit():
     """
-    Accepts a YouTube URL, validates and downloads the first 7 minutes,
-    uploads the video to GCS, and returns metadata for processing.
+    Accepts a YouTube URL, validates it and makes sure the first 7 minutes
+    are stored in GCS (once per video ID), and returns metadata for processing.
     """
     data = request.get_json()
     url = data.get("url")
@@ -261,52 +385,25 @@ def download_youtube_and_submit():
         return jsonify({"error": "Invalid YouTube URL"}), 400
 
     video_id = match.group(1)
+    cookie_path = "youtube_cookies.txt"
+    if os.path.exists(cookie_path):
+        cloud_logger.info("✅ Using cookiefile for authentication.")
+    else:
+        cloud_logger.info("⚠️ No cookiefile found. Proceeding without cookies.")
+        cookie_path = None
 
     try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            output_path = os.path.join(tmpdir, f"{video_id}.mp4")
-            cookie_path = "youtube_cookies.txt"
-            ydl_opts = {
-                'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/mp4',
-                'outtmpl': output_path,
-                'quiet': True,
-                'merge_output_format': 'mp4',
-                'download_sections': '*00:00:00-00:07:00',  # <-- download only first 7 minutes
-}
-
-            if os.path.exists(cookie_path):
-                cloud_logger.info("✅ Using cookiefile for authentication.")
-                ydl_opts['cookiefile'] = cookie_path
-            else:
-                cloud_logger.info("⚠️ No cookiefile found. Proceeding without cookies.")
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-
-            if not os.path.exists(output_path):
-                raise Exception("Video not downloaded")
-
-            # Upload to GCS
-            blob = bucket.blob(f'videos/{video_id}.mp4')
-            with open(output_path, "rb") as f:
-                blob.upload_from_file(f, content_type="video/mp4")
-
-            video_url = blob.public_url
-
-            # Prepare minimal metadata
-            payload = {
-                "id": video_id,
-                "title": f"YouTube_{video_id}",
-                "thumbnailUrl": f"https://img.youtube.com/vi/{video_id}/0.jpg",
-                "videoUrl": video_url,
-            }
-
-            return jsonify(payload), 200
-
+        # Already-stored videos return at once; new ones are streamed into storage
+        payload = ingest_video(url, video_id, cookiefile=cookie_path)
+        return jsonify(payload), 200
     except Exception as e:
         cloud_logger.error(f"[ERROR] YouTube download failed: {str(e)}")
         return jsonify({"error": f"YouTube download failed: {str(e)}"}), 500
 
+@app.route("/job-events/<job_id>", methods=["GET"])
+def job_events(job_id):
+    return job_processor.job_events_handler(job_id)
+
 @app.route("/job-result/<job_id>", methods=["GET"])
 def job_result(job_id):
     return job_processor.job_result_handler(job_id)
@@ -315,10 +412,6 @@ def job_result(job_id):
 
 @app.route("/generate-mindmap", methods=["POST"])
 def generate_mindmap():
-    # Use global Redis client
-    r = redis_client
-    import hashlib
-
     data = request.get_json()
     summary = data.get("summary", "").strip()
     model_type = data.get("model_type", "zephyr-gguf")  
@@ -326,35 +419,66 @@ def generate_mindmap():
     if not summary:
         return jsonify({"error": "Empty summary provided"}), 400
 
-    cache_key = f"{model_type}_mindmap_" + hashlib.md5(summary.encode("utf-8")).hexdigest()
-    cached = r.get(cache_key)
+    cache_key = mindmap_key(model_type, summary)
+    cached = get_cache().get(cache_key)
     if cached:
         cloud_logger.info(f"[DEBUG] Returning cached mindmap key {cache_key} for model {model_type} ")
         return jsonify({"mindmap": json.loads(cached)})
 
+    body, status = generate_mindmap_uncached(summary, model_type, cache_key)
+    return jsonify(body), status
+
+
+def generate_mindmap_uncached(summary, model_type, cache_key):
     try:
         cloud_logger.info(f"Generating mind map using model: {model_type}")  # Debug log
-        import time
-        start_time = time.time()
         cloud_logger.info(f"[DEBUG] Mind map generation started for model_type: {model_type}")
-        model_dispatch = {
-            "transformer": generate_mindmap_transformer,
-            "mistral": generate_mindmap_mistral,
-            "gemini": generate_mindmap_gemini
-        }
-
-        generator_fn = model_dispatch.get(model_type)
+        generator_fn = MINDMAP_GENERATORS.get(model_type)
         if not generator_fn:
-            return jsonify({"error": f"Unsupported model_type: {model_type}"}), 400
+            return {"error": f"Unsupported model_type: {model_type}"}, 400
+
+        def generate():
+            with metrics.stage("mindmap_generate"):
+                return dumps(generator_fn(summary))
 
-        mindmap_json = generator_fn(summary)
-        duration = time.time() - start_time
-        cloud_logger.info(f"[TIMING] Mind map generation using {model_type} took {duration:.2f} seconds")
-        r.set(cache_key, json.dumps(mindmap_json), ex=172800)
-        return jsonify({"mindmap": mindmap_json})
+        # Concurrent requests for the same summary share one generation
+        mindmap = compute_once(cache_key, generate, ttl=MINDMAP_CACHE_TTL)
+        return {"mindmap": json.loads(mindmap)}, 200
     except Exception as e:
         cloud_logger.error(f"Mind map generation failed: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
+
+
+@app.route("/generate-mindmap/batch", methods=["POST"])
+def generate_mindmap_batch():
+    """
+    Generate mind maps for several summaries in one request.
+    Expects {"summaries": [...], "model_type": ...} and returns
+    {"results": [{"mindmap": ...} or {"error": ...}, ...]} in input order.
+    """
+    data = request.get_json() or {}
+    summaries = data.get("summaries")
+    model_type = data.get("model_type", "zephyr-gguf")
+    if not isinstance(summaries, list) or not summaries:
+        return jsonify({"error": "Expected a non-empty 'summaries' list"}), 400
+    if len(summaries) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} summaries per batch"}), 400
+    generator_fn = MINDMAP_GENERATORS.get(model_type)
+    if not generator_fn:
+        return jsonify({"error": f"Unsupported model_type: {model_type}"}), 400
+
+    valid = [i for i, summary in enumerate(summaries) if isinstance(summary, str) and summary.strip()]
+    resolved = resolve_batch(
+        [summaries[i].strip() for i in valid],
+        key_fn=lambda summary: mindmap_key(model_type, summary),
+        compute_fn=lambda summary: dumps(generator_fn(summary)),
+        ttl=MINDMAP_CACHE_TTL,
+    )
+    results = [{"error": "Empty summary provided"} for _ in summaries]
+    for i, (mindmap, error) in zip(valid, resolved):
+        results[i] = {"error": error} if error else {"mindmap": json.loads(mindmap)}
+    cloud_logger.info(f"[DEBUG] Batch generated {len(summaries)} mind maps using {model_type}")
+    return jsonify({"results": results})
 
 
 # Serve a mindmap HTML file from /tmp
@@ -401,8 +525,9 @@ def upload_thumbnail():
         return jsonify({"error": "No file part"}), 400
     file = request.files['file']
     filename = file.filename  # expected "<id>.png"
-    blob = bucket.blob(f'thumbnails/{filename}')
-    blob.upload_from_file(file.stream, content_type=file.mimetype)
+    blob = get_bucket().blob(f'thumbnails/{filename}')
+    with metrics.stage("gcs_upload"):
+        blob.upload_from_file(file.stream, content_type=file.mimetype)
     thumb_url = blob.public_url
     cloud_logger.info(f"[DEBUG] upload_thumbnail succeeded: {thumb_url}")  # Debug log
     return jsonify({"thumbUrl": thumb_url}), 200
@@ -413,10 +538,28 @@ def upload_video():
         return jsonify({"error": "No file part"}), 400
     file = request.files['file']
     filename = file.filename  # expected "<id>.webm"
-    blob = bucket.blob(f'videos/{filename}')
-    blob.upload_from_file(file.stream, content_type=file.mimetype)
+    blob = get_bucket().blob(f'videos/{filename}')
+    with metrics.stage("gcs_upload"):
+        blob.upload_from_file(file.stream, content_type=file.mimetype)
     return jsonify({"videoUrl": blob.public_url}), 200
 
+@app.route("/upload-sessions", methods=["POST"])
+def create_upload_session():
+    """
+    Start a direct-to-bucket upload; preferred over /upload-video and
+    /upload-thumb, which stream the file through this server.
+    """
+    return upload_sessions.create_session_handler()
+
+@app.route("/upload-sessions/<session_id>/complete", methods=["POST"])
+def complete_upload_session(session_id):
+    return upload_sessions.complete_session_handler(session_id)
+
+@app.route("/storage-upload/<path:name>", methods=["PUT"])
+def storage_upload(name):
+    # Only used by the local storage backend
+    return upload_sessions.local_upload_handler(name)
+
 
 @app.route("/save-summary", methods=["POST"])
 def save_summary():
@@ -430,22 +573,58 @@ def save_summary():
     summary_id = entry.get("id")
     if not summary_id:
         return jsonify({"error": "Missing 'id'"}), 400
-    key = f"summary:{summary_id}"
-    redis_client.set(key, json.dumps(entry))
+    summary_store.save_entry(entry)
     return jsonify({"status": "saved", "id": summary_id}), 201
 
 @app.route("/list-summaries", methods=["GET"])
 def list_summaries():
     """
-    List all saved summary entries from Redis.
+    List saved summary entries from Redis, newest first.
+
+    Query parameters: `limit` (page size), `cursor` (from the previous page's
+    X-Next-Cursor header) and `fields` (comma-separated keys to return).
+    The body stays a JSON array; X-Next-Cursor is absent on the last page.
+    Without `limit` or `cursor` every entry is returned, as before paging existed.
+    """
+    try:
+        limit = int(request.args.get("limit", LIST_SUMMARIES_DEFAULT_LIMIT))
+        cursor = request.args.get("cursor")
+        if cursor:
+            summary_store.parse_cursor(cursor)
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    limit = max(1, min(limit, LIST_SUMMARIES_MAX_LIMIT))
+    fields = [f for f in request.args.get("fields", "").split(",") if f] or None
+
+    summary_store.ensure_index()
+    if "limit" not in request.args and not cursor:
+        return jsonify(summary_store.list_all(fields, LIST_SUMMARIES_MAX_LIMIT)), 200
+    entries, next_cursor = summary_store.list_entries(limit, cursor, fields)
+    response = jsonify(entries)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
+
+@app.route("/model-stats", methods=["GET"])
+def model_stats():
+    """
+    Report which local models this worker has loaded, their load time and resident memory.
+    """
+    return jsonify(model_registry.model_stats()), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Prometheus scrape target: request, stage, cache, queue and LLM metrics of every process.
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/cache-stats", methods=["GET"])
+def cache_stats():
+    """
+    Report hit/miss counters and local tier usage of the transcript/summary cache.
     """
-    keys = redis_client.keys("summary:*")
-    entries = []
-    for key in keys:
-        data = redis_client.get(key)
-        entry = json.loads(data)
-        entries.append(entry)
-    return jsonify(entries), 200
+    return jsonify(get_cache().stats()), 200
 
 
 if __name__ == "__main__":
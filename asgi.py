@@ -0,0 +1,276 @@
+"""
+Async serving mode for the network-bound routes.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080      (or SERVER_MODE=async ./start.sh)
+
+/summarize-text, /summarize-url, /summarize-url-whisper, /generate-mindmap,
+/list-summaries, /job-events and /job-result are served by async Quart handlers.
+Their fast paths (input validation, cache lookups, listing summaries, streaming
+or waiting on a job) use redis.asyncio and never hold a thread, so one process
+keeps hundreds of requests in flight. On a cache miss the same slow-path
+function as the Flask route runs off the event loop:
+
+- API-bound work (Gemini calls, YouTube captions, single-flight waits) runs on
+  a thread pool of ASYNC_IO_THREADS.
+- CPU-heavy work (Whisper, T5, local mind-map models) runs in a pool of
+  ASYNC_CPU_PROCESSES processes. /summarize-url-whisper downloads and decodes
+  on the thread pool and sends only the transcription to a process.
+
+Every other route (uploads, job submission, metrics, ...) is the unchanged Flask
+app running on ASYNC_WSGI_THREADS threads.
+"""
+import asyncio
+import concurrent.futures
+import json
+import multiprocessing
+import re
+import time
+
+from a2wsgi import WSGIMiddleware
+from quart import Quart, g, jsonify, make_response, request
+from werkzeug.exceptions import HTTPException
+
+import app as flask_app_module
+import job_events
+import job_processor
+import job_queue
+import metrics
+import summary_store
+import transcriber
+from cache import (
+    get_cache, get_transcript, set_transcript, mindmap_key, summary_key, text_content_id, video_content_id,
+    whisper_transcript_key,
+)
+from cloud_log import cloud_logger
+from config import (
+    ASYNC_IO_THREADS, ASYNC_CPU_PROCESSES, ASYNC_WSGI_THREADS, LIST_SUMMARIES_DEFAULT_LIMIT, LIST_SUMMARIES_MAX_LIMIT,
+)
+from summarize import CPU_SUMMARY_ENGINES, summary_engine, summary_version
+
+# Mind-map models that run on local CPU models rather than an API
+CPU_MINDMAP_MODELS = {"transformer", "mistral"}
+
+quart_app = Quart(__name__)
+_io_pool = concurrent.futures.ThreadPoolExecutor(ASYNC_IO_THREADS, thread_name_prefix="async-io")
+_cpu_pool = None
+
+
+def _get_cpu_pool():
+    global _cpu_pool
+    if _cpu_pool is None:
+        # Each pool process transcribes within its share of this web process's cores
+        cores = transcriber.cpu_budget() // max(1, ASYNC_CPU_PROCESSES)
+        _cpu_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=ASYNC_CPU_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+            initializer=transcriber.set_cpu_budget, initargs=(max(1, cores),),
+        )
+    return _cpu_pool
+
+
+async def run_io(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_io_pool, fn, *args)
+
+
+async def run_cpu(fn, *args):
+    return await asyncio.wrap_future(_get_cpu_pool().submit(fn, *args))
+
+
+@quart_app.before_request
+async def _start_request_timer():
+    g.metrics_start = time.perf_counter()
+
+
+@quart_app.after_request
+async def _finish_request(response):
+    start = g.pop("metrics_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - start, route=route, method=request.method)
+        metrics.inc("http_requests_total", route=route, method=request.method, status=response.status_code)
+    # Same CORS policy as the Flask app (preflight requests are answered by Flask-CORS)
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor"
+    return response
+
+
+@quart_app.after_serving
+async def _shutdown_pools():
+    _io_pool.shutdown(wait=False)
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=False)
+
+
+@quart_app.route("/summarize-text", methods=["POST"])
+async def summarize_text():
+    data = await request.get_json(silent=True) or {}
+    text = data.get("text", "").strip()
+    model_name = data.get("model_name", "gemini")
+    if not text:
+        return jsonify({"error": "Empty input"}), 400
+    try:
+        engine = summary_engine(model_name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cached_key = summary_key(text_content_id(text), engine, summary_version(engine))
+    cached_summary = await get_cache().aget(cached_key)
+    if cached_summary:
+        return jsonify({"summary": cached_summary})
+
+    run = run_cpu if engine in CPU_SUMMARY_ENGINES else run_io
+    body, status = await run(flask_app_module.summarize_text_uncached, text, model_name, cached_key)
+    return jsonify(body), status
+
+
+@quart_app.route("/summarize-url", methods=["POST"])
+async def summarize_url():
+    data = await request.get_json(silent=True) or {}
+    url = data.get("url")
+    if not url:
+        return jsonify({"error": "No URL provided"}), 400
+    match = re.search(r"(?:v=|youtu\.be/)([a-zA-Z0-9_-]{11})", url)
+    if not match:
+        return jsonify({"error": "Invalid YouTube URL"}), 400
+
+    video_id = match.group(1)
+    cached_key = summary_key(video_content_id(video_id), "gemini", summary_version("gemini"))
+    cached_summary = await get_cache().aget(cached_key)
+    if cached_summary:
+        cloud_logger.info(f"✅ Returning cached summary for {video_id}.")
+        return jsonify({"summary": cached_summary})
+
+    body, status = await run_io(flask_app_module.summarize_url_uncached, video_id, cached_key)
+    return jsonify(body), status
+
+
+@quart_app.route("/summarize-url-whisper", methods=["POST"])
+async def summarize_url_whisper():
+    data = await request.get_json(silent=True) or {}
+    url = data.get("url")
+    if not url:
+        return jsonify({"error": "No URL provided"}), 400
+
+    content_id = flask_app_module.url_content_id(url)
+    cached_key = summary_key(content_id, "gemini", summary_version("gemini")) if content_id else None
+    if cached_key:
+        cached_summary = await get_cache().aget(cached_key)
+        if cached_summary:
+            cloud_logger.info("✅ Returning cached summary.")
+            return jsonify({"summary": cached_summary})
+
+    transcript = await run_io(get_transcript, whisper_transcript_key(content_id)) if content_id else None
+    if transcript is None:
+        try:
+            # yt-dlp and ffmpeg mostly wait on the network; only Whisper needs a CPU pool process.
+            # The decoded audio (16 kHz float32, about 230 MB per hour) is copied to it once.
+            audio = await run_io(flask_app_module.decode_url_audio, url)
+            transcript = await run_cpu(flask_app_module.transcribe_url_audio, audio)
+        except Exception as e:
+            cloud_logger.error(f"Whisper transcription failed: {str(e)}")
+            return jsonify({"error": f"Whisper transcription failed: {str(e)}"}), 500
+        if content_id:
+            await run_io(set_transcript, whisper_transcript_key(content_id), transcript)
+
+    body, status = await run_io(flask_app_module.summarize_whisper_transcript, transcript, cached_key)
+    return jsonify(body), status
+
+
+@quart_app.route("/generate-mindmap", methods=["POST"])
+async def generate_mindmap():
+    data = await request.get_json(silent=True) or {}
+    summary = data.get("summary", "").strip()
+    model_type = data.get("model_type", "zephyr-gguf")
+    if not summary:
+        return jsonify({"error": "Empty summary provided"}), 400
+
+    cache_key = mindmap_key(model_type, summary)
+    cached = await get_cache().aget(cache_key)
+    if cached:
+        return jsonify({"mindmap": json.loads(cached)})
+
+    run = run_cpu if model_type in CPU_MINDMAP_MODELS else run_io
+    body, status = await run(flask_app_module.generate_mindmap_uncached, summary, model_type, cache_key)
+    return jsonify(body), status
+
+
+@quart_app.route("/list-summaries", methods=["GET"])
+async def list_summaries():
+    try:
+        limit = int(request.args.get("limit", LIST_SUMMARIES_DEFAULT_LIMIT))
+        cursor = request.args.get("cursor")
+        if cursor:
+            summary_store.parse_cursor(cursor)
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    limit = max(1, min(limit, LIST_SUMMARIES_MAX_LIMIT))
+    fields = [f for f in request.args.get("fields", "").split(",") if f] or None
+
+    if not await summary_store.index_built():
+        await run_io(summary_store.ensure_index)
+    if "limit" not in request.args and not cursor:
+        return jsonify(await summary_store.alist_all(fields, LIST_SUMMARIES_MAX_LIMIT)), 200
+    entries, next_cursor = await summary_store.alist_entries(limit, cursor, fields)
+    response = jsonify(entries)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
+
+
+@quart_app.route("/job-events/<job_id>", methods=["GET"])
+async def job_events_stream(job_id):
+    if await job_queue.aget_job(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID", "0"))
+    except ValueError:
+        last_event_id = 0
+    response = await make_response(
+        job_events.astream(job_id, last_event_id), 200,
+        {"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # The stream ends on its own (terminal event or job_events' max_seconds)
+    response.timeout = None
+    return response
+
+
+@quart_app.route("/job-result/<job_id>", methods=["GET"])
+async def job_result(job_id):
+    try:
+        wait = job_processor.parse_wait(request.args.get("wait"))
+    except ValueError:
+        return jsonify({"error": "Invalid wait"}), 400
+    job = await job_queue.aget_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if wait and not job_processor.is_finished(job):
+        async def finished():
+            return job_processor.is_finished(await job_queue.aget_job(job_id))
+
+        done = await job_events.await_terminal(job_id, wait, finished)
+        metrics.inc("job_result_waits_total", outcome="finished" if done else "timeout")
+        job = await job_queue.aget_job(job_id) or job
+    return jsonify(job_processor.job_result_body(job))
+
+
+_async_routes = quart_app.url_map.bind("")
+_flask_asgi = WSGIMiddleware(flask_app_module.app, workers=ASYNC_WSGI_THREADS)
+
+
+def _is_async_route(path, method):
+    if method == "OPTIONS":
+        return False
+    try:
+        endpoint, _ = _async_routes.match(path, method)
+    except HTTPException:
+        return False
+    return endpoint != "static"
+
+
+async def app(scope, receive, send):
+    """
+    ASGI entry point: async routes go to Quart, everything else to Flask.
+    """
+    if scope["type"] == "lifespan" or (scope["type"] == "http" and _is_async_route(scope["path"], scope["method"])):
+        await quart_app(scope, receive, send)
+    else:
+        await _flask_asgi(scope, receive, send)
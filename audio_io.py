@@ -0,0 +1,197 @@
+"""
+Decode media straight to the 16 kHz mono float32 buffer Whisper consumes.
+
+Bytes are fed to an ffmpeg subprocess through a pipe and raw PCM is read back
+from its stdout, so no intermediate video or WAV file touches the disk.
+"""
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+
+import metrics
+from cloud_log import cloud_logger
+from config import YTDLP_AUDIO_FORMAT
+
+SAMPLE_RATE = 16000
+PIPE_CHUNK_SIZE = 64 * 1024
+# ffmpeg errors meaning piped input needs random access (e.g. an MP4 with its
+# index at the end), as opposed to the media itself being unreadable
+_NEEDS_SEEK_ERRORS = ("moov atom not found", "partial file", "error seeking", "cannot seek")
+
+
+class UnseekableInputError(RuntimeError):
+    """
+    ffmpeg could not decode piped input because the container needs seeking.
+    """
+
+
+def ffmpeg_header_args(headers):
+    """
+    ffmpeg input options sending `headers` with its HTTP requests.
+    """
+    if not headers:
+        return []
+    return ["-headers", "".join(f"{name}: {value}\r\n" for name, value in headers.items())]
+
+
+def _ffmpeg_pcm_command(input_spec, headers=None):
+    return [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        *ffmpeg_header_args(headers),
+        "-i", input_spec,
+        "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "pipe:1",
+    ]
+
+
+def _pcm_to_float32(raw):
+    import numpy as np
+    return np.frombuffer(raw, np.int16).astype(np.float32) / 32768.0
+
+
+def _drain(pipe, sink):
+    sink.append(pipe.read())
+
+
+def decode_chunks_to_pcm(chunks):
+    """
+    Pipe an iterable of byte chunks through ffmpeg.
+    Returns (float32 audio, sha256 hex digest of the input bytes, input byte count).
+    """
+    proc = subprocess.Popen(
+        _ffmpeg_pcm_command("pipe:0"),
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    digest = hashlib.sha256()
+    written = [0]
+    feed_error = []
+
+    def feed():
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                digest.update(chunk)
+                written[0] += len(chunk)
+                proc.stdin.write(chunk)
+        except BrokenPipeError:
+            # ffmpeg exited early; its return code and stderr explain why
+            pass
+        except Exception as e:
+            feed_error.append(e)
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    stderr = []
+    feeder = threading.Thread(target=feed, daemon=True)
+    err_reader = threading.Thread(target=_drain, args=(proc.stderr, stderr), daemon=True)
+    feeder.start()
+    err_reader.start()
+    raw = proc.stdout.read()
+    proc.wait()
+    feeder.join()
+    err_reader.join()
+    if feed_error:
+        proc.kill()
+        raise feed_error[0]
+    if proc.returncode != 0:
+        message = b"".join(stderr).decode(errors="replace").strip()
+        error = UnseekableInputError if any(m in message.lower() for m in _NEEDS_SEEK_ERRORS) else RuntimeError
+        raise error(f"ffmpeg failed to decode piped input: {message}")
+    metrics.inc("bytes_processed_total", written[0], source="ffmpeg_pipe")
+    return _pcm_to_float32(raw), digest.hexdigest(), written[0]
+
+
+def decode_source_to_pcm(source, headers=None):
+    """
+    Let ffmpeg open `source` (a path or URL) itself. Needed for containers that
+    cannot be decoded from a pipe, such as MP4 files with the index at the end.
+    """
+    proc = subprocess.run(_ffmpeg_pcm_command(source, headers), capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {source}: {proc.stderr.decode(errors='replace').strip()}")
+    return _pcm_to_float32(proc.stdout)
+
+
+def _download(url, file, timeout, headers):
+    """
+    Copy `url` into the open binary `file`. Returns the sha256 hex digest of the bytes.
+    """
+    import requests
+
+    digest = hashlib.sha256()
+    with requests.get(url, stream=True, timeout=timeout, headers=headers) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_content(chunk_size=PIPE_CHUNK_SIZE):
+            digest.update(chunk)
+            file.write(chunk)
+    return digest.hexdigest()
+
+
+def decode_url_to_pcm(url, timeout=30, headers=None):
+    """
+    Stream `url` over HTTP into ffmpeg.
+    Returns (float32 audio, sha256 hex digest of the downloaded bytes), so the
+    content ID matches an upload of the same file.
+    """
+    import requests
+
+    with requests.get(url, stream=True, timeout=timeout, headers=headers) as resp:
+        resp.raise_for_status()
+        try:
+            audio, file_hash, _ = decode_chunks_to_pcm(resp.iter_content(chunk_size=PIPE_CHUNK_SIZE))
+            return audio, file_hash
+        except UnseekableInputError as e:
+            cloud_logger.warning(f"[AUDIO] {url} cannot be decoded from a pipe, downloading it first: {e}")
+    # The container needs seeking: decode from a temporary copy instead
+    fd, tmp_path = tempfile.mkstemp(suffix=".media")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            file_hash = _download(url, f, timeout, headers)
+        return decode_source_to_pcm(tmp_path), file_hash
+    finally:
+        os.remove(tmp_path)
+
+
+def resolve_audio_format(url, cookiefile=None, audio_format=YTDLP_AUDIO_FORMAT):
+    """
+    Ask yt-dlp (without downloading) for the media URL of the format that
+    `audio_format` selects; by default the smallest audio-only stream that is
+    still good enough for speech. Returns (media URL, HTTP headers, format info).
+    """
+    import yt_dlp
+
+    opts = {"quiet": True, "format": audio_format, "noplaylist": True}
+    if cookiefile:
+        opts["cookiefile"] = cookiefile
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    # Merged selections list their parts; the audio part is the one we want
+    chosen = next(
+        (f for f in info.get("requested_formats") or [] if f.get("acodec") not in (None, "none")),
+        info,
+    )
+    return chosen["url"], chosen.get("http_headers") or {}, {
+        "format_id": chosen.get("format_id"),
+        "ext": chosen.get("ext"),
+        "abr": chosen.get("abr"),
+        "filesize": chosen.get("filesize") or chosen.get("filesize_approx"),
+    }
+
+
+def decode_ytdlp_audio_to_pcm(url, cookiefile=None):
+    """
+    Decode the audio of any yt-dlp supported page (YouTube, etc.) straight to
+    16 kHz float32, with no intermediate MP3 or temp files.
+    Returns (float32 audio, sha256 hex digest of the downloaded bytes).
+    """
+    with metrics.stage("ytdlp_resolve"):
+        media_url, headers, chosen = resolve_audio_format(url, cookiefile)
+    cloud_logger.debug(f"[AUDIO] Decoding yt-dlp audio format {chosen}")
+    with metrics.stage("decode_audio"):
+        return decode_url_to_pcm(media_url, headers=headers)
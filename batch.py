@@ -0,0 +1,41 @@
+"""
+Shared plumbing for the batch endpoints.
+
+Cache hits for the whole batch are resolved with one MGET; the misses are
+computed concurrently (duplicates only once, and coalesced with identical work
+elsewhere through singleflight) under a concurrency cap, and results come back
+in input order with per-item errors.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import get_cache
+from config import BATCH_MAX_CONCURRENCY
+from singleflight import compute_once
+
+
+def resolve_batch(items, key_fn, compute_fn, ttl=None, max_concurrency=BATCH_MAX_CONCURRENCY):
+    """
+    For each item return (cached string, None) or (None, error message).
+    `compute_fn(item)` must return the string to cache under `key_fn(item)`.
+    """
+    cache = get_cache()
+    keys = [key_fn(item) for item in items]
+    found = cache.get_many(list(dict.fromkeys(keys)))
+    pending = {}
+    for key, item in zip(keys, items):
+        if key not in found:
+            pending.setdefault(key, item)
+
+    errors = {}
+    if pending:
+        def run(key):
+            return compute_once(key, lambda: compute_fn(pending[key]), ttl=ttl)
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(pending))) as pool:
+            futures = {key: pool.submit(run, key) for key in pending}
+            for key, future in futures.items():
+                try:
+                    found[key] = future.result()
+                except Exception as e:
+                    errors[key] = str(e)
+    return [(found.get(key), errors.get(key)) for key in keys]
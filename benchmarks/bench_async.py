@@ -0,0 +1,185 @@
+"""
+Load-test the sync (gunicorn) and async (uvicorn + asgi.py) servers side by side.
+
+    python benchmarks/bench_async.py [--concurrency 16,64,256] [--requests 512] [--llm-latency-ms 1000]
+                                     [--fast-ratio 0.5] [--modes sync,async] [--output bench_async.json]
+
+Each mode starts a real server process on a local port with the offline
+stand-ins (LLM_BACKEND=stub, REDIS_URL=fakeredis://, STORAGE_BACKEND=local).
+The LLM client's own concurrency and rate limits are lifted, so the serving
+mode is what's being measured. The sync mode uses start.sh's defaults
+(gunicorn -w 1 --threads 16).
+
+Requests are fired concurrently with httpx and mix two kinds:
+- slow: /summarize-text with a unique text, so every call waits on the stub LLM.
+- fast: /list-summaries, which only reads Redis.
+Per mode and concurrency level, the report gives throughput and p50/p95/p99
+latency for each kind, so head-of-line blocking of fast requests behind slow
+ones shows up directly. Needs: pip install httpx fakeredis gunicorn uvicorn quart a2wsgi
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "sync": lambda port: ["gunicorn", "-w", "1", "--threads", "16", "-b", f"127.0.0.1:{port}", "app:app",
+                          "--timeout", "600"],
+    "async": lambda port: [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+                           "--log-level", "warning"],
+}
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, port, env):
+    proc = subprocess.Popen(SERVERS[mode](port), cwd=REPO_ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    import httpx
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def run_level(base_url, concurrency, requests, fast_ratio, run_id):
+    import httpx
+
+    latencies = {"slow": [], "fast": []}
+    errors = []
+    semaphore = asyncio.Semaphore(concurrency)
+    fast_every = round(1 / fast_ratio) if fast_ratio > 0 else 0
+
+    async def one(client, i):
+        kind = "fast" if fast_every and i % fast_every == 0 else "slow"
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if kind == "fast":
+                    response = await client.get("/list-summaries?limit=20&fields=id,title")
+                else:
+                    response = await client.post("/summarize-text", json={"text": f"Benchmark text {run_id} {i}."})
+                if response.status_code >= 400:
+                    raise RuntimeError(f"HTTP {response.status_code}")
+            except Exception as e:
+                errors.append(f"{kind}: {e!r}")
+                return
+            latencies[kind].append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=600) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(requests)))
+        wall = time.perf_counter() - start
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    report = {
+        "requests": requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput_rps": round(sum(len(v) for v in latencies.values()) / wall, 1),
+        "wall_seconds": round(wall, 2),
+    }
+    for kind, values in latencies.items():
+        report[kind] = {"p50_ms": ms(percentile(values, 50)), "p95_ms": ms(percentile(values, 95)),
+                        "p99_ms": ms(percentile(values, 99))}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="16,64,256")
+    parser.add_argument("--requests", type=int, default=512, help="Requests per concurrency level")
+    parser.add_argument("--llm-latency-ms", type=float, default=1000)
+    parser.add_argument("--fast-ratio", type=float, default=0.5, help="Share of /list-summaries requests")
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench-async-")
+    env = dict(
+        os.environ,
+        LLM_BACKEND="stub",
+        LLM_STUB_LATENCY_MS=str(args.llm_latency_ms),
+        LLM_STUB_JITTER_MS="0",
+        LLM_MAX_CONCURRENCY="100000",
+        LLM_RATE_PER_SECOND="100000",
+        LLM_BURST="100000",
+        REDIS_URL=os.environ.get("REDIS_URL", "fakeredis://"),
+        STORAGE_BACKEND="local",
+        STORAGE_LOCAL_DIR=os.path.join(scratch, "bucket"),
+        JOB_SPOOL_DIR=scratch,
+        CLOUD_LOGGING="0",
+        METRICS_FLUSH_SECONDS="0",
+        ASYNC_IO_THREADS=os.environ.get("ASYNC_IO_THREADS", "256"),
+    )
+
+    import httpx
+    results = {}
+    for mode in args.modes.split(","):
+        port = free_port()
+        proc = start_server(mode, port, env)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            for i in range(20):
+                httpx.post(f"{base_url}/save-summary", json={"id": f"bench-{i}", "title": f"Bench {i}", "summary": "x"})
+            results[mode] = {}
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                level = asyncio.run(run_level(base_url, concurrency, args.requests, args.fast_ratio,
+                                              f"{mode}-{concurrency}"))
+                results[mode][concurrency] = level
+                sys.stderr.write(f"{mode} c={concurrency}: {json.dumps(level)}\n")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            "requests": args.requests,
+            "llm_latency_ms": args.llm_latency_ms,
+            "fast_ratio": args.fast_ratio,
+            "async_io_threads": int(env["ASYNC_IO_THREADS"]),
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+End-to-end latency and throughput of the HTTP routes, fully offline.
+
+    python benchmarks/bench_e2e.py [--requests 40] [--concurrency 8] [--llm-latency-ms 500]
+                                   [--audio-seconds 30] [--only summarize_text,list_summaries]
+                                   [--output bench_e2e.json]
+
+The app is imported in-process against local stand-ins: the stub LLM backend
+(LLM_BACKEND=stub), an in-process fake Redis (REDIS_URL=fakeredis://, needs the
+fakeredis package) and a directory bucket (STORAGE_BACKEND=local). Any of these
+can be overridden through the environment, e.g. REDIS_URL pointing at a real
+Redis. Requests go through Flask's test client from a thread pool, and queued
+jobs are drained by worker.py's loops running as threads.
+
+Each scenario reports p50/p95/p99 latency, throughput and error count; peak RSS
+is reported for the whole run. Scenarios that transcribe synthetic audio are
+skipped when the WHISPER_ENGINE package is not installed, and routes that need YouTube are not
+covered.
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+WORDS = (
+    "model data training network layer signal audio video summary chapter topic speaker "
+    "result method system value memory latency cache queue request server client process "
+    "the a of and to in is that for on with as it this by we can are be which"
+).split()
+
+NETWORK_ROUTES = ["/summarize-url", "/summarize-url-whisper", "/download-youtube-and-submit", "/submit-video-to-summarize"]
+
+
+def synthetic_text(seed, words=600):
+    rng = random.Random(seed)
+    sentences = []
+    while sum(len(s.split()) for s in sentences) < words:
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def synthetic_wav(seconds, sample_rate=16000):
+    """
+    Tone bursts separated by short silences, as 16-bit mono WAV bytes.
+    """
+    import numpy as np
+
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    tone = 0.3 * np.sin(2 * np.pi * (180 + 40 * np.sin(2 * np.pi * 0.5 * t)) * t)
+    tone[(t % 3.0) > 2.4] = 0.0
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes((tone * 32767).astype(np.int16).tobytes())
+    return buf.getvalue()
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def whisper_available():
+    from whisper_engines import engine_available
+    return engine_available()
+
+
+def build_scenarios(app_module, audio):
+    def ok(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response
+
+    def summarize_text(client, i):
+        ok(client.post("/summarize-text", json={"text": synthetic_text(i)}))
+
+    def summarize_text_cached(client, i):
+        ok(client.post("/summarize-text", json={"text": synthetic_text(0)}))
+
+    def summarize_text_batch(client, i):
+        ok(client.post("/summarize-text/batch", json={"texts": [synthetic_text(i * 8 + k) for k in range(8)]}))
+
+    def generate_mindmap(client, i):
+        ok(client.post("/generate-mindmap", json={"summary": synthetic_text(i, 200), "model_type": "gemini"}))
+
+    def generate_mindmap_batch(client, i):
+        summaries = [synthetic_text(i * 8 + k, 200) for k in range(8)]
+        ok(client.post("/generate-mindmap/batch", json={"summaries": summaries, "model_type": "gemini"}))
+
+    def save_summary(client, i):
+        entry = {"id": f"bench-{i}", "title": f"Bench {i}", "summary": synthetic_text(i, 300)}
+        ok(client.post("/save-summary", json=entry))
+
+    def list_summaries(client, i):
+        ok(client.get("/list-summaries?limit=20&fields=id,title"))
+
+    def upload_thumb(client, i):
+        data = {"file": (io.BytesIO(os.urandom(32 * 1024)), f"bench-{i}.png", "image/png")}
+        ok(client.post("/upload-thumb", data=data, content_type="multipart/form-data"))
+
+    def upload_session(client, i):
+        body = os.urandom(256 * 1024)
+        session = ok(client.post("/upload-sessions", json={
+            "kind": "video", "filename": f"bench-{i}.webm", "contentType": "video/webm", "size": len(body),
+        })).get_json()
+        target = urlsplit(session["upload"]["url"])
+        ok(client.put(f"{target.path}?{target.query}", data=body, headers=session["upload"]["headers"]))
+        ok(client.post(f"/upload-sessions/{session['session_id']}/complete"))
+
+    def summarize_upload(client, i):
+        # Appending the index makes every upload a distinct file, so nothing is served from cache
+        body = audio + i.to_bytes(4, "little")
+        ok(client.post("/summarize-upload", data=body, content_type="application/octet-stream",
+                       headers={"X-Filename": f"bench-{i}.wav"}))
+
+    def submit_job(client, i):
+        body = audio + i.to_bytes(4, "little")
+        job_id = ok(client.post("/submit-job", data=body, content_type="application/octet-stream",
+                                headers={"X-Filename": f"bench-{i}.wav"})).get_json()["job_id"]
+        deadline = time.monotonic() + 600
+        while time.monotonic() < deadline:
+            result = ok(client.get(f"/job-result/{job_id}")).get_json()
+            if result.get("status") == "failed":
+                raise RuntimeError(result["summary"])
+            if "summary" in result:
+                return
+            time.sleep(0.05)
+        raise RuntimeError(f"Job {job_id} did not finish")
+
+    def metrics_scrape(client, i):
+        ok(client.get("/metrics"))
+
+    scenarios = {
+        "summarize_text": summarize_text,
+        "summarize_text_cached": summarize_text_cached,
+        "summarize_text_batch": summarize_text_batch,
+        "generate_mindmap": generate_mindmap,
+        "generate_mindmap_batch": generate_mindmap_batch,
+        "save_summary": save_summary,
+        "list_summaries": list_summaries,
+        "upload_thumb": upload_thumb,
+        "upload_session": upload_session,
+        "metrics": metrics_scrape,
+    }
+    audio_scenarios = {"summarize_upload": summarize_upload, "submit_job": submit_job}
+    return scenarios, audio_scenarios
+
+
+def run_scenario(app_module, fn, requests, concurrency):
+    latencies = []
+    errors = []
+
+    def one(i):
+        client = app_module.app.test_client()
+        start = time.perf_counter()
+        try:
+            fn(client, i)
+        except Exception as e:
+            errors.append(str(e))
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "wall_seconds": round(wall, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--audio-seconds", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=2, help="Worker threads per queue for submit_job")
+    parser.add_argument("--only", help="Comma-separated scenario names")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    # Stand-ins must be configured before config.py is first imported
+    scratch = tempfile.mkdtemp(prefix="bench-e2e-")
+    os.environ.setdefault("LLM_BACKEND", "stub")
+    os.environ.setdefault("LLM_STUB_LATENCY_MS", str(args.llm_latency_ms))
+    os.environ.setdefault("REDIS_URL", "fakeredis://")
+    os.environ.setdefault("STORAGE_BACKEND", "local")
+    os.environ.setdefault("STORAGE_LOCAL_DIR", os.path.join(scratch, "bucket"))
+    os.environ.setdefault("JOB_SPOOL_DIR", scratch)
+    os.environ.setdefault("CLOUD_LOGGING", "0")
+    os.environ.setdefault("METRICS_FLUSH_SECONDS", "0")
+
+    # The app prints prompts and responses; keep them out of the report
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        import app as app_module
+        import job_queue
+        import worker
+
+    has_whisper = whisper_available()
+    audio = synthetic_wav(args.audio_seconds) if has_whisper else b""
+    scenarios, audio_scenarios = build_scenarios(app_module, audio)
+    skipped = {route: "needs YouTube/network access" for route in NETWORK_ROUTES}
+    if has_whisper:
+        scenarios.update(audio_scenarios)
+    else:
+        skipped.update({name: "the Whisper engine is not installed" for name in audio_scenarios})
+    if args.only:
+        wanted = set(args.only.split(","))
+        scenarios = {name: fn for name, fn in scenarios.items() if name in wanted}
+
+    stop_event = threading.Event()
+    if "submit_job" in scenarios:
+        for queue in job_queue.QUEUES:
+            for _ in range(args.workers):
+                threading.Thread(target=worker.run_worker_loop, args=(queue, stop_event), daemon=True).start()
+
+    results = {}
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        for name, fn in scenarios.items():
+            results[name] = run_scenario(app_module, fn, args.requests, args.concurrency)
+            sys.stderr.write(f"{name}: {json.dumps(results[name])}\n")
+    stop_event.set()
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_backend": os.environ["LLM_BACKEND"],
+            "llm_latency_ms": float(os.environ["LLM_STUB_LATENCY_MS"]),
+            "redis_url": os.environ["REDIS_URL"],
+            "storage_backend": os.environ["STORAGE_BACKEND"],
+            "audio_seconds": args.audio_seconds if has_whisper else None,
+        },
+        "scenarios": results,
+        "skipped": skipped,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Compare transcription engines on sample audio: speed, memory and accuracy.
+
+    python benchmarks/bench_engines.py [--engines openai:tiny:float32,faster:tiny:int8,faster:small:int8]
+                                       [--threads 0] [--samples benchmarks/samples] [--output bench_engines.json]
+
+Each engine spec is engine:model_size:compute_type (see whisper_engines.py).
+Every spec runs in a fresh interpreter so its peak RSS is its own. The engine is
+loaded, one untimed pass warms it up, then every sample is transcribed once.
+
+Reported per engine:
+- rtf: transcription seconds per second of audio; below 1 is faster than real time.
+- peak_rss_mb: peak resident memory.
+- wer: word error rate against each sample's reference transcript, pooled over
+  all samples. See benchmarks/samples/README.md for the sample layout.
+
+When the samples directory holds no audio, the default sample is downloaded
+first: the public-domain 11-second JFK clip from openai/whisper's test suite,
+whose reference transcript is committed as benchmarks/samples/jfk.txt.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_SAMPLES = os.path.join(REPO_ROOT, "benchmarks", "samples")
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".m4a", ".ogg", ".webm", ".mp4")
+DEFAULT_SAMPLE = ("jfk.flac", "https://raw.githubusercontent.com/openai/whisper/main/tests/jfk.flac")
+
+
+def find_samples(directory):
+    """
+    (audio path, reference text or None) for every audio file in `directory`.
+    """
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in AUDIO_EXTENSIONS:
+            continue
+        reference_path = os.path.join(directory, stem + ".txt")
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path) as f:
+                reference = f.read()
+        samples.append((os.path.join(directory, name), reference))
+    return samples
+
+
+def fetch_default_sample(directory):
+    """
+    Download DEFAULT_SAMPLE into `directory` next to its reference transcript.
+    """
+    import requests
+
+    name, url = DEFAULT_SAMPLE
+    path = os.path.join(directory, name)
+    sys.stderr.write(f"No audio samples in {directory}; downloading {url}\n")
+    response = requests.get(url, timeout=60)
+    response.raise_for_status()
+    with open(path + ".part", "wb") as f:
+        f.write(response.content)
+    os.replace(path + ".part", path)
+
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """
+    Word-level edit distance (substitutions + deletions + insertions).
+    """
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def run_engine(spec, threads, samples_dir):
+    """
+    Child process: benchmark one engine spec and return its report.
+    """
+    import transcriber
+    from whisper_engines import create_engine
+
+    name, model_size, compute_type = spec.split(":")
+    engine = create_engine(name, model_size=model_size, compute_type=compute_type, cpu_threads=threads)
+    start = time.perf_counter()
+    engine.load()
+    load_seconds = time.perf_counter() - start
+
+    samples = [(path, reference, transcriber.load_audio(path)) for path, reference in find_samples(samples_dir)]
+    engine.transcribe(samples[0][2])
+
+    results = []
+    for path, reference, audio in samples:
+        start = time.perf_counter()
+        text = engine.transcribe(audio)["text"]
+        seconds = time.perf_counter() - start
+        audio_seconds = len(audio) / transcriber.SAMPLE_RATE
+        result = {"sample": os.path.basename(path), "audio_seconds": round(audio_seconds, 2),
+                  "seconds": round(seconds, 3), "rtf": round(seconds / audio_seconds, 4)}
+        if reference is not None:
+            errors, words = word_errors(reference, text)
+            result.update(errors=errors, reference_words=words, wer=round(errors / max(1, words), 4))
+        results.append(result)
+
+    audio_total = sum(r["audio_seconds"] for r in results)
+    seconds_total = sum(r["seconds"] for r in results)
+    scored = [r for r in results if "wer" in r]
+    return {
+        **engine.describe(),
+        "load_seconds": round(load_seconds, 2),
+        "rtf": round(seconds_total / audio_total, 4),
+        "wer": round(sum(r["errors"] for r in scored) / max(1, sum(r["reference_words"] for r in scored)), 4)
+        if scored else None,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "samples": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engines", default="openai:tiny:float32,faster:tiny:int8,faster:small:int8")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads per engine; 0 keeps the library default")
+    parser.add_argument("--samples", default=DEFAULT_SAMPLES)
+    parser.add_argument("--output")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_engine(args.child, args.threads, args.samples)))
+        return
+
+    if not find_samples(args.samples):
+        try:
+            fetch_default_sample(args.samples)
+        except Exception as e:
+            sys.exit(f"No audio samples in {args.samples} and the default one could not be fetched ({e}); "
+                     f"see benchmarks/samples/README.md")
+
+    env = dict(os.environ, CLOUD_LOGGING="0")
+    engines = {}
+    for spec in args.engines.split(","):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", spec, "--threads", str(args.threads),
+             "--samples", args.samples],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            engines[spec] = {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        else:
+            engines[spec] = json.loads(proc.stdout.strip().splitlines()[-1])
+        summary = {k: engines[spec].get(k) for k in ("rtf", "wer", "peak_rss_mb", "error")}
+        sys.stderr.write(f"{spec}: {json.dumps(summary)}\n")
+
+    report = {
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "threads": args.threads,
+        "samples": args.samples,
+        "engines": engines,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Track how long the web app takes to import and to answer its first request.
+
+    python benchmarks/bench_startup.py [--runs 5] [--output bench_startup.json]
+
+Each run starts a fresh interpreter, imports app, then sends GET /healthz
+through Flask's test client. Cloud Logging is turned off so the numbers do
+not include network calls.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get("/healthz")
+first_request = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({"import_seconds": imported - start, "first_request_seconds": first_request - start}))
+"""
+
+
+def run_once(env):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    env = dict(os.environ, CLOUD_LOGGING="0")
+    env.setdefault("GCS_BUCKET_NAME", "bench-bucket")
+    runs = [run_once(env) for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "import_seconds_median": round(statistics.median(r["import_seconds"] for r in runs), 3),
+        "first_request_seconds_median": round(statistics.median(r["first_request_seconds"] for r in runs), 3),
+        "import_seconds_max": round(max(r["import_seconds"] for r in runs), 3),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
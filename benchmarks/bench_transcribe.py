@@ -0,0 +1,63 @@
+"""
+Compare wall-clock time of single-pass and parallel Whisper transcription.
+
+    python benchmarks/bench_transcribe.py path/to/long_audio.mp3 [--repeat 2] [--output bench_transcribe.json]
+
+Each mode is run once untimed to load the models (and start the process pool),
+then timed `--repeat` times. Word-level similarity between the two transcripts
+is reported so seam handling regressions show up next to the speedup.
+"""
+import argparse
+import difflib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcriber  # noqa: E402
+
+
+def time_mode(path, mode, repeat):
+    transcriber.transcribe_segments(path, mode=mode)
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = transcriber.transcribe_segments(path, mode=mode)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("audio")
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    duration = len(transcriber.load_audio(args.audio)) / transcriber.SAMPLE_RATE
+    single_s, single = time_mode(args.audio, "single", args.repeat)
+    parallel_s, parallel = time_mode(args.audio, "parallel", args.repeat)
+    similarity = difflib.SequenceMatcher(
+        None, single["text"].lower().split(), parallel["text"].lower().split()
+    ).ratio()
+
+    report = {
+        "audio": args.audio,
+        "audio_seconds": round(duration, 1),
+        "cpu_count": os.cpu_count(),
+        "single_seconds": round(single_s, 2),
+        "parallel_seconds": round(parallel_s, 2),
+        "speedup": round(single_s / parallel_s, 2),
+        "word_similarity": round(similarity, 3),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
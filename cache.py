@@ -0,0 +1,238 @@
+"""
+Content-addressed cache for transcripts, summaries and mind maps.
+
+Entries are keyed by what was processed (a content hash or a YouTube video ID)
+plus the model and prompt version that produced them, so every ingestion
+route shares the same results. Lookups go to a bounded in-process LRU first
+and then to Redis, which is shared by all workers.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    CACHE_TTL,
+    CACHE_LOCAL_MAX_ENTRIES,
+    CACHE_LOCAL_MAX_BYTES,
+    CACHE_LOCAL_TTL,
+    WHISPER_ENGINE,
+    WHISPER_MODEL_SIZE,
+    WHISPER_COMPUTE_TYPE,
+)
+import metrics
+from redis_store import get_redis, get_async_redis
+
+logger = logging.getLogger("cloudLogger")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path):
+    """
+    SHA-256 of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_content_id(file_hash):
+    return f"sha256:{file_hash}"
+
+
+def video_content_id(video_id):
+    return f"yt:{video_id}"
+
+
+def text_content_id(text):
+    return f"text-sha256:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+# Transcripts are stored as JSON {"text": ..., "segments": [{"start", "end", "text"}]}.
+# Engines and compute types transcribe differently, so each gets its own entries.
+def whisper_transcript_key(content_id):
+    return f"cache:transcript:v2:whisper-{WHISPER_ENGINE}-{WHISPER_MODEL_SIZE}-{WHISPER_COMPUTE_TYPE}:{content_id}"
+
+
+def captions_transcript_key(content_id):
+    return f"cache:transcript:v2:captions:{content_id}"
+
+
+def summary_key(content_id, model_name, prompt_version):
+    return f"cache:summary:{model_name}:{prompt_version}:{content_id}"
+
+
+def video_metadata_key(video_id):
+    return f"cache:video-metadata:{video_id}"
+
+
+def mindmap_key(model_type, summary):
+    # Same key format /generate-mindmap has always used
+    return f"{model_type}_mindmap_" + hashlib.md5(summary.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    """
+    String cache with an in-process LRU tier (bounded by entry count, bytes and
+    TTL) in front of a Redis tier (bounded by TTL). Thread safe.
+    """
+
+    def __init__(self, redis_client, ttl=CACHE_TTL, local_max_entries=CACHE_LOCAL_MAX_ENTRIES,
+                 local_max_bytes=CACHE_LOCAL_MAX_BYTES, local_ttl=CACHE_LOCAL_TTL):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.local_max_entries = local_max_entries
+        self.local_max_bytes = local_max_bytes
+        self.local_ttl = local_ttl
+        self._local = OrderedDict()
+        self._local_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"local_hits": 0, "redis_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+        if n:
+            metrics.inc("cache_events_total", n, event=name)
+
+    def _local_get(self, key):
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.time():
+                self._local_pop(key)
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _local_pop(self, key):
+        value, _ = self._local.pop(key)
+        self._local_bytes -= len(value)
+
+    def _local_set(self, key, value):
+        size = len(value)
+        if size > self.local_max_bytes:
+            return
+        with self._lock:
+            if key in self._local:
+                self._local_pop(key)
+            self._local[key] = (value, time.time() + self.local_ttl)
+            self._local_bytes += size
+            while len(self._local) > self.local_max_entries or self._local_bytes > self.local_max_bytes:
+                oldest = next(iter(self._local))
+                self._local_pop(oldest)
+                self.counters["evictions"] += 1
+                metrics.inc("cache_events_total", event="evictions")
+
+    def get(self, key):
+        value = self._local_get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        try:
+            with metrics.timer("redis_duration_seconds", op="get"):
+                value = self.redis.get(key)
+        except Exception as e:
+            logger.error(f"[CACHE] Redis get failed for {key}: {e}")
+            value = None
+        if value is None:
+            self._count("misses")
+            return None
+        self._count("redis_hits")
+        self._local_set(key, value)
+        return value
+
+    async def aget(self, key):
+        """
+        get() for the async server: the Redis tier is read with redis.asyncio,
+        so a lookup never blocks the event loop.
+        """
+        value = self._local_get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        try:
+            with metrics.timer("redis_duration_seconds", op="get"):
+                value = await get_async_redis().get(key)
+        except Exception as e:
+            logger.error(f"[CACHE] Redis get failed for {key}: {e}")
+            value = None
+        if value is None:
+            self._count("misses")
+            return None
+        self._count("redis_hits")
+        self._local_set(key, value)
+        return value
+
+    def get_many(self, keys):
+        """
+        Look up several keys, going to Redis once (MGET) for the local misses.
+        Returns {key: value} for the keys that were found.
+        """
+        found = {}
+        remote = []
+        for key in keys:
+            value = self._local_get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                remote.append(key)
+        self._count("local_hits", len(found))
+        if remote:
+            try:
+                with metrics.timer("redis_duration_seconds", op="mget"):
+                    values = self.redis.mget(remote)
+            except Exception as e:
+                logger.error(f"[CACHE] Redis mget failed: {e}")
+                values = [None] * len(remote)
+            for key, value in zip(remote, values):
+                if value is None:
+                    self._count("misses")
+                    continue
+                self._count("redis_hits")
+                self._local_set(key, value)
+                found[key] = value
+        return found
+
+    def set(self, key, value, ttl=None):
+        self._count("sets")
+        self._local_set(key, value)
+        try:
+            with metrics.timer("redis_duration_seconds", op="set"):
+                self.redis.set(key, value, ex=ttl or self.ttl)
+        except Exception as e:
+            logger.error(f"[CACHE] Redis set failed for {key}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "local_entries": len(self._local),
+                "local_bytes": self._local_bytes,
+            }
+
+
+def get_transcript(key):
+    value = get_cache().get(key)
+    return json.loads(value) if value is not None else None
+
+
+def set_transcript(key, transcript):
+    get_cache().set(key, json.dumps(transcript))
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = TieredCache(get_redis())
+    return _cache
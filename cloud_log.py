@@ -0,0 +1,46 @@
+"""
+The shared "cloudLogger" logger.
+
+The Google Cloud Logging client is slow to build (it resolves credentials and
+project metadata over the network), so its handler is attached lazily, off
+the import path. Log records emitted before it is attached still reach the
+root handlers.
+"""
+import logging
+import threading
+
+from config import CLOUD_LOGGING
+
+cloud_logger = logging.getLogger("cloudLogger")
+cloud_logger.setLevel(logging.INFO)
+
+_setup_lock = threading.Lock()
+_setup_done = False
+
+
+def _attach_cloud_handler():
+    global _setup_done
+    with _setup_lock:
+        if _setup_done:
+            return
+        _setup_done = True
+        try:
+            import google.cloud.logging
+            from google.cloud.logging.handlers import CloudLoggingHandler
+
+            client = google.cloud.logging.Client()
+            cloud_logger.addHandler(CloudLoggingHandler(client))
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Cloud Logging unavailable, logging locally only: {e}")
+
+
+def setup_cloud_logging(background=True):
+    """
+    Attach the Cloud Logging handler once per process (no-op when CLOUD_LOGGING is off).
+    """
+    if not CLOUD_LOGGING or _setup_done:
+        return
+    if background:
+        threading.Thread(target=_attach_cloud_handler, name="cloud-logging-setup", daemon=True).start()
+    else:
+        _attach_cloud_handler()
@@ -2,4 +2,192 @@ import os
 
 # Redis connection string; fall back to localhost if not set
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-GCS_BUCKET_NAME = os.environ.get('GCS_BUCKET_NAME')   
\ No newline at end of file
+GCS_BUCKET_NAME = os.environ.get('GCS_BUCKET_NAME')
+# Where videos and thumbnails are stored: "gcs" or "local" (a directory, for development and benchmarks)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs")
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", "/tmp/storage")
+# Optional URL prefix for local objects' public_url; file:// paths are used when unset
+STORAGE_LOCAL_BASE_URL = os.getenv("STORAGE_LOCAL_BASE_URL")
+# Chunk size of resumable uploads; a failed chunk is retried from the last committed offset
+# (GCS requires a multiple of 256 KiB)
+STORAGE_UPLOAD_CHUNK_SIZE = int(os.getenv("STORAGE_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Direct-to-bucket upload sessions (see upload_sessions.py): seconds a session and its
+# upload URL stay valid, and the largest object a session accepts
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", "3600"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Key for the local backend's signed upload URLs; set the same value on every web process
+STORAGE_LOCAL_SIGNING_KEY = os.getenv("STORAGE_LOCAL_SIGNING_KEY", "local-dev-signing-key")
+
+# Background job queue (see job_queue.py / worker.py)
+# Uploaded media is spooled here by the web tier and read back by the workers,
+# so the directory must be shared between the two (same VM or a shared mount).
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", "/tmp")
+# Seconds a worker may hold a job before it is considered dead and the job is requeued
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+# How many times a job is handed out in one stage (whisper, llm) before it is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# How long finished job records (and their results) are kept in Redis
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "172800"))
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "1"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "4"))
+# Processes in worker.py that run local summary models (t5-small) for the LLM workers,
+# whose own threads only wait on the network
+CPU_SUMMARY_PROCESSES = int(os.getenv("CPU_SUMMARY_PROCESSES", "1"))
+# Longest a /job-result?wait= long-poll may block, in seconds
+JOB_RESULT_MAX_WAIT = float(os.getenv("JOB_RESULT_MAX_WAIT", "60"))
+# /job-events streams and /job-result long-polls one gunicorn process holds open at once.
+# Keep it below WEB_THREADS so other routes always have a thread; further streams get
+# 503 and long-polls answer at once.
+EVENT_STREAM_MAX_CONCURRENT = int(os.getenv("EVENT_STREAM_MAX_CONCURRENT", "8"))
+
+# Completion webhooks (see webhooks.py); delivered by WEBHOOK_WORKERS threads in worker.py
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "2"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+# Deliveries are attempted this many times, backing off exponentially from
+# WEBHOOK_RETRY_BASE_SECONDS up to WEBHOOK_RETRY_MAX_SECONDS between attempts
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "5"))
+WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "900"))
+# When set, each delivery carries X-Webhook-Signature: sha256=<HMAC of the body>
+WEBHOOK_SIGNING_KEY = os.getenv("WEBHOOK_SIGNING_KEY", "")
+# Webhook hosts may not resolve to loopback, private, link-local or other non-public
+# addresses; hosts in this comma-separated list (e.g. an internal receiver) are exempt
+WEBHOOK_ALLOWED_HOSTS = {h.strip().lower() for h in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if h.strip()}
+
+# Async serving mode (asgi.py; SERVER_MODE=async in start.sh)
+# Threads for the blocking slow paths of async routes (LLM calls, caption fetches, single-flight waits)
+ASYNC_IO_THREADS = int(os.getenv("ASYNC_IO_THREADS", "64"))
+# Processes for CPU-heavy work (Whisper, T5, local mind-map models), each with its own models loaded
+ASYNC_CPU_PROCESSES = int(os.getenv("ASYNC_CPU_PROCESSES", "1"))
+# Threads serving the remaining Flask routes (uploads, job events, ...) under the async server
+ASYNC_WSGI_THREADS = int(os.getenv("ASYNC_WSGI_THREADS", "16"))
+# Redis connections shared by the async handlers of one process
+ASYNC_REDIS_CONNECTIONS = int(os.getenv("ASYNC_REDIS_CONNECTIONS", "100"))
+
+# Admission control for submitted jobs (see admission.py)
+# Most jobs waiting in each queue before submissions are refused with 429; 0 disables the limit
+WHISPER_QUEUE_LIMIT = int(os.getenv("WHISPER_QUEUE_LIMIT", "50"))
+LLM_QUEUE_LIMIT = int(os.getenv("LLM_QUEUE_LIMIT", "200"))
+# Most unfinished jobs per client (see admission.client_id); 0 disables the quota
+CLIENT_MAX_ACTIVE_JOBS = int(os.getenv("CLIENT_MAX_ACTIVE_JOBS", "5"))
+# Comma-separated client:key pairs. A request's X-Client-ID counts only when X-Client-Key
+# carries that client's key; otherwise the client is its IP address.
+CLIENT_KEYS = dict(
+    pair.strip().split(":", 1) for pair in os.getenv("CLIENT_KEYS", "").split(",") if ":" in pair
+)
+# Number of reverse proxies in front of the app whose X-Forwarded-For entries are trusted
+# for the client IP; with 0 the socket peer address is used
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+# Uploads up to PRIORITY_SHORT_MEDIA_BYTES are queued as high priority and those of at least
+# PRIORITY_LONG_MEDIA_BYTES as low; everything else (including video URLs) is normal
+PRIORITY_SHORT_MEDIA_BYTES = int(os.getenv("PRIORITY_SHORT_MEDIA_BYTES", str(10 * 1024 * 1024)))
+PRIORITY_LONG_MEDIA_BYTES = int(os.getenv("PRIORITY_LONG_MEDIA_BYTES", str(100 * 1024 * 1024)))
+# Assumed job duration per queue for wait estimates until real jobs have been timed
+DEFAULT_JOB_SECONDS = {
+    "whisper": float(os.getenv("WHISPER_JOB_SECONDS", "60")),
+    "llm": float(os.getenv("LLM_JOB_SECONDS", "15")),
+}
+
+# Local models (see model_registry.py)
+# Transcription engine (see whisper_engines.py): "openai" (reference PyTorch Whisper)
+# or "faster" (faster-whisper on CTranslate2, supports int8 on CPU)
+WHISPER_ENGINE = os.getenv("WHISPER_ENGINE", "openai")
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "tiny")
+# "auto" picks cuda when available, otherwise cpu
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "auto")
+# "auto" uses float16 on cuda; on cpu, float32 for openai and int8 for faster.
+# faster also accepts int8_float32, int8_float16, etc.
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "auto")
+# Intra-op CPU threads for single-process transcription; 0 keeps the library default.
+# The parallel pool splits the cores between its processes instead.
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+T5_MODEL_NAME = os.getenv("T5_MODEL_NAME", "t5-small")
+# Comma-separated models to load in the background at startup, e.g. "whisper" or "whisper,t5"
+MODEL_WARMUP = [m.strip() for m in os.getenv("MODEL_WARMUP", "").split(",") if m.strip()]
+
+# Transcription (see transcriber.py)
+# "single" runs one Whisper pass over the whole file, "parallel" splits it into
+# windows transcribed in a process pool, "auto" goes parallel for long media.
+TRANSCRIBE_MODE = os.getenv("TRANSCRIBE_MODE", "auto")
+TRANSCRIBE_PARALLEL_MIN_SECONDS = float(os.getenv("TRANSCRIBE_PARALLEL_MIN_SECONDS", "180"))
+# Most transcription processes per pool; 0 means one per core of the caller's share.
+# Every process that transcribes gets a share of the cores: worker.py splits them
+# between its Whisper processes, and web processes split them by WEB_WORKERS.
+TRANSCRIBE_PROCESSES = int(os.getenv("TRANSCRIBE_PROCESSES", "0"))
+# Web server processes (start.sh's -w / --workers)
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+TRANSCRIBE_WINDOW_SECONDS = float(os.getenv("TRANSCRIBE_WINDOW_SECONDS", "60"))
+TRANSCRIBE_OVERLAP_SECONDS = float(os.getenv("TRANSCRIBE_OVERLAP_SECONDS", "2"))
+
+# Transcript/summary cache (see cache.py)
+CACHE_TTL = int(os.getenv("CACHE_TTL", "172800"))
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "1024"))
+CACHE_LOCAL_MAX_BYTES = int(os.getenv("CACHE_LOCAL_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_LOCAL_TTL = int(os.getenv("CACHE_LOCAL_TTL", "600"))
+
+# Uploads are copied to disk and hashed in chunks of this size (see uploads.py)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# yt-dlp format for transcription: the smallest audio-only stream of at least 48 kbps
+# (plenty for 16 kHz speech), falling back to whatever audio exists
+YTDLP_AUDIO_FORMAT = os.getenv("YTDLP_AUDIO_FORMAT", "worstaudio[abr>=48]/bestaudio/best")
+# /download-youtube-and-submit: formats to store and how much of the video (seconds) to keep
+INGEST_FORMAT = os.getenv("INGEST_FORMAT", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/mp4")
+INGEST_MAX_SECONDS = int(os.getenv("INGEST_MAX_SECONDS", "420"))
+
+# LLM client (see llm_client.py)
+# "gemini" calls Vertex AI; "stub" returns canned output locally for offline load tests
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+GEMINI_PROJECT = os.getenv("GEMINI_PROJECT", "secure-garden-460600-u4")
+GEMINI_LOCATION = os.getenv("GEMINI_LOCATION", "us-east4")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-001")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "5"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+# Overall deadline for one generate() call, retries included
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "500"))
+LLM_STUB_JITTER_MS = float(os.getenv("LLM_STUB_JITTER_MS", "100"))
+
+# Map-reduce summarization (see summarize.py)
+# Approximate token budget of transcript text sent in one summarization call
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "4000"))
+SUMMARY_MAX_PARALLEL = int(os.getenv("SUMMARY_MAX_PARALLEL", "4"))
+# Above this many chapters the partial lists are merged by the LLM instead of concatenated
+SUMMARY_MAX_CHAPTERS = int(os.getenv("SUMMARY_MAX_CHAPTERS", "20"))
+# Mind map for new Gemini summaries: "off" (built on request by /generate-mindmap),
+# "eager" (started as soon as the summary exists) or "fused" (same LLM call as the chapters)
+SUMMARY_MINDMAP_MODE = os.getenv("SUMMARY_MINDMAP_MODE", "off")
+MINDMAP_CACHE_TTL = int(os.getenv("MINDMAP_CACHE_TTL", "172800"))
+# Extra LLM calls allowed when a JSON reply has nothing usable in it
+STRUCTURED_OUTPUT_RETRIES = int(os.getenv("STRUCTURED_OUTPUT_RETRIES", "1"))
+
+# Local T5 summarization engine (model_name "t5-small" on /submit-job)
+T5_BATCH_SIZE = int(os.getenv("T5_BATCH_SIZE", "8"))
+# Input tokens per chunk; t5-small was trained on 512
+T5_MAX_INPUT_TOKENS = int(os.getenv("T5_MAX_INPUT_TOKENS", "512"))
+# Threads used by torch for T5 inference; 0 uses the process's share of the cores
+# (transcriber.cpu_budget())
+T5_NUM_THREADS = int(os.getenv("T5_NUM_THREADS", "0"))
+
+# /list-summaries pagination: the page size when only a cursor is given (without
+# limit or cursor everything is returned) and the largest page
+LIST_SUMMARIES_DEFAULT_LIMIT = int(os.getenv("LIST_SUMMARIES_DEFAULT_LIMIT", "100"))
+LIST_SUMMARIES_MAX_LIMIT = int(os.getenv("LIST_SUMMARIES_MAX_LIMIT", "500"))
+
+# Batch endpoints (/summarize-text/batch, /generate-mindmap/batch)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Attach the Google Cloud Logging handler (in the background) at startup; set to 0 offline
+CLOUD_LOGGING = os.getenv("CLOUD_LOGGING", "1") == "1"
+
+# How often each process publishes its metrics snapshot to Redis for /metrics (0 disables)
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "15"))
+
+# Single-flight locks (see singleflight.py): lock lifetime, renewed while the holder works,
+# and how long a waiting request blocks before computing the result itself
+SINGLEFLIGHT_LOCK_SECONDS = float(os.getenv("SINGLEFLIGHT_LOCK_SECONDS", "30"))
+SINGLEFLIGHT_WAIT_SECONDS = float(os.getenv("SINGLEFLIGHT_WAIT_SECONDS", "300"))
@@ -0,0 +1,255 @@
+"""
+Progress events for background jobs, streamed to clients as Server-Sent Events.
+
+Workers append each event to the Redis list job-events:<id> (so late or
+reconnecting clients can replay it) and publish it on the channel of the same
+name (so connected clients get it immediately). Event IDs are positions in
+that list, which makes Last-Event-ID resumption exact. The same channel wakes
+/job-result long-polls when a job finishes.
+
+Under gunicorn each stream or long-poll holds a thread, so at most
+EVENT_STREAM_MAX_CONCURRENT are held open per process. The async server
+(asgi.py) serves both without threads, over one shared subscription.
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from cloud_log import cloud_logger
+from config import JOB_RESULT_TTL, EVENT_STREAM_MAX_CONCURRENT
+from redis_store import get_redis, get_async_redis
+
+EVENT_STAGE = "stage"
+EVENT_SEGMENT = "segment"
+EVENT_CHAPTER = "chapter"
+EVENT_DONE = "done"
+EVENT_FAILED = "failed"
+TERMINAL_EVENTS = (EVENT_DONE, EVENT_FAILED)
+
+# Seconds between keep-alive comments, so proxies do not close idle streams
+KEEPALIVE_SECONDS = 15
+
+# Streams and long-polls held open at once by this (sync) web process
+_open_slots = threading.BoundedSemaphore(EVENT_STREAM_MAX_CONCURRENT)
+
+
+def _events_key(job_id):
+    return f"job-events:{job_id}"
+
+
+def publish(job_id, event, data):
+    """
+    Record an event for `job_id` and notify any connected streams.
+    """
+    r = get_redis()
+    key = _events_key(job_id)
+    body = json.dumps({"event": event, "data": data})
+    event_id = r.rpush(key, body)
+    pipe = r.pipeline()
+    pipe.expire(key, JOB_RESULT_TTL)
+    pipe.publish(key, json.dumps({"id": event_id, "event": event, "data": data}))
+    pipe.execute()
+    return event_id
+
+
+def format_sse(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream(job_id, last_event_id=0, max_seconds=3600):
+    """
+    Yield SSE frames for `job_id`, starting after `last_event_id`, until the job
+    reaches a terminal event or `max_seconds` pass.
+    """
+    r = get_redis()
+    key = _events_key(job_id)
+    pubsub = r.pubsub(ignore_subscribe_messages=True)
+    # Subscribe before reading the backlog so nothing published in between is lost
+    pubsub.subscribe(key)
+    try:
+        seen = last_event_id
+        for offset, raw in enumerate(r.lrange(key, last_event_id, -1), start=last_event_id + 1):
+            message = json.loads(raw)
+            seen = offset
+            yield format_sse(offset, message["event"], message["data"])
+            if message["event"] in TERMINAL_EVENTS:
+                return
+
+        deadline = time.time() + max_seconds
+        last_sent = time.time()
+        while time.time() < deadline:
+            message = pubsub.get_message(timeout=1.0)
+            if message is None:
+                if time.time() - last_sent >= KEEPALIVE_SECONDS:
+                    last_sent = time.time()
+                    yield ": keepalive\n\n"
+                continue
+            payload = json.loads(message["data"])
+            if payload["id"] <= seen:
+                continue
+            seen = payload["id"]
+            last_sent = time.time()
+            yield format_sse(payload["id"], payload["event"], payload["data"])
+            if payload["event"] in TERMINAL_EVENTS:
+                return
+    finally:
+        pubsub.close()
+
+
+def _is_terminal(raw):
+    return json.loads(raw)["event"] in TERMINAL_EVENTS
+
+
+def try_hold_open():
+    """
+    Reserve a slot for a request that stays open (an SSE stream or a long-poll)
+    in a thread of this process. Returns False when EVENT_STREAM_MAX_CONCURRENT
+    are already held, so they can never take every thread. Pair with release_hold().
+    """
+    return _open_slots.acquire(blocking=False)
+
+
+def release_hold():
+    _open_slots.release()
+
+
+def wait_for_terminal(job_id, timeout, finished):
+    """
+    Block until `job_id` publishes a terminal event or `timeout` seconds pass.
+    `finished()` is checked once subscribed, so a job that finished just before
+    the call does not wait out the timeout. Returns True if the job finished.
+    """
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(_events_key(job_id))
+    try:
+        if finished():
+            return True
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            message = pubsub.get_message(timeout=min(deadline - time.time(), 1.0))
+            if message is not None and _is_terminal(message["data"]):
+                return True
+        return False
+    finally:
+        pubsub.close()
+
+
+class _AsyncSubscriber:
+    """
+    One pub/sub connection per async server process, shared by every
+    /job-events stream and /job-result long-poll rather than one per request.
+    A job's channel is subscribed while anyone listens to it, and a reader task
+    copies each event into its listeners' queues.
+    """
+
+    def __init__(self):
+        self._pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+        self._listeners = {}
+        self._subscribed = {}
+        self._reader = None
+
+    @asynccontextmanager
+    async def listen(self, job_id):
+        key = _events_key(job_id)
+        queue = asyncio.Queue()
+        listeners = self._listeners.setdefault(key, set())
+        first = not listeners
+        listeners.add(queue)
+        try:
+            if first:
+                subscribed = self._subscribed[key] = asyncio.Event()
+                try:
+                    await self._pubsub.subscribe(key)
+                finally:
+                    subscribed.set()
+            else:
+                await self._subscribed[key].wait()
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+            yield queue
+        finally:
+            listeners.discard(queue)
+            if not listeners and self._listeners.get(key) is listeners:
+                del self._listeners[key]
+                self._subscribed.pop(key, None)
+                await self._pubsub.unsubscribe(key)
+
+    async def _read(self):
+        while self._listeners:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                cloud_logger.error(f"[JOBS] Job event subscription failed: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None:
+                continue
+            payload = json.loads(message["data"])
+            for queue in self._listeners.get(message["channel"], ()):
+                queue.put_nowait(payload)
+
+
+_async_subscriber = None
+
+
+def _get_async_subscriber():
+    global _async_subscriber
+    if _async_subscriber is None:
+        _async_subscriber = _AsyncSubscriber()
+    return _async_subscriber
+
+
+async def _next_event(queue, deadline):
+    """
+    The next published event, or None once `deadline` passes.
+    """
+    try:
+        return await asyncio.wait_for(queue.get(), max(0.0, deadline - time.time()))
+    except asyncio.TimeoutError:
+        return None
+
+
+async def await_terminal(job_id, timeout, finished):
+    """
+    wait_for_terminal() for the async server; `finished` is a coroutine function.
+    """
+    async with _get_async_subscriber().listen(job_id) as queue:
+        if await finished():
+            return True
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            payload = await _next_event(queue, deadline)
+            if payload is not None and payload["event"] in TERMINAL_EVENTS:
+                return True
+        return False
+
+
+async def astream(job_id, last_event_id=0, max_seconds=3600):
+    """
+    stream() for the async server.
+    """
+    key = _events_key(job_id)
+    async with _get_async_subscriber().listen(job_id) as queue:
+        seen = last_event_id
+        backlog = await get_async_redis().lrange(key, last_event_id, -1)
+        for offset, raw in enumerate(backlog, start=last_event_id + 1):
+            message = json.loads(raw)
+            seen = offset
+            yield format_sse(offset, message["event"], message["data"])
+            if message["event"] in TERMINAL_EVENTS:
+                return
+
+        deadline = time.time() + max_seconds
+        while time.time() < deadline:
+            payload = await _next_event(queue, min(deadline, time.time() + KEEPALIVE_SECONDS))
+            if payload is None:
+                yield ": keepalive\n\n"
+                continue
+            if payload["id"] <= seen:
+                continue
+            seen = payload["id"]
+            yield format_sse(payload["id"], payload["event"], payload["data"])
+            if payload["event"] in TERMINAL_EVENTS:
+                return
@@ -1,100 +1,336 @@
 import os
 import uuid
-from threading import Thread
-from flask import request, jsonify
-from transcriber import transcribe_with_whisper
-from summarize import summarize_text
-import redis
-import hashlib
-import time
+import json
+import concurrent.futures
+import multiprocessing
+import threading
+from flask import request, jsonify, Response, stream_with_context
+from transcriber import transcribe_segments, transcribe_audio
+from summarize import CPU_SUMMARY_ENGINES, summary_engine, summary_version, summarize_transcript
+from mindmap_prefetch import summarize_with_mindmap
 
-import requests
-import ffmpeg
+from audio_io import decode_url_to_pcm
 
-import logging
-import google.cloud.logging
-from google.cloud.logging.handlers import CloudLoggingHandler
+import admission
+import job_events
+import job_queue
+import metrics
+import transcriber
+import webhooks
+from singleflight import compute_once
+from storage import local_object_path
+from uploads import get_upload, spool_stream
+from cloud_log import cloud_logger
+from config import JOB_SPOOL_DIR, JOB_RESULT_MAX_WAIT, CPU_SUMMARY_PROCESSES
+from cache import get_cache, get_transcript, hash_file, file_content_id, whisper_transcript_key, summary_key
 
-client = google.cloud.logging.Client()
-handler = CloudLoggingHandler(client)
-cloud_logger = logging.getLogger("cloudLogger")
-cloud_logger.setLevel(logging.INFO)
-cloud_logger.addHandler(handler)
 
-r = redis.Redis(host='localhost', port=6379, db=0)
+def run_transcribe_stage(job):
+    """
+    Whisper stage: transcribe the job's media, cache the transcript and hand
+    the job to the LLM queue. Runs inside worker.py.
 
-job_results = {}
+    Jobs carry either a spooled `file_path` or a `video_url`; a video URL is
+    streamed through ffmpeg straight into an in-memory 16 kHz buffer. Videos
+    uploaded to the local storage backend are read in place, since their
+    file:// URL cannot be fetched over HTTP.
+    """
+    job_id = job["job_id"]
+    payload = job["payload"]
+    local_path = local_object_path(payload["storage_object"]) if payload.get("storage_object") else None
+    if local_path:
+        _transcribe_and_advance(
+            job, file_content_id(hash_file(local_path)),
+            lambda on_segment: transcribe_segments(local_path, on_segment=on_segment),
+        )
+        return
+    if payload.get("video_url"):
+        job_events.publish(job_id, job_events.EVENT_STAGE, {"stage": "extracting_audio"})
+        with metrics.stage("decode_audio"):
+            audio, file_hash = decode_url_to_pcm(payload["video_url"])
+        _transcribe_and_advance(
+            job, file_content_id(file_hash),
+            lambda on_segment: transcribe_audio(audio, on_segment=on_segment),
+        )
+        return
 
-def process_job(file_path, job_id, model_name):
+    file_path = payload["file_path"]
     try:
-        file_hash = None
-        with open(file_path, "rb") as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()
-        cached_transcript = r.get(f"{file_hash}_transcript")
-        cached_summary = r.get(f"{file_hash}_summary")
-        if cached_summary and cached_transcript:
-            cloud_logger.info(f"[DEBUG] Cache hit for job {job_id}")
-            job_results[job_id] = cached_summary.decode()
+        content_id = payload.get("content_id") or file_content_id(hash_file(file_path))
+        _transcribe_and_advance(
+            job, content_id,
+            lambda on_segment: transcribe_segments(file_path, on_segment=on_segment),
+        )
+    finally:
+        if os.path.exists(file_path):
             os.remove(file_path)
-            return
-        cloud_logger.info(f"[DEBUG] Processing job {job_id} with model: {model_name}")
-        start_transcribe = time.time()
-        transcript = transcribe_with_whisper(file_path)
-        duration = time.time() - start_transcribe
-        cloud_logger.info(f"[TIMING] transcribe_with_whisper took {duration:.2f} seconds")
-        start_summarize = time.time()
-        summary = summarize_text(transcript, model_name)
-        cloud_logger.info(f"[TIMING] Summarization took {time.time() - start_summarize:.2f} seconds")
-        r.set(f"{file_hash}_transcript", transcript, ex=172800)
-        r.set(f"{file_hash}_summary", summary, ex=172800)
-        job_results[job_id] = summary
-        os.remove(file_path)
-    except Exception as e:
-        job_results[job_id] = f"Error: {str(e)}"
+
+
+def _summary_cache_key(content_id, model_name):
+    engine = summary_engine(model_name)
+    return summary_key(content_id, engine, summary_version(engine))
+
+
+def _transcribe_and_advance(job, content_id, transcribe):
+    job_id = job["job_id"]
+    cache = get_cache()
+    cached_summary = cache.get(_summary_cache_key(content_id, job["payload"].get("model_name")))
+    if cached_summary:
+        cloud_logger.info(f"[DEBUG] Cache hit for job {job_id}")
+        job_queue.complete(job, cached_summary)
+        job_events.publish(job_id, job_events.EVENT_DONE, {"summary": cached_summary})
+        return
+    if get_transcript(whisper_transcript_key(content_id)) is None:
+        job_events.publish(job_id, job_events.EVENT_STAGE, {"stage": "transcribing"})
+        transcribed_here = []
+
+        def run():
+            cloud_logger.info(f"[DEBUG] Transcribing job {job_id}")
+            transcribed_here.append(True)
+            with metrics.stage("transcribe"):
+                return json.dumps(transcribe(lambda seg: job_events.publish(job_id, job_events.EVENT_SEGMENT, seg)))
+
+        # Identical media submitted concurrently is transcribed by one worker; the others wait for it
+        transcript = compute_once(whisper_transcript_key(content_id), run, wait_timeout=None)
+        if not transcribed_here:
+            for seg in json.loads(transcript)["segments"]:
+                job_events.publish(job_id, job_events.EVENT_SEGMENT, seg)
+    if job_queue.advance(job, job_queue.QUEUE_LLM, {"content_id": content_id}):
+        job_events.publish(job_id, job_events.EVENT_STAGE, {"stage": "queued_for_summary"})
+
+
+_cpu_pool = None
+_cpu_pool_lock = threading.Lock()
+
+
+def _run_on_cpu_pool(fn, *args):
+    """
+    Run `fn` in worker.py's pool of CPU_SUMMARY_PROCESSES processes, which
+    share this process's CPU budget, and wait for its result.
+    """
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is None:
+            _cpu_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=CPU_SUMMARY_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+                initializer=transcriber.set_cpu_budget,
+                initargs=(max(1, transcriber.cpu_budget() // max(1, CPU_SUMMARY_PROCESSES)),),
+            )
+    return _cpu_pool.submit(fn, *args).result()
+
+
+def run_summarize_stage(job):
+    """
+    LLM stage: summarize the cached transcript and store the result on the job.
+    Runs inside worker.py.
+    """
+    job_id = job["job_id"]
+    payload = job["payload"]
+    content_id = payload["content_id"]
+    model_name = payload.get("model_name", "gemini")
+    cache_key = _summary_cache_key(content_id, model_name)
+    job_events.publish(job_id, job_events.EVENT_STAGE, {"stage": "summarizing"})
+
+    def run():
+        transcript = get_transcript(whisper_transcript_key(content_id))
+        if transcript is None:
+            raise RuntimeError("Transcript expired before summarization")
+        cloud_logger.info(f"[DEBUG] Summarizing job {job_id} with model: {model_name}")
+        with metrics.stage("summarize"):
+            if summary_engine(model_name) in CPU_SUMMARY_ENGINES:
+                # LLM worker threads are many and meant for network waits; local models
+                # would oversubscribe the cores the Whisper processes use
+                return _run_on_cpu_pool(summarize_transcript, transcript, model_name)
+            return summarize_with_mindmap(transcript, model_name)
+
+    # Jobs for the same content and model share one summarization
+    summary = get_cache().get(cache_key) or compute_once(cache_key, run, wait_timeout=None)
+    if job_queue.complete(job, summary):
+        _publish_chapters(job_id, summary)
+        job_events.publish(job_id, job_events.EVENT_DONE, {"summary": summary})
+
+
+def _publish_chapters(job_id, summary):
+    try:
+        chapters = json.loads(summary)
+    except (TypeError, ValueError):
+        return
+    if isinstance(chapters, list):
+        for chapter in chapters:
+            job_events.publish(job_id, job_events.EVENT_CHAPTER, chapter)
+
+
+# Handlers used by worker.py for each queue
+STAGE_HANDLERS = {
+    job_queue.QUEUE_WHISPER: run_transcribe_stage,
+    job_queue.QUEUE_LLM: run_summarize_stage,
+}
+
 
 def submit_job_handler():
-    if "file" not in request.files:
+    stream, _ = get_upload(request)
+    if stream is None:
         return jsonify({"error": "No file uploaded"}), 400
-    file = request.files["file"]
-    model_name = request.form.get("model_name", "t5-small")
+    model_name = request.values.get("model_name", "gemini")
+    try:
+        summary_engine(model_name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    webhook_url = request.values.get("webhook_url")
+    webhook_error = webhooks.validate_url(webhook_url)
+    if webhook_error:
+        return jsonify({"error": webhook_error}), 400
     job_id = str(uuid.uuid4())
-    file_path = f"/tmp/{job_id}.mp3"
-    file.save(file_path)
-    Thread(target=process_job, args=(file_path, job_id, model_name)).start()
-    return jsonify({"job_id": job_id})
+    client = admission.client_id(request)
+    # Raw bodies are admitted before a byte is read; their size comes from Content-Length
+    priority = admission.priority_for_size(request.content_length)
+    try:
+        estimated_wait = admission.admit(job_id, client, priority)
+    except admission.AdmissionRejected as e:
+        return admission.rejection_response(e)
+    file_path = os.path.join(JOB_SPOOL_DIR, f"{job_id}.mp3")
+    try:
+        # The hash travels with the job so the worker never rereads the file for it
+        file_hash, size = spool_stream(stream, file_path)
+        if request.content_length is None:
+            priority = admission.priority_for_size(size)
+        job_events.publish(job_id, job_events.EVENT_STAGE, {"stage": "queued"})
+        job_queue.create_job(
+            job_queue.QUEUE_WHISPER,
+            {
+                "file_path": file_path, "model_name": model_name, "content_id": file_content_id(file_hash),
+                "webhook_url": webhook_url,
+            },
+            job_id=job_id, priority=priority, client=client,
+        )
+    except Exception:
+        # No job will ever finish and free the reservation or the spooled file
+        admission.release(job_id, client)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return jsonify({"job_id": job_id, "priority": priority, "estimated_wait_seconds": estimated_wait})
+
+def job_events_handler(job_id):
+    """
+    Stream a job's progress (stage changes, transcript segments, chapters and
+    the final summary) as Server-Sent Events. Honors Last-Event-ID on reconnect.
+    """
+    if job_queue.get_job(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID", "0"))
+    except ValueError:
+        last_event_id = 0
+    if not job_events.try_hold_open():
+        metrics.inc("event_streams_rejected_total")
+        response = jsonify({"error": "Too many open event streams; retry later or poll /job-result"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(job_events.KEEPALIVE_SECONDS)
+        return response
+    response = Response(
+        stream_with_context(job_events.stream(job_id, last_event_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs however the stream ends, even if the client left before it started
+    response.call_on_close(job_events.release_hold)
+    return response
+
+def job_result_body(job):
+    if job["state"] == job_queue.STATE_DONE:
+        return {"summary": job["result"]}
+    if job["state"] == job_queue.STATE_FAILED:
+        return {"summary": f"Error: {job.get('error', '')}", "status": job["state"]}
+    return {"status": "processing", "state": job["state"]}
+
+
+def is_finished(job):
+    return job is not None and job["state"] in (job_queue.STATE_DONE, job_queue.STATE_FAILED)
+
+
+def parse_wait(value):
+    """
+    The ?wait= long-poll timeout in seconds, capped at JOB_RESULT_MAX_WAIT; raises ValueError.
+    """
+    wait = float(value or 0)
+    return max(0.0, min(wait, JOB_RESULT_MAX_WAIT))
+
 
 def job_result_handler(job_id):
-    if job_id in job_results:
-        return jsonify({"summary": job_results[job_id]})
-    return jsonify({"status": "processing"})
+    """
+    Return the job's summary, error or current state. With ?wait=<seconds>, an
+    unfinished job is held open until it finishes or the wait runs out, unless
+    this process already holds EVENT_STREAM_MAX_CONCURRENT requests open.
+    """
+    try:
+        wait = parse_wait(request.args.get("wait"))
+    except ValueError:
+        return jsonify({"error": "Invalid wait"}), 400
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if wait and not is_finished(job):
+        if not job_events.try_hold_open():
+            # Answer at once rather than take the last free threads
+            metrics.inc("job_result_waits_total", outcome="rejected")
+            return jsonify(job_result_body(job))
+        try:
+            finished = job_events.wait_for_terminal(job_id, wait, lambda: is_finished(job_queue.get_job(job_id)))
+        finally:
+            job_events.release_hold()
+        metrics.inc("job_result_waits_total", outcome="finished" if finished else "timeout")
+        job = job_queue.get_job(job_id) or job
+    return jsonify(job_result_body(job))
 
 
 def submit_video_to_summarize_handler():
     """
-    Enqueue a video summarization job by downloading the video,
-    extracting audio via ffmpeg, then processing it.
+    Enqueue a video summarization job. Downloading the video and extracting
+    its audio happen in the worker, so this returns as soon as the job is queued.
     Expects JSON with 'id', 'title', 'thumbnailUrl', and 'videoUrl'.
     """
     data = request.get_json()
     # Validate payload
     if not data or not all(k in data for k in ("id", "title", "thumbnailUrl", "videoUrl")):
         return jsonify({"error": "Missing one of id, title, thumbnailUrl, videoUrl"}), 400
+    try:
+        summary_engine(data.get("model_name", "gemini"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    webhook_url = data.get("webhook_url")
+    webhook_error = webhooks.validate_url(webhook_url)
+    if webhook_error:
+        return jsonify({"error": webhook_error}), 400
+    try:
+        job_id, estimated_wait = enqueue_video_job(
+            data["videoUrl"], data["id"], data.get("model_name", "gemini"), admission.client_id(request),
+            webhook_url=webhook_url,
+        )
+    except admission.AdmissionRejected as e:
+        return admission.rejection_response(e)
+    return jsonify({"job_id": job_id, "estimated_wait_seconds": estimated_wait})
+
+
+def enqueue_video_job(video_url, video_id, model_name, client, size_bytes=None, webhook_url=None,
+                      storage_object=None):
+    """
+    Queue a summarization job for a stored video, optionally with a completion webhook.
+    `storage_object` names the video in our own bucket, for uploads the worker can read directly.
+    Returns (job ID, estimated wait in seconds); raises admission.AdmissionRejected at capacity.
+    """
     job_id = str(uuid.uuid4())
-    video_url = data["videoUrl"]
-    # Download video to temp file
-    video_path = f"/tmp/{job_id}_video"
-    resp = requests.get(video_url, stream=True)
-    if resp.status_code != 200:
-        return jsonify({"error": "Failed to download video"}), resp.status_code
-    with open(video_path, "wb") as vf:
-        for chunk in resp.iter_content(chunk_size=8192):
-            vf.write(chunk)
-    # Extract audio to WAV
-    audio_path = f"/tmp/{job_id}.wav"
-    ffmpeg.input(video_path).output(
-        audio_path, format="wav", acodec="pcm_s16le", ar="16000", ac=1
-    ).run(overwrite_output=True)
-    os.remove(video_path)
-    # Enqueue processing of the audio file
-    Thread(target=process_job, args=(audio_path, job_id, data.get("model_name", "gemini"))).start()
-    return jsonify({"job_id": job_id})
\ No newline at end of file
+    priority = admission.priority_for_size(size_bytes)
+    estimated_wait = admission.admit(job_id, client, priority)
+    try:
+        job_queue.create_job(
+            job_queue.QUEUE_WHISPER,
+            {"video_url": video_url, "video_id": video_id, "model_name": model_name, "webhook_url": webhook_url,
+             "storage_object": storage_object},
+            job_id=job_id, priority=priority, client=client,
+        )
+    except Exception:
+        admission.release(job_id, client)
+        raise
+    job_events.publish(job_id, job_events.EVENT_STAGE, {"stage": "queued"})
+    return job_id, estimated_wait
@@ -0,0 +1,331 @@
+"""
+Durable Redis-backed job queue shared by the web tier and worker.py.
+
+Every job is a hash at job:<id> that holds its state, payload and result.
+Jobs waiting for a worker sit in one list per queue and priority class
+(jobs:pending:<queue>:<priority>, or jobs:pending:<queue> for "normal").
+Workers always take from the highest class that has work. A claimed job
+moves into the sorted set jobs:leases:<queue>, scored by its lease deadline.
+If a worker dies, its lease expires and the job goes back on the queue, until
+it has been handed out JOB_MAX_ATTEMPTS times in the same stage.
+Jobs submitted on behalf of a client are tracked in jobs:client:<client>
+until they finish, for the per-client quotas in admission.py. A job whose
+payload has a webhook_url gets a completion webhook queued when it finishes.
+"""
+import json
+import time
+import uuid
+
+import job_events
+from config import JOB_VISIBILITY_TIMEOUT, JOB_MAX_ATTEMPTS, JOB_RESULT_TTL, DEFAULT_JOB_SECONDS
+from redis_store import get_redis, get_async_redis
+
+QUEUE_WHISPER = "whisper"
+QUEUE_LLM = "llm"
+QUEUES = (QUEUE_WHISPER, QUEUE_LLM)
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+# Priority classes, highest first
+PRIORITY_HIGH = "high"
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+PRIORITIES = (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+
+JOB_KEY_PREFIX = "job:"
+# Weight of the latest job in the per-queue average duration
+DURATION_EWMA_ALPHA = 0.2
+
+# Pop the oldest pending job of the highest non-empty priority and take a lease
+# on it in one step, so a job can never be popped without also being tracked
+# in the lease set. KEYS: lease set, then pending lists in priority order.
+_CLAIM_SCRIPT = """
+local job_id = false
+for i = 2, #KEYS do
+    job_id = redis.call('RPOP', KEYS[i])
+    if job_id then
+        break
+    end
+end
+if not job_id then
+    return false
+end
+local job_key = ARGV[1] .. job_id
+redis.call('ZADD', KEYS[1], ARGV[2], job_id)
+redis.call('HSET', job_key, 'state', 'running', 'lease', ARGV[3], 'updated_at', ARGV[4])
+redis.call('HINCRBY', job_key, 'attempts', 1)
+return job_id
+"""
+
+# Apply a state transition only if the caller still holds the lease.
+# KEYS: lease set, then optionally the pending list to put the job on, so a job
+# moving to its next stage is never out of both the lease set and every list.
+# A job moving on starts the next stage with a fresh attempts count, so Whisper
+# retries never use up its LLM retries.
+# ARGV: job key prefix, job id, lease token, then field/value pairs.
+_FINISH_SCRIPT = """
+local job_key = ARGV[1] .. ARGV[2]
+if redis.call('HGET', job_key, 'lease') ~= ARGV[3] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[2])
+redis.call('HDEL', job_key, 'lease')
+for i = 4, #ARGV, 2 do
+    redis.call('HSET', job_key, ARGV[i], ARGV[i + 1])
+end
+if KEYS[2] then
+    redis.call('HSET', job_key, 'attempts', 0)
+    redis.call('LPUSH', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+# Requeue (or fail) a job whose lease has expired, in its own priority class.
+# KEYS: lease set, then pending lists in PRIORITIES order.
+# ARGV: job key prefix, job id, now, max attempts, then the PRIORITIES names.
+_REAP_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[2])
+if not score or tonumber(score) > tonumber(ARGV[3]) then
+    return 0
+end
+local job_key = ARGV[1] .. ARGV[2]
+redis.call('ZREM', KEYS[1], ARGV[2])
+redis.call('HDEL', job_key, 'lease')
+local attempts = tonumber(redis.call('HGET', job_key, 'attempts') or '0')
+if attempts >= tonumber(ARGV[4]) then
+    redis.call('HSET', job_key, 'state', 'failed', 'error', 'Lease expired too many times', 'updated_at', ARGV[3])
+    return 2
+end
+redis.call('HSET', job_key, 'state', 'queued', 'updated_at', ARGV[3])
+local priority = redis.call('HGET', job_key, 'priority') or ARGV[6]
+local pending = KEYS[3]
+for i = 5, #ARGV do
+    if ARGV[i] == priority then
+        pending = KEYS[i - 3]
+    end
+end
+redis.call('LPUSH', pending, ARGV[2])
+return 1
+"""
+
+
+def _job_key(job_id):
+    return f"{JOB_KEY_PREFIX}{job_id}"
+
+
+def pending_key(queue, priority=PRIORITY_NORMAL):
+    # "normal" keeps the original list name, so jobs queued before priorities existed are still claimed
+    if priority == PRIORITY_NORMAL:
+        return f"jobs:pending:{queue}"
+    return f"jobs:pending:{queue}:{priority}"
+
+
+def _pending_keys(queue):
+    return [pending_key(queue, priority) for priority in PRIORITIES]
+
+
+def _leases_key(queue):
+    return f"jobs:leases:{queue}"
+
+
+def client_jobs_key(client):
+    return f"jobs:client:{client}"
+
+
+def _stats_key(queue):
+    return f"jobs:stats:{queue}"
+
+
+def create_job(queue, payload, job_id=None, priority=PRIORITY_NORMAL, client=None):
+    """
+    Store a new job and put it on `queue` in the given priority class. Returns the job ID.
+    """
+    r = get_redis()
+    job_id = job_id or str(uuid.uuid4())
+    now = str(time.time())
+    pipe = r.pipeline(transaction=True)
+    pipe.hset(_job_key(job_id), mapping={
+        "state": STATE_QUEUED,
+        "queue": queue,
+        "priority": priority,
+        "client": client or "",
+        "payload": json.dumps(payload),
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now,
+    })
+    pipe.lpush(pending_key(queue, priority), job_id)
+    pipe.execute()
+    return job_id
+
+
+def get_job(job_id):
+    """
+    Return the job record as a dict (payload decoded), or None if it is unknown or expired.
+    """
+    return _decode_job(job_id, get_redis().hgetall(_job_key(job_id)))
+
+
+async def aget_job(job_id):
+    """
+    get_job() for the async server (asgi.py).
+    """
+    return _decode_job(job_id, await get_async_redis().hgetall(_job_key(job_id)))
+
+
+def _decode_job(job_id, data):
+    if not data:
+        return None
+    data["job_id"] = job_id
+    data["payload"] = json.loads(data.get("payload") or "{}")
+    return data
+
+
+def claim(queue, block_timeout=5.0, poll_interval=0.25):
+    """
+    Take a lease on the oldest pending job in `queue`.
+    Waits up to `block_timeout` seconds and returns the job dict or None.
+    The returned dict carries the lease token needed by advance/complete/fail.
+    """
+    r = get_redis()
+    deadline = time.time() + block_timeout
+    while True:
+        now = time.time()
+        lease = uuid.uuid4().hex
+        job_id = r.eval(
+            _CLAIM_SCRIPT, 1 + len(PRIORITIES), _leases_key(queue), *_pending_keys(queue),
+            JOB_KEY_PREFIX, now + JOB_VISIBILITY_TIMEOUT, lease, now,
+        )
+        if job_id:
+            job = get_job(job_id)
+            if job is not None:
+                job["lease"] = lease
+                return job
+        if now >= deadline:
+            return None
+        time.sleep(poll_interval)
+
+
+def extend_lease(job):
+    """
+    Push the lease deadline of a running job forward. Returns False if the lease was lost.
+    """
+    r = get_redis()
+    if r.hget(_job_key(job["job_id"]), "lease") != job["lease"]:
+        return False
+    r.zadd(_leases_key(job["queue"]), {job["job_id"]: time.time() + JOB_VISIBILITY_TIMEOUT}, xx=True)
+    return True
+
+
+def _finish(job, fields, next_pending=None):
+    keys = [_leases_key(job["queue"])] + ([next_pending] if next_pending else [])
+    args = [JOB_KEY_PREFIX, job["job_id"], job["lease"]]
+    for name, value in fields.items():
+        args.extend([name, value])
+    return bool(get_redis().eval(_FINISH_SCRIPT, len(keys), *keys, *args))
+
+
+def advance(job, next_queue, payload_updates=None):
+    """
+    Release the lease on `job` and put it on `next_queue` for its next stage.
+    """
+    payload = dict(job["payload"])
+    payload.update(payload_updates or {})
+    return _finish(job, {
+        "state": STATE_QUEUED,
+        "queue": next_queue,
+        "payload": json.dumps(payload),
+        "updated_at": str(time.time()),
+    }, next_pending=pending_key(next_queue, job.get("priority") or PRIORITY_NORMAL))
+
+
+def release_client(job_id, client):
+    """
+    Stop counting `job_id` against `client`'s quota.
+    """
+    if client:
+        get_redis().zrem(client_jobs_key(client), job_id)
+
+
+def _finished(job_id, client, payload):
+    get_redis().expire(_job_key(job_id), JOB_RESULT_TTL)
+    release_client(job_id, client)
+    if payload.get("webhook_url"):
+        import webhooks  # imported here: webhooks reads jobs through this module
+        webhooks.schedule(job_id, payload["webhook_url"])
+
+
+def complete(job, result):
+    """
+    Mark `job` done and store its result.
+    """
+    done = _finish(job, {"state": STATE_DONE, "result": result, "updated_at": str(time.time())})
+    if done:
+        _finished(job["job_id"], job.get("client"), job["payload"])
+    return done
+
+
+def fail(job, error):
+    """
+    Mark `job` failed and store the error message.
+    """
+    failed = _finish(job, {"state": STATE_FAILED, "error": error, "updated_at": str(time.time())})
+    if failed:
+        _finished(job["job_id"], job.get("client"), job["payload"])
+    return failed
+
+
+def reap_expired(queue):
+    """
+    Requeue jobs in `queue` whose lease has expired. Returns how many were requeued.
+    """
+    r = get_redis()
+    now = time.time()
+    requeued = 0
+    for job_id in r.zrangebyscore(_leases_key(queue), 0, now):
+        outcome = r.eval(
+            _REAP_SCRIPT, 1 + len(PRIORITIES), _leases_key(queue), *_pending_keys(queue),
+            JOB_KEY_PREFIX, job_id, now, JOB_MAX_ATTEMPTS, *PRIORITIES,
+        )
+        if outcome == 1:
+            requeued += 1
+        elif outcome == 2:
+            client, payload = r.hmget(_job_key(job_id), "client", "payload")
+            _finished(job_id, client, json.loads(payload or "{}"))
+            job_events.publish(job_id, job_events.EVENT_FAILED, {"error": "Lease expired too many times"})
+    return requeued
+
+
+def queue_depth(queue, priorities=PRIORITIES):
+    """
+    Jobs waiting in `queue`, counting only the given priority classes.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    for priority in priorities:
+        pipe.llen(pending_key(queue, priority))
+    return sum(pipe.execute())
+
+
+def running_count(queue):
+    return get_redis().zcard(_leases_key(queue))
+
+
+def record_duration(queue, seconds):
+    """
+    Fold a finished job's duration into the queue's moving average.
+    """
+    r = get_redis()
+    previous = r.hget(_stats_key(queue), "avg_seconds")
+    average = seconds if previous is None else (1 - DURATION_EWMA_ALPHA) * float(previous) + DURATION_EWMA_ALPHA * seconds
+    r.hset(_stats_key(queue), "avg_seconds", average)
+
+
+def average_duration(queue):
+    """
+    Moving average of job durations on `queue`, or DEFAULT_JOB_SECONDS before any job finished.
+    """
+    value = get_redis().hget(_stats_key(queue), "avg_seconds")
+    return float(value) if value is not None else DEFAULT_JOB_SECONDS[queue]
@@ -0,0 +1,234 @@
+"""
+Shared LLM client used by the summarizer and the mind-map generator.
+
+One backend client is built per process and reused for every call. Calls are
+limited by a process-wide concurrency semaphore and a token-bucket rate
+limit. Transient errors are retried with jittered exponential backoff within
+a per-call deadline. LLM_BACKEND=stub swaps Vertex AI for an in-process stub
+with configurable latency, so the whole pipeline can be load-tested offline.
+"""
+import json
+import logging
+import random
+import threading
+import time
+
+import metrics
+from config import (
+    LLM_BACKEND,
+    GEMINI_PROJECT,
+    GEMINI_LOCATION,
+    GEMINI_MODEL,
+    LLM_MAX_CONCURRENCY,
+    LLM_RATE_PER_SECOND,
+    LLM_BURST,
+    LLM_MAX_RETRIES,
+    LLM_TIMEOUT_SECONDS,
+    LLM_BACKOFF_BASE_SECONDS,
+    LLM_BACKOFF_MAX_SECONDS,
+    LLM_STUB_LATENCY_MS,
+    LLM_STUB_JITTER_MS,
+)
+
+logger = logging.getLogger("cloudLogger")
+
+# Output kinds callers can ask for; the stub backend uses them to pick a canned reply
+KIND_TEXT = "text"
+KIND_CHAPTERS = "chapters"
+KIND_MINDMAP = "mindmap"
+KIND_CHAPTERS_MINDMAP = "chapters+mindmap"
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class TransientLLMError(LLMError):
+    """
+    An error worth retrying (rate limiting, timeouts, 5xx).
+    """
+
+
+class LLMDeadlineExceeded(LLMError):
+    pass
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, at most `burst` saved up.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                raise LLMDeadlineExceeded("Deadline exceeded waiting for LLM rate limit")
+            time.sleep(wait)
+
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self):
+        from google import genai
+        self._client = genai.Client(vertexai=True, project=GEMINI_PROJECT, location=GEMINI_LOCATION)
+
+    def generate(self, prompt, kind, timeout, schema=None):
+        from google.genai import types
+        from google.genai import errors
+
+        config = types.GenerateContentConfig(
+            http_options=types.HttpOptions(timeout=int(timeout * 1000)),
+        )
+        if schema is not None:
+            # Constrain decoding to JSON matching the schema
+            config.response_mime_type = "application/json"
+            config.response_schema = schema
+        try:
+            response = self._client.models.generate_content(model=GEMINI_MODEL, contents=prompt, config=config)
+        except errors.APIError as e:
+            if e.code in TRANSIENT_STATUS_CODES:
+                raise TransientLLMError(str(e)) from e
+            raise LLMError(str(e)) from e
+        except (TimeoutError, ConnectionError) as e:
+            raise TransientLLMError(str(e)) from e
+        except Exception as e:
+            # httpx transport errors (timeouts, resets) surface under their own types
+            if type(e).__module__.startswith("httpx"):
+                raise TransientLLMError(str(e)) from e
+            raise
+        usage = response.usage_metadata
+        if usage is not None:
+            metrics.inc("llm_tokens_total", usage.prompt_token_count or 0, backend=self.name, direction="prompt")
+            metrics.inc("llm_tokens_total", usage.candidates_token_count or 0, backend=self.name, direction="output")
+        return response.text
+
+
+class StubBackend:
+    """
+    Offline stand-in that sleeps for LLM_STUB_LATENCY_MS (+/- jitter) and
+    returns well-formed output for each kind.
+    """
+    name = "stub"
+
+    def __init__(self, latency_ms=LLM_STUB_LATENCY_MS, jitter_ms=LLM_STUB_JITTER_MS):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+    def generate(self, prompt, kind, timeout, schema=None):
+        delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        if delay > timeout:
+            time.sleep(timeout)
+            raise TransientLLMError("Stub backend timed out")
+        time.sleep(delay)
+        response = self._response(prompt, kind)
+        # Rough token counts (about 4 characters per token) so load tests exercise the metrics
+        metrics.inc("llm_tokens_total", len(prompt) // 4, backend=self.name, direction="prompt")
+        metrics.inc("llm_tokens_total", len(response) // 4, backend=self.name, direction="output")
+        return response
+
+    def _response(self, prompt, kind):
+        chapters = [
+            {"chapterTitle": "Chapter 1: Introduction", "startTime": "00:00:00",
+             "chapterSummary": "Stub summary of the opening part of the content."},
+            {"chapterTitle": "Chapter 2: Main Points", "startTime": "00:01:00",
+             "chapterSummary": "Stub summary of the main part of the content."},
+        ]
+        point = {"label": "💡 Point", "narration": "A stub point."}
+        mindmap = {
+            "central": {"label": "🧠 Topic", "narration": "A stub central topic."},
+            "branches": [
+                {"label": "📘 Branch", "narration": "A stub branch.", "points": [point, point]},
+            ],
+        }
+        if kind == KIND_CHAPTERS:
+            return json.dumps(chapters)
+        if kind == KIND_MINDMAP:
+            return json.dumps(mindmap)
+        if kind == KIND_CHAPTERS_MINDMAP:
+            return json.dumps({"chapters": chapters, "mindmap": mindmap})
+        return prompt[:200]
+
+
+_BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+
+
+class LLMClient:
+    def __init__(self, backend, max_concurrency=LLM_MAX_CONCURRENCY, rate_per_second=LLM_RATE_PER_SECOND,
+                 burst=LLM_BURST, max_retries=LLM_MAX_RETRIES):
+        self.backend = backend
+        self.max_retries = max_retries
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_second, burst)
+
+    def generate(self, prompt, kind=KIND_TEXT, timeout=LLM_TIMEOUT_SECONDS, schema=None):
+        """
+        Send `prompt` and return the response text. `timeout` bounds the whole
+        call, including queueing behind the concurrency and rate limits and retries.
+        `schema` (see structured_output.py) asks for JSON output matching it.
+        """
+        labels = {"backend": self.backend.name, "kind": kind}
+        outcome = "error"
+        try:
+            with metrics.timer("llm_request_duration_seconds", **labels):
+                result = self._generate(prompt, kind, timeout, schema)
+            outcome = "ok"
+            return result
+        except LLMDeadlineExceeded:
+            outcome = "deadline"
+            raise
+        finally:
+            metrics.inc("llm_requests_total", outcome=outcome, **labels)
+
+    def _generate(self, prompt, kind, timeout, schema):
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._semaphore.acquire(timeout=remaining):
+                raise LLMDeadlineExceeded("Deadline exceeded waiting for an LLM slot")
+            try:
+                self._bucket.acquire(deadline)
+                return self.backend.generate(prompt, kind, deadline - time.monotonic(), schema)
+            except TransientLLMError as e:
+                attempt += 1
+                metrics.inc("llm_transient_errors_total", backend=self.backend.name, kind=kind)
+                if attempt > self.max_retries:
+                    raise
+                # Full jitter: sleep a random amount up to the exponential cap
+                backoff = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+                if time.monotonic() + backoff >= deadline:
+                    raise LLMDeadlineExceeded(f"Deadline exceeded after {attempt} attempts: {e}") from e
+                logger.warning(f"[LLM] Transient error from {self.backend.name} (attempt {attempt}), retrying in {backoff:.2f}s: {e}")
+            finally:
+                self._semaphore.release()
+            time.sleep(backoff)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(_BACKENDS[LLM_BACKEND]())
+    return _client
@@ -0,0 +1,261 @@
+"""
+Lightweight metrics exposed in the Prometheus text format on /metrics.
+
+Counters and histograms are kept in memory; recording one costs a dict update
+under a lock. Every process (gunicorn workers, worker.py and its Whisper
+processes) periodically writes a snapshot of its series to Redis, and /metrics
+sums the live snapshots so one scrape covers the whole deployment. Gauges
+such as queue depth are read at scrape time by registered collectors.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from cloud_log import cloud_logger
+from config import METRICS_FLUSH_SECONDS
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+SNAPSHOT_KEY_PREFIX = "metrics:snapshot:"
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# name -> (type, help text)
+DEFINITIONS = {
+    "http_requests_total": (COUNTER, "HTTP requests by route, method and status."),
+    "http_request_duration_seconds": (HISTOGRAM, "HTTP request latency by route and method."),
+    "stage_duration_seconds": (HISTOGRAM, "Latency of pipeline stages (download, decode, transcribe, summarize, ...)."),
+    "stage_errors_total": (COUNTER, "Pipeline stages that raised an exception."),
+    "job_duration_seconds": (HISTOGRAM, "Time a worker spent on one job stage, by queue."),
+    "jobs_total": (COUNTER, "Job stages handled by worker.py, by queue and outcome."),
+    "bytes_processed_total": (COUNTER, "Media bytes read, by source."),
+    "audio_seconds_transcribed_total": (COUNTER, "Seconds of audio transcribed by Whisper, by mode."),
+    "cache_events_total": (COUNTER, "Cache hits, misses, sets and evictions."),
+    "redis_duration_seconds": (HISTOGRAM, "Latency of cache Redis calls, by operation."),
+    "llm_requests_total": (COUNTER, "LLM calls by backend, kind and outcome."),
+    "llm_request_duration_seconds": (HISTOGRAM, "LLM call latency including queueing and retries."),
+    "llm_transient_errors_total": (COUNTER, "Transient LLM errors (retried or not), by backend and kind."),
+    "llm_tokens_total": (COUNTER, "LLM tokens by backend and direction (prompt or output)."),
+    "structured_output_repairs_total": (COUNTER, "Truncated LLM JSON replies closed at the last complete element."),
+    "structured_output_dropped_total": (COUNTER, "Invalid chapters, branches or points dropped from LLM replies."),
+    "structured_output_errors_total": (COUNTER, "LLM JSON replies with nothing usable, by kind."),
+    "ingest_total": (COUNTER, "/download-youtube-and-submit outcomes (cached, exists, uploaded)."),
+    "upload_sessions_total": (COUNTER, "Direct-to-bucket upload sessions created and completed, by kind."),
+    "singleflight_total": (COUNTER, "Single-flight computations by role (leader, follower, timeout)."),
+    "singleflight_wait_seconds": (HISTOGRAM, "Time followers waited for a single-flight leader."),
+    "queue_depth": (GAUGE, "Jobs waiting in each queue, by priority class."),
+    "admission_total": (COUNTER, "Job submissions admitted or refused with 429, by outcome and priority."),
+    "webhook_deliveries_total": (COUNTER, "Job completion webhook attempts, by outcome (delivered, retried, dropped, expired, blocked)."),
+    "webhook_duration_seconds": (HISTOGRAM, "Time spent on one webhook delivery attempt."),
+    "job_result_waits_total": (COUNTER, "/job-result long-polls, by outcome (finished, timeout, or rejected at the cap)."),
+    "event_streams_rejected_total": (COUNTER, "/job-events streams refused with 503 at EVENT_STREAM_MAX_CONCURRENT."),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_collectors = []
+_flusher_pid = None
+
+
+def _series_key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _series_key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    key = _series_key(name, labels)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                series[0][i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a pipeline stage into stage_duration_seconds{stage=name}.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("stage_errors_total", stage=name)
+        raise
+    finally:
+        observe("stage_duration_seconds", time.perf_counter() - start, stage=name)
+
+
+def register_collector(fn):
+    """
+    Register `fn()` -> iterable of (name, labels dict, value), called on each scrape.
+    """
+    _collectors.append(fn)
+
+
+def _snapshot():
+    with _lock:
+        return {
+            "counters": [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            "histograms": [
+                [name, list(labels), list(buckets), total, count]
+                for (name, labels), (buckets, total, count) in _histograms.items()
+            ],
+        }
+
+
+def _snapshot_key():
+    return f"{SNAPSHOT_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+
+
+def flush():
+    from redis_store import get_redis
+    get_redis().set(_snapshot_key(), json.dumps(_snapshot()), ex=int(max(60, METRICS_FLUSH_SECONDS * 4)))
+
+
+def start_flusher():
+    """
+    Publish this process's series to Redis every METRICS_FLUSH_SECONDS.
+    Safe to call more than once; starts one thread per process.
+    """
+    global _flusher_pid
+    if _flusher_pid == os.getpid() or METRICS_FLUSH_SECONDS <= 0:
+        return
+    _flusher_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                flush()
+            except Exception as e:
+                cloud_logger.error(f"[METRICS] Snapshot flush failed: {e}")
+
+    threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+
+
+def _merge(snapshots):
+    counters = {}
+    histograms = {}
+    for snap in snapshots:
+        for name, labels, value in snap["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in snap["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(key, [[0] * len(LATENCY_BUCKETS), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms
+
+
+def _remote_snapshots():
+    from redis_store import get_redis
+    redis_client = get_redis()
+    own = _snapshot_key()
+    keys = [k for k in redis_client.scan_iter(match=f"{SNAPSHOT_KEY_PREFIX}*", count=100) if k != own]
+    if not keys:
+        return []
+    return [json.loads(v) for v in redis_client.mget(keys) if v]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """
+    Return every series in the Prometheus text exposition format.
+    """
+    snapshots = [_snapshot()]
+    try:
+        snapshots += _remote_snapshots()
+    except Exception as e:
+        cloud_logger.error(f"[METRICS] Reading snapshots from Redis failed: {e}")
+    counters, histograms = _merge(snapshots)
+
+    gauges = {}
+    for collector in _collectors:
+        try:
+            for name, labels, value in collector():
+                gauges[_series_key(name, labels)] = value
+        except Exception as e:
+            cloud_logger.error(f"[METRICS] Collector failed: {e}")
+
+    by_name = {}
+    for kind, series in ((COUNTER, counters), (GAUGE, gauges), (HISTOGRAM, histograms)):
+        for (name, labels), value in series.items():
+            by_name.setdefault((name, kind), []).append((labels, value))
+
+    lines = []
+    for name, kind in sorted(by_name):
+        help_text = DEFINITIONS.get(name, (kind, name))[1]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[(name, kind)], key=lambda item: item[0]):
+            if kind != HISTOGRAM:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            buckets, total, count = value
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """
+    Record http_requests_total and http_request_duration_seconds for every Flask route.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            observe("http_request_duration_seconds", time.perf_counter() - start, route=route, method=request.method)
+            inc("http_requests_total", route=route, method=request.method, status=response.status_code)
+        return response
@@ -1,6 +1,5 @@
-import os
-import json
-import re
+from llm_client import KIND_MINDMAP
+from structured_output import MINDMAP_SCHEMA, clean_mindmap, generate_structured
 # from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
 
 # Set your Hugging Face token as an environment variable: HF_TOKEN
@@ -104,30 +103,15 @@ def generate_mindmap_mistral(summary_text):
 
 
 def generate_mindmap_gemini(summary_text):
-    from google import genai
-    from google.genai import types
-
-    genai_client = genai.Client(
-        vertexai=True,
-        project="secure-garden-460600-u4",
-        location="us-east4",
-    )
-
     prompt = PROMPT_TEMPLATE.format(summary=summary_text)
     print(f"[DEBUG] Prompt for Gemini GenAI SDK:\n{prompt}")
 
-    chat = genai_client.chats.create(model="gemini-2.0-flash-001")
-    response = chat.send_message(prompt)
-    result = response.text.strip()
-    print(f"[DEBUG] Gemini GenAI SDK response:\n{result}")
-
-    # Updated regex to support deeply nested JSON with narration fields in central, branches, and points
-    json_match = re.search(r'(\{.*"central".*"branches".*\}[\s\n]*)', result, re.DOTALL)
-    if not json_match:
-        raise ValueError("Mind map JSON not found in Gemini model output.")
-    json_str = json_match.group(1)
-    print(f"[DEBUG] Extracted mind map JSON:\n{json_str}")
-    try:
-        return json.loads(json_str)
-    except Exception as e:
-        raise RuntimeError(f"[ERROR] Failed to parse Gemini model output: {e}")
\ No newline at end of file
+    return generate_structured(prompt, KIND_MINDMAP, MINDMAP_SCHEMA, clean_mindmap)
+
+
+# model_type values accepted by /generate-mindmap
+MINDMAP_GENERATORS = {
+    "transformer": generate_mindmap_transformer,
+    "mistral": generate_mindmap_mistral,
+    "gemini": generate_mindmap_gemini,
+}
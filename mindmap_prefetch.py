@@ -0,0 +1,63 @@
+"""
+Have a summary's mind map ready before the client asks for it.
+
+With SUMMARY_MINDMAP_MODE=eager, mind-map generation starts as soon as a
+Gemini summary exists; with "fused", chapters and the mind map come back
+from one LLM call (map-reduced transcripts fall back to eager). Either way
+the mind map is cached under the key /generate-mindmap uses for the
+returned summary, so the client's follow-up request is a cache hit, or
+joins the generation still in flight through singleflight.
+"""
+import threading
+
+from cache import get_cache, mindmap_key
+from cloud_log import cloud_logger
+from config import SUMMARY_MINDMAP_MODE, MINDMAP_CACHE_TTL
+from mindmap_generator import generate_mindmap_gemini
+from singleflight import compute_once
+from structured_output import dumps
+from summarize import summarize_transcript, summarize_transcript_fused, summary_engine
+
+# Fused and eager mind maps come from Gemini, so they are stored as model_type "gemini"
+MINDMAP_MODEL_TYPE = "gemini"
+
+
+def prefetch_mindmap(summary, background=True):
+    """
+    Generate and cache the mind map /generate-mindmap would build for `summary`.
+    """
+    summary = summary.strip()
+
+    def run():
+        try:
+            compute_once(
+                mindmap_key(MINDMAP_MODEL_TYPE, summary),
+                lambda: dumps(generate_mindmap_gemini(summary)),
+                ttl=MINDMAP_CACHE_TTL,
+            )
+        except Exception as e:
+            cloud_logger.error(f"[MINDMAP] Eager mind map generation failed: {e}")
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="mindmap-prefetch", daemon=True)
+    thread.start()
+    return thread
+
+
+def summarize_with_mindmap(transcript, model_name="gemini", background=True):
+    """
+    summarize_transcript(), plus the mind map SUMMARY_MINDMAP_MODE asks for.
+    """
+    if SUMMARY_MINDMAP_MODE == "off" or summary_engine(model_name) != "gemini":
+        return summarize_transcript(transcript, model_name)
+    if SUMMARY_MINDMAP_MODE == "fused":
+        summary, mindmap = summarize_transcript_fused(transcript)
+        if mindmap is not None:
+            get_cache().set(mindmap_key(MINDMAP_MODEL_TYPE, summary.strip()), dumps(mindmap), ttl=MINDMAP_CACHE_TTL)
+            return summary
+    else:
+        summary = summarize_transcript(transcript, model_name)
+    prefetch_mindmap(summary, background)
+    return summary
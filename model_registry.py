@@ -0,0 +1,112 @@
+"""
+Process-wide registry of the local models (the Whisper engine and T5).
+
+Each model is loaded once per process on first use and shared by every route
+and worker thread. Load time and the resident memory it added are recorded
+for /model-stats.
+"""
+import logging
+import threading
+import time
+
+from config import T5_MODEL_NAME, T5_NUM_THREADS
+from whisper_engines import create_engine
+
+logger = logging.getLogger("cloudLogger")
+
+_models = {}
+_stats = {}
+_locks = {"whisper": threading.Lock(), "t5": threading.Lock()}
+
+
+def current_rss_mb():
+    """
+    Resident set size of this process in MB (Linux /proc, falling back to peak RSS).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _get_or_load(name, loader, describe):
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _locks[name]:
+        model = _models.get(name)
+        if model is not None:
+            return model
+        rss_before = current_rss_mb()
+        start = time.time()
+        model = loader()
+        load_seconds = time.time() - start
+        _stats[name] = {
+            **describe,
+            "load_seconds": round(load_seconds, 3),
+            "rss_delta_mb": round(current_rss_mb() - rss_before, 1),
+        }
+        logger.info(f"[MODELS] Loaded {name} {describe} in {load_seconds:.2f} seconds")
+        _models[name] = model
+        return model
+
+
+def get_whisper_engine(cpu_threads=None):
+    """
+    The WHISPER_ENGINE transcription engine, loaded on first use. `cpu_threads`
+    overrides WHISPER_CPU_THREADS and only applies to that first load.
+    """
+    engine = _models.get("whisper")
+    if engine is not None:
+        return engine
+    engine = create_engine(**({"cpu_threads": cpu_threads} if cpu_threads else {}))
+    return _get_or_load("whisper", engine.load, engine.describe())
+
+
+def get_t5_summarizer():
+    def load():
+        import torch
+        from transformers import pipeline
+        import transcriber
+        # Process-wide setting: bounds intra-op threads for every torch model here
+        torch.set_num_threads(T5_NUM_THREADS or transcriber.cpu_budget())
+        return pipeline("summarization", model=T5_MODEL_NAME)
+    return _get_or_load("t5", load, {"model": T5_MODEL_NAME})
+
+
+_LOADERS = {"whisper": get_whisper_engine, "t5": get_t5_summarizer}
+
+
+def warmup(names, background=True):
+    """
+    Load the named models ("whisper", "t5") ahead of the first request.
+    """
+    def run():
+        for name in names:
+            try:
+                _LOADERS[name]()
+            except Exception as e:
+                logger.error(f"[MODELS] Warmup of {name} failed: {e}")
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def model_stats():
+    return {
+        "loaded": dict(_stats),
+        "rss_mb": round(current_rss_mb(), 1),
+    }
@@ -0,0 +1,54 @@
+import redis
+from config import REDIS_URL, ASYNC_REDIS_CONNECTIONS
+
+_redis_client = None
+_async_redis_client = None
+_fake_server = None
+
+
+def _get_fake_server():
+    # The sync and async fakes must share one server to see the same data
+    global _fake_server
+    if _fake_server is None:
+        import fakeredis
+        _fake_server = fakeredis.FakeServer()
+    return _fake_server
+
+
+def get_redis():
+    """
+    Return the process-wide Redis client built from REDIS_URL.
+    Responses are decoded to str. REDIS_URL=fakeredis:// gives an in-process
+    fake (needs the fakeredis package) for development and benchmarks.
+    """
+    global _redis_client
+    if _redis_client is None:
+        if REDIS_URL.startswith("fakeredis://"):
+            import fakeredis
+            _redis_client = fakeredis.FakeRedis(server=_get_fake_server(), decode_responses=True)
+        else:
+            _redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+    return _redis_client
+
+
+def get_async_redis():
+    """
+    Return the process-wide redis.asyncio client for the async server (asgi.py).
+    Must be first called from inside its event loop. Once ASYNC_REDIS_CONNECTIONS
+    are in use, further calls wait for a free connection instead of failing.
+    """
+    global _async_redis_client
+    if _async_redis_client is None:
+        import redis.asyncio
+        if REDIS_URL.startswith("fakeredis://"):
+            import fakeredis
+            _async_redis_client = fakeredis.FakeAsyncRedis(
+                server=_get_fake_server(), decode_responses=True,
+                connection_pool_class=redis.asyncio.BlockingConnectionPool, max_connections=ASYNC_REDIS_CONNECTIONS,
+            )
+        else:
+            pool = redis.asyncio.BlockingConnectionPool.from_url(
+                REDIS_URL, decode_responses=True, max_connections=ASYNC_REDIS_CONNECTIONS,
+            )
+            _async_redis_client = redis.asyncio.Redis(connection_pool=pool)
+    return _async_redis_client
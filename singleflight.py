@@ -0,0 +1,115 @@
+"""
+Cross-process single-flight for cached computations.
+
+When many requests miss the cache for the same key at once, only one of them
+(in any web or worker process) should pay for the LLM call or transcription.
+compute_once() takes a short Redis lock for the key (SET NX PX, renewed while
+the computation runs) and computes; everyone else subscribes to the key's
+channel and reads the cached result when the holder announces it. If the
+holder dies, its lock expires and a waiter takes over.
+"""
+import threading
+import time
+import uuid
+
+import metrics
+from cache import get_cache
+from cloud_log import cloud_logger
+from config import SINGLEFLIGHT_LOCK_SECONDS, SINGLEFLIGHT_WAIT_SECONDS
+from redis_store import get_redis
+
+LOCK_PREFIX = "singleflight:lock:"
+CHANNEL_PREFIX = "singleflight:done:"
+# How often waiters re-check that the holder's lock still exists
+LOCK_POLL_SECONDS = 1.0
+
+# Only extend or delete the lock if we still own it
+_EXTEND_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _keep_lock_alive(lock_key, token, lock_ttl, done):
+    while not done.wait(lock_ttl / 3):
+        if not get_redis().eval(_EXTEND_LOCK, 1, lock_key, token, int(lock_ttl * 1000)):
+            cloud_logger.warning(f"[SINGLEFLIGHT] Lost lock {lock_key}")
+            return
+
+
+def _compute_locked(key, lock_key, token, compute_fn, ttl, lock_ttl):
+    r = get_redis()
+    cache = get_cache()
+    done = threading.Event()
+    threading.Thread(target=_keep_lock_alive, args=(lock_key, token, lock_ttl, done), daemon=True).start()
+    try:
+        # The previous holder may have finished between the caller's miss and our lock
+        value = cache.get(key)
+        if value is None:
+            value = compute_fn()
+            cache.set(key, value, ttl=ttl)
+        return value
+    finally:
+        done.set()
+        r.eval(_RELEASE_LOCK, 1, lock_key, token)
+        # Waiters re-read the cache either way; on failure one of them takes over
+        r.publish(CHANNEL_PREFIX + key, "done")
+
+
+def _wait_for_holder(pubsub, lock_key, deadline):
+    r = get_redis()
+    while deadline is None or time.monotonic() < deadline:
+        timeout = LOCK_POLL_SECONDS if deadline is None else min(LOCK_POLL_SECONDS, deadline - time.monotonic())
+        message = pubsub.get_message(ignore_subscribe_messages=True, timeout=max(0.0, timeout))
+        if message is not None or not r.exists(lock_key):
+            return True
+    return False
+
+
+def compute_once(key, compute_fn, ttl=None, wait_timeout=SINGLEFLIGHT_WAIT_SECONDS, lock_ttl=SINGLEFLIGHT_LOCK_SECONDS):
+    """
+    Return the string cached under `key`, computing it with `compute_fn()` in
+    at most one process at a time. Call this after a cache miss.
+
+    Waiters give up after `wait_timeout` seconds (None waits as long as the
+    holder's lock is alive) and compute the value themselves.
+    """
+    r = get_redis()
+    cache = get_cache()
+    lock_key = LOCK_PREFIX + key
+    token = uuid.uuid4().hex
+    deadline = None if wait_timeout is None else time.monotonic() + wait_timeout
+    while True:
+        if r.set(lock_key, token, nx=True, px=int(lock_ttl * 1000)):
+            metrics.inc("singleflight_total", role="leader")
+            return _compute_locked(key, lock_key, token, compute_fn, ttl, lock_ttl)
+
+        pubsub = r.pubsub()
+        try:
+            # Subscribe before re-checking so the holder's announcement cannot slip past us
+            pubsub.subscribe(CHANNEL_PREFIX + key)
+            value = cache.get(key)
+            if value is None:
+                with metrics.timer("singleflight_wait_seconds"):
+                    finished = _wait_for_holder(pubsub, lock_key, deadline)
+                value = cache.get(key)
+        finally:
+            pubsub.close()
+        if value is not None:
+            metrics.inc("singleflight_total", role="follower")
+            return value
+        if not finished:
+            cloud_logger.warning(f"[SINGLEFLIGHT] Gave up waiting on {key}; computing it here")
+            metrics.inc("singleflight_total", role="timeout")
+            value = compute_fn()
+            cache.set(key, value, ttl=ttl)
+            return value
+        # The holder failed or its lock expired: try to take over
@@ -3,5 +3,13 @@
 # Activate virtual environment if needed
 # source venv/bin/activate
 
-# Start Flask app with Gunicorn
-gunicorn -w 1 -b 0.0.0.0:8080 app:app --timeout 600 --log-level debug
\ No newline at end of file
+# Start Flask app with Gunicorn.
+# Jobs run in worker.py, so the web tier can be scaled independently:
+#   WEB_WORKERS=4 ./start.sh
+#   python worker.py --whisper-workers 2 --llm-workers 8
+# Threads keep long-lived /job-events streams from blocking other requests.
+# SERVER_MODE=async serves the network-bound routes from asgi.py under uvicorn instead.
+if [ "${SERVER_MODE:-sync}" = "async" ]; then
+    exec uvicorn asgi:app --host 0.0.0.0 --port 8080 --workers ${WEB_WORKERS:-1} --timeout-keep-alive 600 --log-level debug
+fi
+gunicorn -w ${WEB_WORKERS:-1} --threads ${WEB_THREADS:-16} -b 0.0.0.0:8080 app:app --timeout 600 --log-level debug
@@ -0,0 +1,233 @@
+"""
+Object storage for uploaded videos and thumbnails.
+
+STORAGE_BACKEND=gcs (the default) uses the GCS_BUCKET_NAME bucket.
+STORAGE_BACKEND=local keeps objects under STORAGE_LOCAL_DIR behind the same
+small slice of the google-cloud-storage Blob API the app relies on, so the
+service can run and be benchmarked without Google Cloud credentials.
+upload_chunks() streams data of unknown length into an object while it is
+still being produced. create_upload_target() returns a URL clients can upload
+an object to themselves, so its bytes never pass through the web tier: a GCS
+resumable upload session, or a signed PUT to /storage-upload/ locally.
+"""
+import hashlib
+import hmac
+import os
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import quote, urlencode
+
+from cloud_log import cloud_logger
+from config import (
+    GCS_BUCKET_NAME, STORAGE_BACKEND, STORAGE_LOCAL_DIR, STORAGE_LOCAL_BASE_URL, STORAGE_UPLOAD_CHUNK_SIZE,
+    STORAGE_LOCAL_SIGNING_KEY, UPLOAD_SESSION_TTL,
+)
+
+# Route served by the web app for the local backend's signed uploads
+LOCAL_UPLOAD_PATH = "/storage-upload/"
+
+
+class LocalBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.path = os.path.join(bucket.root, name)
+        self.size = None
+
+    @property
+    def public_url(self):
+        if self.bucket.base_url:
+            return f"{self.bucket.base_url.rstrip('/')}/{self.name}"
+        return f"file://{self.path}"
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def reload(self):
+        self.size = os.path.getsize(self.path)
+
+    def upload_from_file(self, file_obj, content_type=None):
+        # Like GCS's upload_from_file, this replaces an existing object
+        self.upload_chunks(iter(lambda: file_obj.read(STORAGE_UPLOAD_CHUNK_SIZE), b""), create_only=False)
+
+    def upload_chunks(self, chunks, create_only=True):
+        """
+        Write `chunks` to the object and return the byte count. As with
+        storage.upload_chunks on GCS, nothing is written if `chunks` raises, and
+        with `create_only` an existing object is kept and FileExistsError raised.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write to a temp file first so readers never see a partial object
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+                    size += len(chunk)
+            if create_only:
+                # link() fails if the object exists, so concurrent writers never replace each other
+                os.link(tmp_path, self.path)
+            else:
+                os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return size
+
+    def upload_from_filename(self, filename, content_type=None):
+        with open(filename, "rb") as f:
+            self.upload_from_file(f, content_type)
+
+    def download_to_filename(self, filename):
+        shutil.copyfile(self.path, filename)
+
+    def create_upload_target(self, content_type, expires_in, size):
+        expires = int(time.time() + expires_in)
+        query = urlencode({"expires": expires, "size": size, "signature": self.bucket.sign(self.name, expires, size)})
+        return {
+            "method": "PUT",
+            "url": f"{LOCAL_UPLOAD_PATH}{quote(self.name)}?{query}",
+            "headers": {"Content-Type": content_type},
+        }
+
+
+class LocalBucket:
+    def __init__(self, root, base_url=None):
+        self.root = root
+        self.base_url = base_url
+        os.makedirs(root, exist_ok=True)
+
+    def blob(self, name):
+        return LocalBlob(self, name)
+
+    def sign(self, name, expires, size):
+        message = f"{name}\n{expires}\n{size}".encode()
+        return hmac.new(STORAGE_LOCAL_SIGNING_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+    def verify(self, name, expires, size, signature):
+        """
+        The blob a signed local upload URL points to and the size it was signed
+        for; raises PermissionError if the signature is wrong or expired.
+        """
+        try:
+            expired = int(expires) < time.time()
+            size = int(size)
+        except (TypeError, ValueError):
+            raise PermissionError("Invalid or expired upload URL")
+        if expired or not hmac.compare_digest(self.sign(name, expires, size), signature or ""):
+            raise PermissionError("Invalid or expired upload URL")
+        return self.blob(name), size
+
+
+def _gcs_bucket():
+    if not GCS_BUCKET_NAME:
+        raise RuntimeError("GCS_BUCKET_NAME is not set")
+    from google.cloud import storage
+    return storage.Client().bucket(GCS_BUCKET_NAME)
+
+
+def upload_chunks(blob, chunks, content_type=None):
+    """
+    Upload an iterable of byte chunks to `blob` as they are produced and
+    return the byte count. On GCS this is a chunked resumable upload: each
+    STORAGE_UPLOAD_CHUNK_SIZE chunk is committed separately and a transient
+    failure retries that chunk, not the whole object. Nothing is committed
+    if `chunks` raises. An object that already exists is left as is.
+    """
+    if isinstance(blob, LocalBlob):
+        try:
+            return blob.upload_chunks(chunks)
+        except FileExistsError:
+            cloud_logger.info(f"[STORAGE] {blob.name} was created concurrently; keeping the existing object")
+            return 0
+    from google.api_core.exceptions import PreconditionFailed
+
+    # if_generation_match=0 (create only) makes chunk retries safe and never overwrites
+    writer = blob.open("wb", chunk_size=STORAGE_UPLOAD_CHUNK_SIZE, content_type=content_type, if_generation_match=0)
+    size = 0
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+            size += len(chunk)
+        writer.close()
+    except PreconditionFailed:
+        cloud_logger.info(f"[STORAGE] {blob.name} was created concurrently; keeping the existing object")
+    except BaseException:
+        _abandon(writer, blob)
+        raise
+    return size
+
+
+def _abandon(writer, blob):
+    """
+    Make sure a failed BlobWriter never finalizes its object. Closing it (which
+    io.IOBase also does on garbage collection) would commit the chunks sent so
+    far as a truncated object, and under if_generation_match=0 that object
+    would block every later upload of the same name.
+    """
+    # With its buffer closed, writer.close() no longer sends the final chunk
+    buffer = getattr(writer, "_buffer", None)
+    if buffer is not None:
+        buffer.close()
+    upload_and_transport = getattr(writer, "_upload_and_transport", None)
+    if not upload_and_transport:
+        return
+    upload, transport = upload_and_transport
+    try:
+        # A DELETE on the session URI cancels a resumable upload
+        transport.delete(upload.resumable_url, timeout=30)
+    except Exception as e:
+        cloud_logger.warning(f"[STORAGE] Could not cancel the upload session for {blob.name}: {e}")
+
+
+def create_upload_target(blob, content_type, size=None, origin=None, expires_in=UPLOAD_SESSION_TTL):
+    """
+    {"method", "url", "headers"} for a client to upload `blob` directly.
+    On GCS this is a resumable upload session (PUT the whole body, or chunks
+    with Content-Range to resume after a failure), limited to exactly `size`
+    bytes when given and create-only, so it never overwrites an object.
+    Local URLs are relative to the web app and signed for `expires_in` seconds
+    and `size` bytes.
+    """
+    if isinstance(blob, LocalBlob):
+        return blob.create_upload_target(content_type, expires_in, size)
+    url = blob.create_resumable_upload_session(
+        content_type=content_type, size=size, origin=origin, if_generation_match=0,
+    )
+    return {"method": "PUT", "url": url, "headers": {"Content-Type": content_type}}
+
+
+_BACKENDS = {
+    "gcs": _gcs_bucket,
+    "local": lambda: LocalBucket(STORAGE_LOCAL_DIR, STORAGE_LOCAL_BASE_URL),
+}
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_bucket():
+    """
+    Return the process-wide bucket for STORAGE_BACKEND, created on first use.
+    """
+    global _bucket
+    if _bucket is None:
+        with _bucket_lock:
+            if _bucket is None:
+                _bucket = _BACKENDS[STORAGE_BACKEND]()
+    return _bucket
+
+
+def local_object_path(name):
+    """
+    Filesystem path of object `name` when the local backend holds it, else None.
+    """
+    bucket = get_bucket()
+    if isinstance(bucket, LocalBucket):
+        path = bucket.blob(name).path
+        if os.path.exists(path):
+            return path
+    return None
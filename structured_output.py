@@ -0,0 +1,236 @@
+"""
+Structured JSON output from the LLM: schemas, tolerant parsing and validation.
+
+Prompts that expect JSON pass a schema to the model (Gemini constrains its
+output to it). Replies are parsed in one pass that ignores text around the
+JSON value and, if the reply was cut off, closes it at the last complete
+element. The parsed value is then checked against the schema; invalid
+chapters, branches or points are dropped rather than failing the whole
+reply, and only a reply with nothing usable is requested again.
+Results are stored as compact JSON.
+"""
+import json
+
+import metrics
+from cloud_log import cloud_logger
+from config import STRUCTURED_OUTPUT_RETRIES
+
+_STRING = {"type": "STRING"}
+
+CHAPTER_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"chapterTitle": _STRING, "startTime": _STRING, "chapterSummary": _STRING},
+    "required": ["chapterTitle", "startTime", "chapterSummary"],
+}
+CHAPTERS_SCHEMA = {"type": "ARRAY", "items": CHAPTER_SCHEMA}
+
+MINDMAP_NODE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"label": _STRING, "narration": _STRING},
+    "required": ["label", "narration"],
+}
+MINDMAP_BRANCH_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "label": _STRING,
+        "narration": _STRING,
+        "points": {"type": "ARRAY", "items": MINDMAP_NODE_SCHEMA},
+    },
+    "required": ["label", "narration", "points"],
+}
+MINDMAP_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "central": MINDMAP_NODE_SCHEMA,
+        "branches": {"type": "ARRAY", "items": MINDMAP_BRANCH_SCHEMA},
+    },
+    "required": ["central", "branches"],
+}
+CHAPTERS_MINDMAP_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"chapters": CHAPTERS_SCHEMA, "mindmap": MINDMAP_SCHEMA},
+    "required": ["chapters", "mindmap"],
+}
+
+_PY_TYPES = {
+    "OBJECT": dict,
+    "ARRAY": list,
+    "STRING": str,
+    "NUMBER": (int, float),
+    "INTEGER": int,
+    "BOOLEAN": bool,
+}
+_CLOSERS = {"{": "}", "[": "]"}
+# How many element boundaries to try when closing a truncated reply
+MAX_REPAIR_CUTS = 5
+# How many opening brackets to try as the start of the JSON value
+MAX_JSON_STARTS = 20
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+def dumps(value):
+    """
+    Compact JSON for storage and responses.
+    """
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _loads(text):
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        raise StructuredOutputError(f"Invalid JSON: {e}") from e
+
+
+def parse_json(text, opener=None):
+    """
+    Parse the first JSON object or array in `text` (or the first one starting
+    with `opener`), ignoring any prefix, code fences or trailing text, and
+    repairing a reply that was truncated mid-value. A bracket in the prefix
+    ("Here is the map [as requested]: {...}") that does not start valid JSON
+    is skipped, and parsing resumes at the next one.
+    """
+    openers = opener or "{["
+    starts = [i for i, ch in enumerate(text) if ch in openers][:MAX_JSON_STARTS]
+    if not starts:
+        raise StructuredOutputError("No JSON value found")
+    error = None
+    for start in starts:
+        try:
+            return _parse_from(text, start)
+        except StructuredOutputError as e:
+            error = error or e
+    raise error
+
+
+def _parse_from(text, start):
+    stack = []
+    cuts = []
+    in_string = escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+        elif ch in "}]":
+            if not stack or _CLOSERS[stack[-1]] != ch:
+                raise StructuredOutputError(f"Unbalanced {ch!r} at offset {i}")
+            stack.pop()
+            if not stack:
+                return _loads(text[start:i + 1])
+        elif ch == ",":
+            # Everything before a comma is a complete element of the innermost container
+            cuts.append((i, "".join(_CLOSERS[c] for c in reversed(stack))))
+
+    closers = "".join(_CLOSERS[c] for c in reversed(stack))
+    body = text[start:].rstrip()
+    candidates = [body + ('"' if in_string else "") + closers]
+    candidates += [text[start:i] + tail for i, tail in reversed(cuts[-MAX_REPAIR_CUTS:])]
+    for candidate in candidates:
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            continue
+        metrics.inc("structured_output_repairs_total")
+        cloud_logger.warning(f"[LLM] Repaired truncated JSON reply ({len(text)} chars)")
+        return value
+    raise StructuredOutputError("Truncated JSON could not be repaired")
+
+
+def validate(value, schema, path="$"):
+    """
+    Return a list of "path: problem" strings; empty when `value` matches `schema`.
+    """
+    expected = _PY_TYPES[schema["type"]]
+    if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+        return [f"{path}: expected {schema['type'].lower()}"]
+    errors = []
+    if schema["type"] == "OBJECT":
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{path}.{name}: missing")
+        for name, sub in schema.get("properties", {}).items():
+            if name in value:
+                errors += validate(value[name], sub, f"{path}.{name}")
+    elif schema["type"] == "ARRAY":
+        for index, item in enumerate(value):
+            errors += validate(item, schema["items"], f"{path}[{index}]")
+    return errors
+
+
+def _keep_valid(items, schema, what):
+    if not isinstance(items, list):
+        return []
+    kept = [item for item in items if not validate(item, schema)]
+    if len(kept) < len(items):
+        metrics.inc("structured_output_dropped_total", len(items) - len(kept), part=what)
+    return kept
+
+
+def clean_object(value):
+    if not isinstance(value, dict):
+        raise StructuredOutputError("Expected a JSON object")
+    return value
+
+
+def clean_chapters(value):
+    """
+    The valid chapters in `value`; raises StructuredOutputError if there are none.
+    """
+    chapters = _keep_valid(value, CHAPTER_SCHEMA, "chapter")
+    if not chapters:
+        raise StructuredOutputError("No valid chapters in reply")
+    return chapters
+
+
+def clean_mindmap(value):
+    """
+    `value` with invalid branches and points dropped; raises StructuredOutputError
+    if the central topic or every branch is unusable.
+    """
+    if not isinstance(value, dict) or validate(value.get("central"), MINDMAP_NODE_SCHEMA):
+        raise StructuredOutputError("Mind map has no valid central topic")
+    branches = []
+    for branch in value.get("branches") or []:
+        if not isinstance(branch, dict):
+            continue
+        branch = {**branch, "points": _keep_valid(branch.get("points"), MINDMAP_NODE_SCHEMA, "point")}
+        if not validate(branch, MINDMAP_BRANCH_SCHEMA):
+            branches.append(branch)
+    if not branches:
+        raise StructuredOutputError("Mind map has no valid branches")
+    return {"central": value["central"], "branches": branches}
+
+
+def generate_structured(prompt, kind, schema, clean, retries=STRUCTURED_OUTPUT_RETRIES):
+    """
+    Ask the LLM for JSON matching `schema` and return `clean(parsed value)`.
+    Only a reply with nothing usable in it is requested again, up to `retries` times.
+    """
+    from llm_client import get_llm_client
+
+    opener = "{" if schema["type"] == "OBJECT" else "["
+    attempt = 0
+    while True:
+        result = get_llm_client().generate(prompt, kind=kind, schema=schema)
+        cloud_logger.debug(f"[LLM] Structured {kind} reply ({len(result)} chars)")
+        try:
+            with metrics.stage("parse_llm_json"):
+                return clean(parse_json(result, opener))
+        except StructuredOutputError as e:
+            metrics.inc("structured_output_errors_total", kind=kind)
+            attempt += 1
+            if attempt > retries:
+                raise RuntimeError(f"[ERROR] Unusable {kind} JSON from LLM: {e}") from e
+            cloud_logger.warning(f"[LLM] Unusable {kind} JSON (attempt {attempt}), retrying: {e}")
@@ -1,5 +1,29 @@
-from transformers import pipeline
 import re
+from model_registry import get_t5_summarizer
+from llm_client import KIND_CHAPTERS, KIND_CHAPTERS_MINDMAP
+from structured_output import (
+    CHAPTERS_SCHEMA,
+    CHAPTERS_MINDMAP_SCHEMA,
+    StructuredOutputError,
+    clean_chapters,
+    clean_mindmap,
+    clean_object,
+    dumps,
+    generate_structured,
+)
+from cloud_log import cloud_logger
+from config import (
+    SUMMARY_CHUNK_TOKENS,
+    SUMMARY_MAX_PARALLEL,
+    SUMMARY_MAX_CHAPTERS,
+    SUMMARY_MINDMAP_MODE,
+    T5_MODEL_NAME,
+    T5_BATCH_SIZE,
+    T5_MAX_INPUT_TOKENS,
+)
+
+# Bump whenever CHAPTERIZE_PROMPT_TEMPLATE changes so cached summaries are not reused
+CHAPTERIZE_PROMPT_VERSION = "v2"
 
 CHAPTERIZE_PROMPT_TEMPLATE = """
 Chapterize the content by dividing it into as many meaningful chapters as appropriate based on topic shifts, changes in speaker, or major events. For a 20-minute video, aim for at least 5–8 chapters if possible.
@@ -33,55 +57,304 @@ Content:
 \"\"\"
 """
 
-# Choose a lightweight model for faster CPU response, or change to bart-large-cnn for better summaries
-summarizer = pipeline("summarization", model="t5-small")
+# Chapters and a mind map of them in one round trip (SUMMARY_MINDMAP_MODE=fused)
+FUSED_PROMPT_TEMPLATE = CHAPTERIZE_PROMPT_TEMPLATE + """
+In the same response, also build a mind map of the chapters with:
+- A central topic
+- 3 to 5 key branches
+- 2 to 4 subpoints per branch
+- Each topic (central, branches, and points) must include:
+  - "label": the title with a relevant emoji
+  - "narration": a simple sentence that explains concept of this label with respect to the parent node and the whole summary
+
+The output must then be strictly one JSON object instead of a bare array:
+{{
+  "chapters": [ ...the chapter objects described above... ],
+  "mindmap": {{
+    "central": {{"label": "🧠 Main Topic", "narration": "..."}},
+    "branches": [
+      {{"label": "📘 Branch Title", "narration": "...", "points": [{{"label": "💡 Subpoint A", "narration": "..."}}]}}
+    ]
+  }}
+}}
+"""
+
+CHUNK_PREFACE_TEMPLATE = """
+The content below is part {index} of {total} of a longer transcript and covers {start} to {end}.
+Each line starts with the [HH:MM:SS] timestamp where it is spoken; use those timestamps for "startTime".
+Only chapterize this part.
+"""
+
+MERGE_PROMPT_TEMPLATE = """
+The JSON array below lists chapters produced separately for consecutive parts of one video, in order.
+Merge them into a single coherent chapter list: combine chapters that continue the same topic across
+part boundaries, keep the earliest "startTime" of anything you combine, renumber the titles, and keep
+every important point. Use the same object format ("chapterTitle", "startTime", "chapterSummary").
+The output must be strictly a JSON array.
+
+Chapters:
+{chapters}
+"""
+
+
+def _chapterize_gemini(content, preface=""):
+    prompt = preface + CHAPTERIZE_PROMPT_TEMPLATE.format(content=content)
+    return generate_structured(prompt, KIND_CHAPTERS, CHAPTERS_SCHEMA, clean_chapters)
+
 
 def summarizer_gemini(text):
     text = text.strip()
-    from google import genai
-    import json
-    print(f"[DEBUG] About to summarize content using Gemini summarizer...")
+    return dumps(_chapterize_gemini(text))
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_timestamp(value):
+    """
+    Seconds from an "mm:ss" or "HH:MM:SS" string; unparseable values sort last.
+    """
+    try:
+        seconds = 0
+        for part in str(value).strip().split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return float("inf")
+
+
+def estimate_tokens(text):
+    # Roughly 4/3 tokens per English word; good enough for budgeting
+    return len(text.split()) * 4 // 3 + 1
+
+
+def chunk_transcript(transcript, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """
+    Split a transcript into chunks of at most ~max_tokens.
+
+    `transcript` is either plain text or {"text": ..., "segments": [...]} with
+    segment "start"/"end" seconds. With segments, chunks end on segment
+    boundaries and every line carries its [HH:MM:SS] timestamp.
+    Returns a list of {"start": seconds or None, "end": ..., "text": ...}.
+    """
+    segments = transcript.get("segments") if isinstance(transcript, dict) else None
+    if not segments:
+        text = transcript["text"] if isinstance(transcript, dict) else transcript
+        words = text.split()
+        step = max(1, max_tokens * 3 // 4)
+        return [
+            {"start": None, "end": None, "text": " ".join(words[i:i + step])}
+            for i in range(0, len(words), step)
+        ]
+
+    chunks = []
+    lines, tokens, chunk_start = [], 0, None
+    for seg in segments:
+        line = f"[{format_timestamp(seg['start'])}] {seg['text'].strip()}"
+        line_tokens = estimate_tokens(line)
+        if lines and tokens + line_tokens > max_tokens:
+            chunks.append({"start": chunk_start, "end": seg["start"], "text": "\n".join(lines)})
+            lines, tokens = [], 0
+        if not lines:
+            chunk_start = seg["start"]
+        lines.append(line)
+        tokens += line_tokens
+    if lines:
+        chunks.append({"start": chunk_start, "end": segments[-1].get("end", segments[-1]["start"]), "text": "\n".join(lines)})
+    return chunks
+
+
+def _merge_chapters(partials):
+    chapters = [chapter for partial in partials for chapter in partial if isinstance(chapter, dict)]
+    chapters.sort(key=lambda c: parse_timestamp(c.get("startTime", "")))
+    if len(chapters) > SUMMARY_MAX_CHAPTERS:
+        prompt = MERGE_PROMPT_TEMPLATE.format(chapters=dumps(chapters))
+        return generate_structured(prompt, KIND_CHAPTERS, CHAPTERS_SCHEMA, clean_chapters)
+    for number, chapter in enumerate(chapters, start=1):
+        title = re.sub(r"^Chapter \d+:\s*", "", chapter.get("chapterTitle", ""))
+        chapter["chapterTitle"] = f"Chapter {number}: {title}"
+    return chapters
+
 
-    genai_client = genai.Client(
-        vertexai=True,
-        project="secure-garden-460600-u4",
-        location="us-east4"
-    )
+def summarize_transcript_gemini(transcript):
+    """
+    Map-reduce chapterization of a full transcript: token-budgeted chunks are
+    chapterized concurrently, then the partial chapter lists are merged.
+    """
+    from concurrent.futures import ThreadPoolExecutor
 
-    prompt = CHAPTERIZE_PROMPT_TEMPLATE.format(content=text)
+    chunks = chunk_transcript(transcript)
+    if len(chunks) <= 1:
+        content = chunks[0]["text"] if chunks else ""
+        return dumps(_chapterize_gemini(content))
 
-    print(f"[DEBUG] Prompt for Gemini summarizer:\n{prompt}")
+    cloud_logger.debug(f"[SUMMARY] Summarizing transcript in {len(chunks)} chunks")
 
-    chat = genai_client.chats.create(model="gemini-2.0-flash-001")
-    response = chat.send_message(prompt)
-    result = response.text.strip()
-    # Remove Markdown-style ```json or ``` wrappers if present
-    result = re.sub(r"^```(?:json)?\n", "", result)
-    result = re.sub(r"\n```$", "", result)
-    print(f"[DEBUG] Gemini summarizer response:\n{result}")
+    def map_chunk(indexed):
+        index, chunk = indexed
+        preface = CHUNK_PREFACE_TEMPLATE.format(
+            index=index + 1,
+            total=len(chunks),
+            start=format_timestamp(chunk["start"]) if chunk["start"] is not None else "the start",
+            end=format_timestamp(chunk["end"]) if chunk["end"] is not None else "the end",
+        )
+        return _chapterize_gemini(chunk["text"], preface)
 
+    with ThreadPoolExecutor(max_workers=SUMMARY_MAX_PARALLEL) as pool:
+        # A chunk with an unusable reply is retried on its own by generate_structured
+        partials = list(pool.map(map_chunk, enumerate(chunks)))
+    return dumps(_merge_chapters(partials))
+
+
+def summarize_transcript_fused(transcript):
+    """
+    Chapters plus a mind map of them from one Gemini call.
+    Returns (summary JSON string, mind map dict or None). Transcripts that need
+    map-reduce are summarized as usual and come back without a mind map.
+
+    If one half of the reply is unusable only that half is redone: chapters
+    with a plain chapterize call, the mind map by the caller (None here).
+    """
+    chunks = chunk_transcript(transcript)
+    if len(chunks) > 1:
+        return summarize_transcript_gemini(transcript), None
+    content = chunks[0]["text"] if chunks else ""
+    prompt = FUSED_PROMPT_TEMPLATE.format(content=content)
+    cloud_logger.debug(f"[SUMMARY] Fused summary and mind map for {len(content)} chars of transcript")
+    parsed = generate_structured(prompt, KIND_CHAPTERS_MINDMAP, CHAPTERS_MINDMAP_SCHEMA, clean_object)
+    try:
+        chapters = clean_chapters(parsed.get("chapters"))
+    except StructuredOutputError:
+        chapters = _chapterize_gemini(content)
     try:
-        json_data = json.loads(result)
-        return json.dumps(json_data, indent=2)
-    except json.JSONDecodeError as e:
-        raise RuntimeError(f"[ERROR] Failed to parse Gemini summary JSON: {e}")
+        mindmap = clean_mindmap(parsed.get("mindmap"))
+    except StructuredOutputError:
+        mindmap = None
+    return dumps(chapters), mindmap
+
+
+def _t5_chunks(transcript, tokenizer, max_tokens=T5_MAX_INPUT_TOKENS):
+    """
+    Split a transcript into chunks of at most `max_tokens` T5 tokens, on segment
+    boundaries when segments are available. Returns [{"start", "text"}].
+    """
+    segments = transcript.get("segments") if isinstance(transcript, dict) else None
+    if not segments:
+        text = transcript["text"] if isinstance(transcript, dict) else transcript
+        ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+        return [
+            {"start": None, "text": tokenizer.decode(ids[i:i + max_tokens])}
+            for i in range(0, len(ids), max_tokens)
+        ]
+
+    chunks = []
+    parts, tokens, chunk_start = [], 0, None
+    for seg in segments:
+        seg_tokens = len(tokenizer(seg["text"], add_special_tokens=False)["input_ids"])
+        if parts and tokens + seg_tokens > max_tokens:
+            chunks.append({"start": chunk_start, "text": " ".join(parts)})
+            parts, tokens = [], 0
+        if not parts:
+            chunk_start = seg["start"]
+        parts.append(seg["text"].strip())
+        tokens += seg_tokens
+    if parts:
+        chunks.append({"start": chunk_start, "text": " ".join(parts)})
+    return chunks
+
+
+def _t5_summarize_chunks(chunks):
+    import torch
+
+    summarizer = get_t5_summarizer()
+    with torch.inference_mode():
+        results = summarizer(
+            [chunk["text"] for chunk in chunks],
+            batch_size=T5_BATCH_SIZE,
+            max_length=130,
+            min_length=30,
+            do_sample=False,
+            truncation=True,
+        )
+    return [result["summary_text"] for result in results]
+
+
+def summarize_transcript_t5(transcript):
+    """
+    Local, Gemini-free chapterization: every token-budgeted chunk is
+    summarized by T5 in batched forward passes and becomes one chapter.
+    """
+    chunks = _t5_chunks(transcript, get_t5_summarizer().tokenizer)
+    if not chunks:
+        return dumps([])
+    summaries = _t5_summarize_chunks(chunks)
+    chapters = [
+        {
+            "chapterTitle": f"Chapter {number}: Part {number}",
+            "startTime": format_timestamp(chunk["start"] or 0),
+            "chapterSummary": summary,
+        }
+        for number, (chunk, summary) in enumerate(zip(chunks, summaries), start=1)
+    ]
+    return dumps(chapters)
+
+
+# model_name values accepted by the summarization routes, mapped to an engine
+SUMMARY_ENGINES = {
+    "gemini": "gemini",
+    "t5": "t5-small",
+    "t5-small": "t5-small",
+}
+
+_ENGINE_FUNCTIONS = {
+    "gemini": summarize_transcript_gemini,
+    "t5-small": summarize_transcript_t5,
+}
+
+
+# Engines that run a local model on the CPU rather than calling an API
+CPU_SUMMARY_ENGINES = {"t5-small"}
+
+
+def summary_engine(model_name):
+    """
+    Canonical engine name for `model_name`; raises ValueError for unknown names.
+    """
+    engine = SUMMARY_ENGINES.get((model_name or "gemini").lower())
+    if engine is None:
+        raise ValueError(f"Unsupported model_name: {model_name}")
+    return engine
+
+
+def summary_version(engine):
+    """
+    Version tag for cache keys: changes whenever the engine's output would.
+    """
+    if engine == "t5-small":
+        return f"{T5_MODEL_NAME}-{T5_MAX_INPUT_TOKENS}"
+    if SUMMARY_MINDMAP_MODE == "fused":
+        return f"{CHAPTERIZE_PROMPT_VERSION}-fused"
+    return CHAPTERIZE_PROMPT_VERSION
+
+
+def summarize_transcript(transcript, model_name="gemini"):
+    """
+    Summarize a whole transcript (plain text or {"text", "segments"}) into a
+    JSON chapter list with the engine `model_name` selects, however long it is.
+    """
+    return _ENGINE_FUNCTIONS[summary_engine(model_name)](transcript)
+
 
 def summarize_text(text, model_name="gemini"):
-    # summarized_text = summarize_t5_small(text)
-    return summarizer_gemini(text) # sending summarized text to gemini to save tokens
+    return summarize_transcript(text, model_name)
+
 
-    
 def summarize_t5_small(text):
+    """
+    Plain-text T5 summary of `text` (chunk summaries joined together).
+    """
     text = text.strip()
-    words = text.split()
-    chunk_size = 400
-    chunks = [words[i:i + chunk_size] for i in range(0, len(words), chunk_size)]
-
-    summaries = []
-    for chunk in chunks:
-        chunk_text = " ".join(chunk)
-        result = summarizer(chunk_text, max_length=130, min_length=30, do_sample=False)
-        summaries.append(result[0]['summary_text'])
-
-    final_summary = " ".join(summaries)
-    return final_summary
\ No newline at end of file
+    chunks = _t5_chunks(text, get_t5_summarizer().tokenizer)
+    return " ".join(_t5_summarize_chunks(chunks))
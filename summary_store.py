@@ -0,0 +1,178 @@
+"""
+Saved summary entries in Redis.
+
+Each entry is stored as JSON under summary:<id>. The sorted set
+summaries:index holds every ID scored by creation time, so listing pages
+through the index instead of walking the keyspace, and a page is fetched
+with a single MGET. Entries can share a score (saves in the same instant);
+those are ordered by ID, and page cursors carry the last (score, ID) so a
+page boundary inside a tie loses nothing.
+"""
+import base64
+import json
+import time
+
+from redis_store import get_redis, get_async_redis
+
+SUMMARY_KEY_PREFIX = "summary:"
+SUMMARY_INDEX_KEY = "summaries:index"
+# Set once the index has been backfilled from keys saved before it existed
+SUMMARY_INDEX_BUILT_KEY = "summaries:index:built"
+
+
+def summary_key(summary_id):
+    return f"{SUMMARY_KEY_PREFIX}{summary_id}"
+
+
+def save_entry(entry):
+    """
+    Store `entry` and index it. Re-saving an entry keeps its original position.
+    """
+    pipe = get_redis().pipeline(transaction=True)
+    pipe.set(summary_key(entry["id"]), json.dumps(entry))
+    pipe.zadd(SUMMARY_INDEX_KEY, {entry["id"]: time.time()}, nx=True)
+    pipe.execute()
+
+
+def ensure_index():
+    """
+    Backfill the index from existing summary:* keys (with SCAN, never KEYS).
+    Entries with no known creation time sort before all indexed ones.
+    """
+    r = get_redis()
+    if r.exists(SUMMARY_INDEX_BUILT_KEY):
+        return
+    position = 0
+    for batch in _scan_batches(r, f"{SUMMARY_KEY_PREFIX}*"):
+        scores = {}
+        for key in batch:
+            position += 1
+            scores[key[len(SUMMARY_KEY_PREFIX):]] = position
+        r.zadd(SUMMARY_INDEX_KEY, scores, nx=True)
+    r.set(SUMMARY_INDEX_BUILT_KEY, "1")
+
+
+def _scan_batches(r, pattern, count=1000):
+    cursor = 0
+    while True:
+        cursor, keys = r.scan(cursor=cursor, match=pattern, count=count)
+        if keys:
+            yield keys
+        if cursor == 0:
+            return
+
+
+def list_entries(limit, cursor=None, fields=None):
+    """
+    Return (entries, next_cursor), newest first.
+
+    `cursor` is the opaque value returned as next_cursor by the previous page;
+    `fields` optionally restricts each entry to those keys.
+    """
+    r = get_redis()
+    after = parse_cursor(cursor) if cursor else None
+    # Entries tied with the cursor's score may have been on the previous page; fetch enough to skip them
+    ties = r.zcount(SUMMARY_INDEX_KEY, after[0], after[0]) if after else 0
+    rows = r.zrevrangebyscore(SUMMARY_INDEX_KEY, _max_score(after), "-inf", start=0, num=limit + 1 + ties,
+                              withscores=True)
+    rows = _after(rows, after)[:limit + 1]
+    page = rows[:limit]
+    values = r.mget([summary_key(summary_id) for summary_id, _ in page]) if page else []
+    entries, stale = _page_entries(page, values, fields)
+    if stale:
+        r.zrem(SUMMARY_INDEX_KEY, *stale)
+    return entries, _next_cursor(rows, limit)
+
+
+async def alist_entries(limit, cursor=None, fields=None):
+    """
+    list_entries() over redis.asyncio, for the async server.
+    """
+    r = get_async_redis()
+    after = parse_cursor(cursor) if cursor else None
+    ties = await r.zcount(SUMMARY_INDEX_KEY, after[0], after[0]) if after else 0
+    rows = await r.zrevrangebyscore(SUMMARY_INDEX_KEY, _max_score(after), "-inf", start=0, num=limit + 1 + ties,
+                                    withscores=True)
+    rows = _after(rows, after)[:limit + 1]
+    page = rows[:limit]
+    values = await r.mget([summary_key(summary_id) for summary_id, _ in page]) if page else []
+    entries, stale = _page_entries(page, values, fields)
+    if stale:
+        await r.zrem(SUMMARY_INDEX_KEY, *stale)
+    return entries, _next_cursor(rows, limit)
+
+
+def list_all(fields=None, page_size=500):
+    """
+    Every entry, newest first, fetched `page_size` at a time.
+    """
+    entries, cursor = list_entries(page_size, None, fields)
+    while cursor:
+        page, cursor = list_entries(page_size, cursor, fields)
+        entries.extend(page)
+    return entries
+
+
+async def alist_all(fields=None, page_size=500):
+    """
+    list_all() over redis.asyncio, for the async server.
+    """
+    entries, cursor = await alist_entries(page_size, None, fields)
+    while cursor:
+        page, cursor = await alist_entries(page_size, cursor, fields)
+        entries.extend(page)
+    return entries
+
+
+async def index_built():
+    return bool(await get_async_redis().exists(SUMMARY_INDEX_BUILT_KEY))
+
+
+def parse_cursor(cursor):
+    """
+    (score, ID) of the last entry of the previous page; raises ValueError if
+    `cursor` did not come from _next_cursor.
+    """
+    try:
+        score, summary_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), str(summary_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from None
+
+
+def _max_score(after):
+    # Inclusive: entries tied with the last one returned are filtered by _after
+    return after[0] if after else "+inf"
+
+
+def _after(rows, after):
+    # Within one score Redis returns IDs in descending order, so the ones already
+    # returned are those at the cursor's score with an ID at or above the cursor's
+    if not after:
+        return rows
+    score, summary_id = after
+    return [(member, s) for member, s in rows if not (s == score and member >= summary_id)]
+
+
+def _next_cursor(rows, limit):
+    if len(rows) <= limit:
+        return None
+    summary_id, score = rows[limit - 1]
+    return base64.urlsafe_b64encode(json.dumps([score, summary_id]).encode()).decode()
+
+
+def _page_entries(page, values, fields):
+    """
+    Decode a page of entries; returns (entries, IDs whose entry no longer exists).
+    """
+    entries = []
+    stale = []
+    for (summary_id, _), data in zip(page, values):
+        if data is None:
+            stale.append(summary_id)
+            continue
+        entry = json.loads(data)
+        if fields:
+            entry = {field: entry[field] for field in fields if field in entry}
+        entries.append(entry)
+    return entries, stale
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("CLOUD_LOGGING", "0")
+os.environ.setdefault("METRICS_FLUSH_SECONDS", "0")
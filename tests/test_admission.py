@@ -0,0 +1,66 @@
+from flask import Flask, request
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import admission
+
+app = Flask(__name__)
+
+
+def _client(headers=None, remote_addr="203.0.113.7"):
+    with app.test_request_context(headers=headers or {}, environ_base={"REMOTE_ADDR": remote_addr}):
+        return admission.client_id(request)
+
+
+def test_client_is_the_peer_address_by_default():
+    assert _client() == "203.0.113.7"
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies():
+    assert _client({"X-Forwarded-For": "198.51.100.1"}) == "203.0.113.7"
+
+
+def test_unauthenticated_client_id_is_ignored(monkeypatch):
+    monkeypatch.setattr(admission, "CLIENT_KEYS", {"acme": "s3cret"})
+    assert _client({"X-Client-ID": "acme"}) == "203.0.113.7"
+    assert _client({"X-Client-ID": "acme", "X-Client-Key": "wrong"}) == "203.0.113.7"
+    assert _client({"X-Client-ID": "unknown", "X-Client-Key": ""}) == "203.0.113.7"
+
+
+def test_authenticated_client_id_is_used(monkeypatch):
+    monkeypatch.setattr(admission, "CLIENT_KEYS", {"acme": "s3cret"})
+    assert _client({"X-Client-ID": "acme", "X-Client-Key": "s3cret"}) == "key:acme"
+
+
+def test_trusted_proxy_hops_set_the_client_address():
+    seen = {}
+    proxied = Flask(__name__)
+    proxied.wsgi_app = ProxyFix(proxied.wsgi_app, x_for=1)
+
+    @proxied.route("/")
+    def index():
+        seen["client"] = admission.client_id(request)
+        return ""
+
+    # Only the entry appended by the one trusted proxy counts, not the one the caller sent
+    proxied.test_client().get("/", headers={"X-Forwarded-For": "10.9.9.9, 198.51.100.1"},
+                              environ_base={"REMOTE_ADDR": "10.0.0.2"})
+    assert seen["client"] == "198.51.100.1"
+
+
+def test_failed_submission_releases_its_reservation(tmp_path, monkeypatch):
+    import app as web
+    import job_processor
+    import job_queue
+    from redis_store import get_redis
+
+    monkeypatch.setattr(job_processor, "JOB_SPOOL_DIR", str(tmp_path))
+
+    def broken(*args, **kwargs):
+        raise ConnectionError("redis went away")
+
+    monkeypatch.setattr(job_queue, "create_job", broken)
+    response = web.app.test_client().post("/submit-job", data=b"audio bytes", content_type="application/octet-stream",
+                                          environ_base={"REMOTE_ADDR": "203.0.113.9"})
+    assert response.status_code == 500
+    assert get_redis().zcard(job_queue.client_jobs_key("203.0.113.9")) == 0
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,10 @@
+import cache
+
+
+def test_transcript_key_separates_engines_and_compute_types(monkeypatch):
+    keys = set()
+    for engine, compute_type in [("openai", "float32"), ("faster", "int8"), ("faster", "float32")]:
+        monkeypatch.setattr(cache, "WHISPER_ENGINE", engine)
+        monkeypatch.setattr(cache, "WHISPER_COMPUTE_TYPE", compute_type)
+        keys.add(cache.whisper_transcript_key("sha256:abc"))
+    assert len(keys) == 3
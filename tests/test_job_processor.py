@@ -0,0 +1,24 @@
+import json
+
+import pytest
+
+import job_processor
+import job_queue
+from cache import set_transcript, whisper_transcript_key
+
+
+@pytest.mark.parametrize("model_name, on_pool", [("t5-small", True), ("gemini", False)])
+def test_local_summary_models_run_in_the_cpu_pool(monkeypatch, model_name, on_pool):
+    content_id = f"sha256:routing-{model_name}"
+    set_transcript(whisper_transcript_key(content_id), {"text": "words", "segments": []})
+    job_id = job_queue.create_job(job_queue.QUEUE_LLM, {"content_id": content_id, "model_name": model_name})
+    job = job_queue.claim(job_queue.QUEUE_LLM, block_timeout=0)
+
+    pooled = []
+    monkeypatch.setattr(job_processor, "_run_on_cpu_pool",
+                        lambda fn, *args: pooled.append(fn.__name__) or json.dumps([]))
+    monkeypatch.setattr(job_processor, "summarize_with_mindmap", lambda *args: json.dumps([]))
+    job_processor.run_summarize_stage(job)
+
+    assert pooled == (["summarize_transcript"] if on_pool else [])
+    assert job_queue.get_job(job_id)["state"] == job_queue.STATE_DONE
@@ -0,0 +1,100 @@
+import pytest
+
+import job_queue
+from redis_store import get_redis
+
+
+@pytest.fixture(autouse=True)
+def clean_redis(monkeypatch):
+    get_redis().flushall()
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 3)
+
+
+def _expire_leases(monkeypatch):
+    # Every lease taken from now on is already past its deadline
+    monkeypatch.setattr(job_queue, "JOB_VISIBILITY_TIMEOUT", -1)
+
+
+def _claim(queue):
+    return job_queue.claim(queue, block_timeout=0)
+
+
+def test_expired_lease_is_reaped_and_claimed_again(monkeypatch):
+    job_id = job_queue.create_job(job_queue.QUEUE_WHISPER, {"n": 1}, priority=job_queue.PRIORITY_HIGH)
+    _expire_leases(monkeypatch)
+    first = _claim(job_queue.QUEUE_WHISPER)
+    assert first["job_id"] == job_id
+    assert job_queue.running_count(job_queue.QUEUE_WHISPER) == 1
+
+    assert job_queue.reap_expired(job_queue.QUEUE_WHISPER) == 1
+    job = job_queue.get_job(job_id)
+    assert job["state"] == job_queue.STATE_QUEUED
+    assert "lease" not in job
+    assert job_queue.running_count(job_queue.QUEUE_WHISPER) == 0
+    # Back in its own priority class
+    assert job_queue.queue_depth(job_queue.QUEUE_WHISPER, [job_queue.PRIORITY_HIGH]) == 1
+
+    second = _claim(job_queue.QUEUE_WHISPER)
+    assert second["job_id"] == job_id
+    assert second["lease"] != first["lease"]
+    assert job_queue.get_job(job_id)["attempts"] == "2"
+    # The worker that lost the lease can no longer finish the job
+    assert not job_queue.complete(first, "stale")
+    assert job_queue.complete(second, "fresh")
+    assert job_queue.get_job(job_id)["result"] == "fresh"
+
+
+def test_job_fails_after_max_attempts(monkeypatch):
+    client = "203.0.113.5"
+    job_id = job_queue.create_job(job_queue.QUEUE_WHISPER, {}, client=client)
+    get_redis().zadd(job_queue.client_jobs_key(client), {job_id: 1})
+    _expire_leases(monkeypatch)
+    for _ in range(3):
+        assert _claim(job_queue.QUEUE_WHISPER)["job_id"] == job_id
+        job_queue.reap_expired(job_queue.QUEUE_WHISPER)
+
+    job = job_queue.get_job(job_id)
+    assert job["state"] == job_queue.STATE_FAILED
+    assert _claim(job_queue.QUEUE_WHISPER) is None
+    assert get_redis().zscore(job_queue.client_jobs_key(client), job_id) is None
+
+
+def test_advance_hands_the_job_to_the_llm_queue():
+    job_id = job_queue.create_job(job_queue.QUEUE_WHISPER, {"file": "a"}, priority=job_queue.PRIORITY_LOW)
+    job = _claim(job_queue.QUEUE_WHISPER)
+    assert job_queue.advance(job, job_queue.QUEUE_LLM, {"content_id": "sha256:x"})
+
+    assert job_queue.running_count(job_queue.QUEUE_WHISPER) == 0
+    assert job_queue.queue_depth(job_queue.QUEUE_LLM, [job_queue.PRIORITY_LOW]) == 1
+    stored = job_queue.get_job(job_id)
+    assert stored["state"] == job_queue.STATE_QUEUED
+    assert stored["queue"] == job_queue.QUEUE_LLM
+    assert stored["payload"] == {"file": "a", "content_id": "sha256:x"}
+
+    llm_job = _claim(job_queue.QUEUE_LLM)
+    assert llm_job["job_id"] == job_id
+    assert llm_job["payload"]["content_id"] == "sha256:x"
+    # A second advance with the spent Whisper lease must not queue the job twice
+    assert not job_queue.advance(job, job_queue.QUEUE_LLM)
+    assert job_queue.queue_depth(job_queue.QUEUE_LLM) == 0
+
+
+def test_each_stage_gets_its_own_attempts(monkeypatch):
+    job_id = job_queue.create_job(job_queue.QUEUE_WHISPER, {})
+    with monkeypatch.context() as m:
+        _expire_leases(m)
+        # Two Whisper attempts, the first lost to an expired lease
+        _claim(job_queue.QUEUE_WHISPER)
+        job_queue.reap_expired(job_queue.QUEUE_WHISPER)
+        job = _claim(job_queue.QUEUE_WHISPER)
+    assert job["attempts"] == "2"
+    job_queue.advance(job, job_queue.QUEUE_LLM)
+    assert job_queue.get_job(job_id)["attempts"] == "0"
+
+    _expire_leases(monkeypatch)
+    for _ in range(2):
+        _claim(job_queue.QUEUE_LLM)
+        job_queue.reap_expired(job_queue.QUEUE_LLM)
+    # Two LLM attempts lost, yet the job still has its third
+    assert job_queue.get_job(job_id)["state"] == job_queue.STATE_QUEUED
+    assert _claim(job_queue.QUEUE_LLM)["attempts"] == "3"
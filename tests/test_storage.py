@@ -0,0 +1,86 @@
+import io
+import os
+
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    bucket = storage.LocalBucket(str(tmp_path / "bucket"))
+    monkeypatch.setattr(storage, "_bucket", bucket)
+    return bucket
+
+
+def _failing_chunks():
+    yield b"first part "
+    raise RuntimeError("ffmpeg died")
+
+
+def test_failing_generator_leaves_no_local_object(bucket):
+    blob = bucket.blob("videos/v.mp4")
+    with pytest.raises(RuntimeError):
+        storage.upload_chunks(blob, _failing_chunks())
+    assert not blob.exists()
+    assert os.listdir(os.path.dirname(blob.path)) == []
+
+
+def test_local_upload_chunks_is_create_only(bucket):
+    blob = bucket.blob("videos/v.mp4")
+    assert storage.upload_chunks(blob, iter([b"original"])) == 8
+    assert storage.upload_chunks(blob, iter([b"replacement"])) == 0
+    with open(blob.path, "rb") as f:
+        assert f.read() == b"original"
+    with pytest.raises(FileExistsError):
+        blob.upload_chunks(iter([b"replacement"]))
+
+
+def test_upload_from_file_still_replaces(bucket):
+    blob = bucket.blob("thumbnails/t.png")
+    blob.upload_from_file(io.BytesIO(b"old"))
+    blob.upload_from_file(io.BytesIO(b"new"))
+    with open(blob.path, "rb") as f:
+        assert f.read() == b"new"
+
+
+def test_failing_generator_cancels_the_gcs_session():
+    pytest.importorskip("google.cloud.storage")
+    committed, cancelled = [], []
+
+    class Transport:
+        def delete(self, url, timeout):
+            cancelled.append(url)
+
+    class Upload:
+        resumable_url = "https://storage.googleapis.com/upload/session-1"
+
+    class Writer(io.BufferedIOBase):
+        """Commits whatever was written when closed, like BlobWriter."""
+
+        def __init__(self):
+            self._buffer = io.BytesIO()
+            self._upload_and_transport = (Upload(), Transport())
+
+        def write(self, data):
+            return self._buffer.write(data)
+
+        def close(self):
+            if not self._buffer.closed:
+                committed.append(self._buffer.getvalue())
+                self._buffer.close()
+            super().close()
+
+    class Blob:
+        name = "videos/v.mp4"
+
+        def open(self, *args, **kwargs):
+            self.writer = Writer()
+            return self.writer
+
+    blob = Blob()
+    with pytest.raises(RuntimeError):
+        storage.upload_chunks(blob, _failing_chunks())
+    blob.writer.close()
+    assert committed == []
+    assert cancelled == [Upload.resumable_url]
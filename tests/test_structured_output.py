@@ -0,0 +1,55 @@
+import pytest
+
+from structured_output import StructuredOutputError, parse_json
+
+CHAPTERS = '[{"chapterTitle": "Intro", "startTime": "00:00:00", "chapterSummary": "Hello"}]'
+
+
+def test_plain_json():
+    assert parse_json('{"a": 1}') == {"a": 1}
+
+
+@pytest.mark.parametrize("text", [
+    "Here is the map [as requested]: {\"central\": \"Topic\"}",
+    "See [the docs](https://example.com/x) for details. {\"central\": \"Topic\"}",
+    "Note (a) [b] {c} and then: {\"central\": \"Topic\"}",
+])
+def test_prefix_with_brackets_is_skipped(text):
+    assert parse_json(text) == {"central": "Topic"}
+    assert parse_json(text, "{") == {"central": "Topic"}
+
+
+def test_array_after_bracketed_prefix():
+    assert parse_json(f"Chapters [JSON]:\n{CHAPTERS}", "[")[0]["chapterTitle"] == "Intro"
+
+
+def test_fenced_output():
+    text = f"Sure!\n```json\n{CHAPTERS}\n```\nLet me know if you need more."
+    assert parse_json(text, "[")[0]["chapterSummary"] == "Hello"
+
+
+def test_brackets_inside_strings_do_not_confuse_the_scan():
+    assert parse_json('{"text": "a ] and } inside", "n": [1, 2]}') == {"text": "a ] and } inside", "n": [1, 2]}
+
+
+def test_truncated_mid_string():
+    assert parse_json('[{"chapterTitle": "Intro", "chapterSummary": "Hel', "[") == [
+        {"chapterTitle": "Intro", "chapterSummary": "Hel"},
+    ]
+
+
+def test_truncated_after_an_element():
+    assert parse_json('Here: [{"a": 1}, {"a": 2}, {"a"', "[") == [{"a": 1}, {"a": 2}]
+
+
+@pytest.mark.parametrize("opener", [None, "{"])
+def test_truncated_after_bracketed_prefix(opener):
+    assert parse_json('Result [draft]: {"central": "T", "branches": [{"title": "x"}, {"ti', opener) == {
+        "central": "T", "branches": [{"title": "x"}],
+    }
+
+
+@pytest.mark.parametrize("text", ["no json here", "[not json] (nor this)", ""])
+def test_nothing_usable_raises(text):
+    with pytest.raises(StructuredOutputError):
+        parse_json(text)
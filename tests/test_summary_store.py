@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+import summary_store
+from redis_store import get_redis
+
+
+@pytest.fixture
+def client():
+    get_redis().flushall()
+    import app
+    client = app.app.test_client()
+    for i in range(7):
+        client.post("/save-summary", json={"id": f"s{i}", "title": f"Title {i}", "summary": "x"})
+    return client
+
+
+def test_list_all_walks_every_page(client):
+    assert [e["id"] for e in summary_store.list_all(page_size=2)] == [f"s{i}" for i in range(6, -1, -1)]
+
+
+def test_list_without_limit_or_cursor_returns_everything(client, monkeypatch):
+    monkeypatch.setattr("app.LIST_SUMMARIES_DEFAULT_LIMIT", 2)
+    response = client.get("/list-summaries")
+    assert len(response.get_json()) == 7
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_list_pages_with_limit(client):
+    first = client.get("/list-summaries?limit=4&fields=id")
+    assert [e["id"] for e in first.get_json()] == ["s6", "s5", "s4", "s3"]
+    second = client.get(f"/list-summaries?limit=4&cursor={first.headers['X-Next-Cursor']}")
+    assert [e["id"] for e in second.get_json()] == ["s2", "s1", "s0"]
+    assert "X-Next-Cursor" not in second.headers
+
+
+def _save_tied(count, score=1000.0):
+    get_redis().flushall()
+    r = get_redis()
+    for i in range(count):
+        r.set(summary_store.summary_key(f"t{i}"), json.dumps({"id": f"t{i}"}))
+        r.zadd(summary_store.SUMMARY_INDEX_KEY, {f"t{i}": score})
+
+
+def _walk(page_size):
+    seen, cursor = [], None
+    while True:
+        page, cursor = summary_store.list_entries(page_size, cursor)
+        seen.extend(e["id"] for e in page)
+        if not cursor:
+            return seen
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 5])
+def test_pages_keep_entries_with_tied_scores(page_size):
+    _save_tied(7)
+    assert sorted(_walk(page_size)) == [f"t{i}" for i in range(7)]
+    assert len(_walk(page_size)) == 7
+
+
+def test_async_pages_keep_entries_with_tied_scores():
+    _save_tied(5)
+
+    async def walk():
+        seen, cursor = [], None
+        while True:
+            page, cursor = await summary_store.alist_entries(2, cursor)
+            seen.extend(e["id"] for e in page)
+            if not cursor:
+                return seen
+
+    assert sorted(asyncio.run(walk())) == [f"t{i}" for i in range(5)]
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/list-summaries?limit=2&cursor=1712345678.5").status_code == 400
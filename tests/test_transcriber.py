@@ -0,0 +1,60 @@
+import concurrent.futures
+
+import numpy as np
+
+import transcriber
+
+
+def test_pool_size_uses_all_cores_of_the_budget():
+    assert transcriber.pool_size(cores=8, max_processes=0) == (8, 1)
+
+
+def test_pool_size_caps_processes_and_splits_threads():
+    assert transcriber.pool_size(cores=8, max_processes=2) == (2, 4)
+    assert transcriber.pool_size(cores=2, max_processes=8) == (2, 1)
+
+
+def test_pool_respects_worker_budget(monkeypatch):
+    created = {}
+
+    class FakePool:
+        def __init__(self, max_workers, mp_context, initializer, initargs):
+            created.update(max_workers=max_workers, initargs=initargs)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(transcriber, "_pool", None)
+    monkeypatch.setattr(transcriber, "_cpu_budget", None)
+    monkeypatch.setattr(transcriber.os, "cpu_count", lambda: 16)
+    # What worker.py gives each of 4 Whisper processes on 16 cores
+    transcriber.set_cpu_budget(16 // 4)
+    transcriber._get_pool()
+    assert created == {"max_workers": 4, "initargs": (1,)}
+
+
+def test_web_process_budget_is_split_by_web_workers(monkeypatch):
+    monkeypatch.setattr(transcriber, "_cpu_budget", None)
+    monkeypatch.setattr(transcriber, "WEB_WORKERS", 4)
+    monkeypatch.setattr(transcriber.os, "cpu_count", lambda: 16)
+    assert transcriber.cpu_budget() == 4
+
+
+def test_auto_mode_stays_single_with_one_core(monkeypatch):
+    calls = []
+
+    class FakeEngine:
+        name = "fake"
+
+        def transcribe(self, audio, on_segment=None):
+            calls.append(len(audio))
+            return {"text": "", "segments": []}
+
+    monkeypatch.setattr(transcriber, "_cpu_budget", 1)
+    monkeypatch.setattr(transcriber, "get_whisper_engine", lambda cpu_threads=None: FakeEngine())
+
+    def no_parallel(*args):
+        raise AssertionError("parallel transcription with a one-core budget")
+
+    monkeypatch.setattr(transcriber, "transcribe_parallel", no_parallel)
+    audio = np.zeros(int((transcriber.TRANSCRIBE_PARALLEL_MIN_SECONDS + 1) * transcriber.SAMPLE_RATE), dtype=np.float32)
+    transcriber.transcribe_audio(audio, mode="auto")
+    assert calls == [len(audio)]
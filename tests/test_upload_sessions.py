@@ -0,0 +1,70 @@
+from urllib.parse import urlsplit
+
+import pytest
+
+import job_processor
+import job_queue
+import storage
+import upload_sessions
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_bucket", storage.LocalBucket(str(tmp_path / "bucket")))
+    import app
+    return app.app.test_client()
+
+
+def _create(client, size, filename="clip.webm"):
+    response = client.post("/upload-sessions", json={
+        "kind": "video", "filename": filename, "contentType": "video/webm", "size": size,
+    })
+    assert response.status_code == 201
+    body = response.get_json()
+    url = urlsplit(body["upload"]["url"])
+    return body["session_id"], f"{url.path}?{url.query}"
+
+
+@pytest.mark.parametrize("data", [b"x" * 9, b"x" * 11])
+def test_local_upload_must_match_the_declared_size(client, data):
+    session_id, upload_url = _create(client, 10)
+    assert client.put(upload_url, data=data).status_code == 400
+    assert storage.local_object_path("videos/clip.webm") is None
+    assert client.post(f"/upload-sessions/{session_id}/complete").status_code == 409
+
+
+def test_local_upload_cannot_change_the_signed_size(client):
+    _, upload_url = _create(client, 10)
+    assert client.put(upload_url.replace("size=10", "size=11"), data=b"x" * 11).status_code == 403
+
+
+def test_failed_completion_can_be_retried(client, monkeypatch):
+    session_id, upload_url = _create(client, 10)
+    assert client.put(upload_url, data=b"x" * 10).status_code == 200
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("queue unavailable")
+
+    monkeypatch.setattr(upload_sessions, "enqueue_video_job", broken)
+    assert client.post(f"/upload-sessions/{session_id}/complete", json={"summarize": True}).status_code == 500
+
+    monkeypatch.setattr(upload_sessions, "enqueue_video_job", lambda *args, **kwargs: ("job-1", 0))
+    response = client.post(f"/upload-sessions/{session_id}/complete", json={"summarize": True})
+    assert response.status_code == 200
+    assert response.get_json()["job_id"] == "job-1"
+
+
+def test_local_uploads_are_transcribed_from_disk(client, monkeypatch):
+    session_id, upload_url = _create(client, 10, filename="local.webm")
+    client.put(upload_url, data=b"x" * 10)
+    response = client.post(f"/upload-sessions/{session_id}/complete", json={"summarize": True})
+    job = job_queue.get_job(response.get_json()["job_id"])
+    assert job["payload"]["video_url"].startswith("file://")
+
+    transcribed = []
+    monkeypatch.setattr(job_processor, "decode_url_to_pcm", lambda url: pytest.fail("fetched the file:// URL"))
+    monkeypatch.setattr(job_processor, "_transcribe_and_advance",
+                        lambda job, content_id, transcribe: transcribed.append(transcribe))
+    monkeypatch.setattr(job_processor, "transcribe_segments", lambda path, on_segment: path)
+    job_processor.run_transcribe_stage(job)
+    assert transcribed[0](None) == storage.local_object_path("videos/local.webm")
@@ -0,0 +1,77 @@
+import socket
+
+import pytest
+
+import job_queue
+import webhooks
+
+
+def _resolves_to(monkeypatch, *addresses):
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET6 if ":" in a else socket.AF_INET, socket.SOCK_STREAM, 6, "", (a, port))
+                for a in addresses]
+    monkeypatch.setattr(webhooks.socket, "getaddrinfo", getaddrinfo)
+
+
+@pytest.mark.parametrize("url", [
+    "http://169.254.169.254/latest/meta-data/",
+    "http://127.0.0.1:6379/",
+    "http://localhost/hook",
+    "http://10.1.2.3/hook",
+    "http://172.16.0.1/hook",
+    "http://192.168.1.1/hook",
+    "http://[::1]/hook",
+    "http://[fe80::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://224.0.0.1/hook",
+    "http://240.0.0.1/hook",
+    "http://0.0.0.0/hook",
+    "http://100.64.0.1/hook",
+])
+def test_rejects_non_public_addresses(url):
+    assert "non-public" in webhooks.validate_url(url)
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.0.0.5", "169.254.169.254", "fd00::1"])
+def test_rejects_hostnames_resolving_to_non_public_addresses(monkeypatch, address):
+    _resolves_to(monkeypatch, "93.184.216.34", address)
+    assert "non-public" in webhooks.validate_url("https://hooks.example.com/done")
+
+
+def test_accepts_public_hosts(monkeypatch):
+    _resolves_to(monkeypatch, "93.184.216.34", "2606:2800:220:1:248:1893:25c8:1946")
+    assert webhooks.validate_url("https://hooks.example.com/done") is None
+
+
+def test_rejects_unresolvable_hosts(monkeypatch):
+    def getaddrinfo(*args, **kwargs):
+        raise socket.gaierror("no such host")
+    monkeypatch.setattr(webhooks.socket, "getaddrinfo", getaddrinfo)
+    assert "does not resolve" in webhooks.validate_url("https://nowhere.invalid/hook")
+
+
+@pytest.mark.parametrize("url", ["ftp://example.com/", "http:///path", "not a url", 42])
+def test_rejects_malformed_urls(url):
+    assert webhooks.validate_url(url)
+
+
+def test_allowlisted_hosts_skip_the_address_check(monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_ALLOWED_HOSTS", {"receiver.internal"})
+    _resolves_to(monkeypatch, "10.0.0.7")
+    assert webhooks.validate_url("http://Receiver.internal:8080/hook") is None
+    assert webhooks.validate_url("http://other.internal/hook") is not None
+
+
+def test_delivery_rechecks_the_host(monkeypatch):
+    job_id = "webhook-test-job"
+    monkeypatch.setattr(job_queue, "get_job", lambda _id: {"job_id": job_id, "state": job_queue.STATE_DONE})
+    posted = []
+    monkeypatch.setattr(webhooks, "_post", lambda url, body: posted.append(url))
+
+    _resolves_to(monkeypatch, "93.184.216.34")
+    webhooks.schedule(job_id, "https://hooks.example.com/done")
+    # The record now points at the metadata service (DNS rebinding)
+    _resolves_to(monkeypatch, "169.254.169.254")
+    assert webhooks.deliver(job_id) == "blocked"
+    assert posted == []
+    assert webhooks.claim() is None
@@ -1,19 +1,241 @@
-import whisper
 import os
-import torch
+import re
+import concurrent.futures
+import multiprocessing
 
-# Determine device and load the Whisper model
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"[DEBUG] Loading Whisper model on device: {device}")
-model = whisper.load_model("tiny", device=device)  # or "base", "small", etc.
+from config import (
+    TRANSCRIBE_MODE,
+    TRANSCRIBE_PARALLEL_MIN_SECONDS,
+    TRANSCRIBE_PROCESSES,
+    TRANSCRIBE_WINDOW_SECONDS,
+    TRANSCRIBE_OVERLAP_SECONDS,
+    WEB_WORKERS,
+    WHISPER_CPU_THREADS,
+)
+import metrics
+from cloud_log import cloud_logger
+from audio_io import decode_source_to_pcm
+from model_registry import get_whisper_engine
 
-def transcribe_with_whisper(file_path):
+SAMPLE_RATE = 16000
+# Energy is measured over 30 ms frames when looking for silence to split at
+SILENCE_FRAME_SECONDS = 0.03
+# How far (as a fraction of the window) a cut may move to land on silence
+SILENCE_SEARCH_FRACTION = 0.2
+
+_pool = None
+# Cores transcription in this process may use; see set_cpu_budget()
+_cpu_budget = None
+
+
+def load_audio(file_path):
+    """
+    Decode any ffmpeg-readable file to 16 kHz mono float32.
+    """
+    return decode_source_to_pcm(file_path)
+
+
+def find_cut_points(audio, window_seconds=TRANSCRIBE_WINDOW_SECONDS):
+    """
+    Return sample offsets [0, c1, ..., len(audio)] splitting the audio into
+    roughly window-sized pieces, each cut moved to the quietest frame nearby.
+    """
+    import numpy as np
+
+    total = len(audio)
+    window = int(window_seconds * SAMPLE_RATE)
+    if total <= window:
+        return [0, total]
+
+    frame = int(SILENCE_FRAME_SECONDS * SAMPLE_RATE)
+    n_frames = total // frame
+    energy = np.square(audio[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+    search = int(window * SILENCE_SEARCH_FRACTION) // frame
+
+    cuts = [0]
+    target = window
+    while total - cuts[-1] > window + window * SILENCE_SEARCH_FRACTION:
+        center = target // frame
+        lo = max(cuts[-1] // frame + 1, center - search)
+        hi = min(n_frames, center + search + 1)
+        cut = (lo + int(np.argmin(energy[lo:hi]))) * frame
+        cuts.append(cut)
+        target = cut + window
+    cuts.append(total)
+    return cuts
+
+
+def plan_windows(audio, window_seconds=TRANSCRIBE_WINDOW_SECONDS, overlap_seconds=TRANSCRIBE_OVERLAP_SECONDS):
+    """
+    Split the audio at silence into overlapping windows.
+    Returns (start_sample, end_sample, owned_start_sample, owned_end_sample) tuples;
+    each window owns the span between its two cuts and overlaps its neighbours
+    by half the overlap on each side.
+    """
+    cuts = find_cut_points(audio, window_seconds)
+    pad = int(overlap_seconds * SAMPLE_RATE / 2)
+    windows = []
+    for owned_start, owned_end in zip(cuts, cuts[1:]):
+        windows.append((max(0, owned_start - pad), min(len(audio), owned_end + pad), owned_start, owned_end))
+    return windows
+
+
+def _init_pool_worker(threads):
+    get_whisper_engine(cpu_threads=threads)
+
+
+def _transcribe_window(start_sample, audio_slice):
+    result = get_whisper_engine().transcribe(audio_slice)
+    offset = start_sample / SAMPLE_RATE
+    return [
+        {"start": seg["start"] + offset, "end": seg["end"] + offset, "text": seg["text"].strip()}
+        for seg in result["segments"]
+    ]
+
+
+def set_cpu_budget(cores):
+    """
+    Limit transcription in this process (including its parallel pool) to
+    `cores` cores. Must be called before the first transcription.
+    """
+    global _cpu_budget
+    _cpu_budget = max(1, int(cores))
+
+
+def cpu_budget():
+    if _cpu_budget is not None:
+        return _cpu_budget
+    return max(1, (os.cpu_count() or 1) // max(1, WEB_WORKERS))
+
+
+def pool_size(cores=None, max_processes=TRANSCRIBE_PROCESSES):
+    """
+    (processes, threads per process) for the parallel pool, within `cores` cores.
+    """
+    cores = cores or cpu_budget()
+    processes = min(max_processes or cores, cores)
+    return processes, max(1, cores // processes)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        processes, threads = pool_size()
+        _pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_pool_worker,
+            initargs=(threads,),
+        )
+    return _pool
+
+
+def _normalize_word(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def _drop_repeated_words(previous_words, text, max_overlap=8):
+    """
+    Remove words at the start of `text` that repeat the end of the previous segment.
+    """
+    words = text.split()
+    tail = [_normalize_word(w) for w in previous_words[-max_overlap:]]
+    head = [_normalize_word(w) for w in words[:max_overlap]]
+    for k in range(min(len(tail), len(head)), 0, -1):
+        if tail[-k:] == head[:k]:
+            return " ".join(words[k:])
+    return text
+
+
+def iter_merged_segments(windows, window_segments):
+    """
+    Join per-window segments into one transcript, yielding each kept segment as
+    soon as its window's results arrive. A segment is kept only by the window
+    that owns its midpoint, and words repeated across a seam are dropped.
+    """
+    previous_words = []
+    for (_, _, owned_start, owned_end), segments in zip(windows, window_segments):
+        lo, hi = owned_start / SAMPLE_RATE, owned_end / SAMPLE_RATE
+        first_in_window = True
+        for seg in segments:
+            midpoint = (seg["start"] + seg["end"]) / 2
+            if not lo <= midpoint < hi:
+                continue
+            text = seg["text"]
+            if first_in_window and previous_words:
+                text = _drop_repeated_words(previous_words, text)
+            first_in_window = False
+            if not text:
+                continue
+            previous_words = text.split()
+            yield {"start": seg["start"], "end": seg["end"], "text": text}
+
+
+def merge_window_segments(windows, window_segments):
+    return list(iter_merged_segments(windows, window_segments))
+
+
+def transcribe_parallel(audio, on_segment=None):
+    """
+    Transcribe a decoded 16 kHz buffer as overlapping windows in a process pool.
+    """
+    windows = plan_windows(audio)
+    cloud_logger.debug(
+        f"[TRANSCRIBE] Parallel transcription of {len(audio) / SAMPLE_RATE:.0f}s audio in {len(windows)} windows"
+    )
+    pool = _get_pool()
+    # map() yields in window order, so segments can be emitted as soon as the
+    # leading windows finish
+    window_segments = pool.map(
+        _transcribe_window,
+        [w[0] for w in windows],
+        [audio[w[0]:w[1]] for w in windows],
+    )
+    segments = []
+    for seg in iter_merged_segments(windows, window_segments):
+        segments.append(seg)
+        if on_segment:
+            on_segment(seg)
+    return {"text": " ".join(seg["text"] for seg in segments), "segments": segments}
+
+
+def transcribe_audio(audio, mode=None, on_segment=None):
+    """
+    Transcribe a decoded 16 kHz mono float32 buffer and return
+    {"text": ..., "segments": [...]} with timestamps in seconds.
+    `on_segment` is called with each segment as it becomes available.
+    """
+    mode = mode or TRANSCRIBE_MODE
+    duration = len(audio) / SAMPLE_RATE
+    # A one-process pool would only load a second model copy, so "auto" stays single then
+    parallel_auto = mode == "auto" and duration >= TRANSCRIBE_PARALLEL_MIN_SECONDS and pool_size()[0] > 1
+    if mode == "parallel" or parallel_auto:
+        result = transcribe_parallel(audio, on_segment)
+        metrics.inc("audio_seconds_transcribed_total", duration, mode="parallel")
+        return result
+
+    engine = get_whisper_engine(cpu_threads=None if WHISPER_CPU_THREADS else cpu_budget())
+    cloud_logger.debug(f"[TRANSCRIBE] Transcribing {duration:.0f}s of audio with the {engine.name} engine")
+    result = engine.transcribe(audio, on_segment=on_segment)
+    metrics.inc("audio_seconds_transcribed_total", duration, mode="single")
+    return result
+
+
+def transcribe_segments(file_path, mode=None, on_segment=None):
+    """
+    Transcribe a media file; see transcribe_audio.
+    """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
-    print(f"[DEBUG] Transcribing file: {file_path}")
-    result = model.transcribe(file_path)
-    print(f"[DEBUG] Whisper raw result object: {result}")
+    cloud_logger.debug(f"[TRANSCRIBE] Transcribing file: {file_path}")
+    with metrics.stage("decode_audio"):
+        audio = load_audio(file_path)
+    return transcribe_audio(audio, mode, on_segment)
+
+
+def transcribe_with_whisper(file_path, mode=None, on_segment=None):
+    result = transcribe_segments(file_path, mode, on_segment)
     transcript = result["text"]
-    print(f"[DEBUG] Transcription complete. Word count: {len(transcript.split())}")
-    return transcript
\ No newline at end of file
+    cloud_logger.debug(f"[TRANSCRIBE] Transcription complete. Word count: {len(transcript.split())}")
+    return transcript
@@ -0,0 +1,192 @@
+"""
+Direct-to-bucket upload sessions.
+
+Instead of streaming videos and thumbnails through a web worker, a client asks
+for an upload session, uploads the bytes straight to storage with the URL it
+gets back, and then calls the session's complete endpoint. Completing checks
+that the object arrived with the announced size, returns its URL (the same
+videoUrl / thumbUrl the legacy /upload-video and /upload-thumb routes return)
+and can queue the video for summarization. Sessions live in Redis for
+UPLOAD_SESSION_TTL seconds.
+"""
+import json
+import os
+import time
+import uuid
+from urllib.parse import urljoin
+
+from flask import request, jsonify
+
+import admission
+import metrics
+import webhooks
+from cloud_log import cloud_logger
+from config import UPLOAD_SESSION_TTL, UPLOAD_MAX_BYTES, UPLOAD_CHUNK_SIZE
+from job_processor import enqueue_video_job
+from redis_store import get_redis
+from storage import LocalBucket, create_upload_target, get_bucket
+from summarize import summary_engine
+
+SESSION_KEY_PREFIX = "upload-session:"
+
+# kind -> (object prefix, allowed content type prefix, key of the URL in the result)
+KINDS = {
+    "video": ("videos/", "video/", "videoUrl"),
+    "thumbnail": ("thumbnails/", "image/", "thumbUrl"),
+}
+
+
+def _session_key(session_id):
+    return SESSION_KEY_PREFIX + session_id
+
+
+def _load_session(session_id):
+    raw = get_redis().get(_session_key(session_id))
+    return json.loads(raw) if raw else None
+
+
+def create_session_handler():
+    """
+    Expects JSON with 'kind' ("video" or "thumbnail"), 'filename' (e.g. "<id>.webm"),
+    'contentType' and 'size' in bytes. Returns the session ID and where to upload.
+    """
+    data = request.get_json(silent=True) or {}
+    kind = data.get("kind")
+    if kind not in KINDS:
+        return jsonify({"error": f"kind must be one of {', '.join(KINDS)}"}), 400
+    prefix, type_prefix, _ = KINDS[kind]
+    filename = os.path.basename(str(data.get("filename") or ""))
+    if not filename or filename.startswith("."):
+        return jsonify({"error": "Invalid filename"}), 400
+    content_type = str(data.get("contentType") or "")
+    if not content_type.startswith(type_prefix):
+        return jsonify({"error": f"contentType must be {type_prefix}*"}), 400
+    size = data.get("size")
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return jsonify({"error": "size must be a positive number of bytes"}), 400
+    if size > UPLOAD_MAX_BYTES:
+        return jsonify({"error": f"File is larger than {UPLOAD_MAX_BYTES} bytes"}), 413
+
+    blob = get_bucket().blob(prefix + filename)
+    with metrics.stage("create_upload_session"):
+        target = create_upload_target(
+            blob, content_type, size=size, origin=request.headers.get("Origin"), expires_in=UPLOAD_SESSION_TTL,
+        )
+    # Local upload URLs are relative to this app
+    target["url"] = urljoin(request.host_url, target["url"])
+
+    session_id = str(uuid.uuid4())
+    session = {
+        "id": session_id,
+        "kind": kind,
+        "object": blob.name,
+        "size": size,
+        "state": "pending",
+        "created_at": time.time(),
+    }
+    get_redis().set(_session_key(session_id), json.dumps(session), ex=UPLOAD_SESSION_TTL)
+    metrics.inc("upload_sessions_total", kind=kind, event="created")
+    cloud_logger.info(f"[UPLOAD] Session {session_id} for {blob.name} ({size} bytes)")
+    return jsonify({"session_id": session_id, "upload": target, "expires_in": UPLOAD_SESSION_TTL}), 201
+
+
+def complete_session_handler(session_id):
+    """
+    Register an uploaded object. Optional JSON: 'summarize' (videos only),
+    'id', 'model_name' and 'webhook_url' for the summarization job. Safe to call again;
+    later calls return the first result.
+    """
+    session = _load_session(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired upload session"}), 404
+    if session["state"] == "complete":
+        return jsonify(session["result"]), 200
+
+    data = request.get_json(silent=True) or {}
+    summarize = bool(data.get("summarize"))
+    model_name = data.get("model_name", "gemini")
+    if summarize:
+        if session["kind"] != "video":
+            return jsonify({"error": "Only videos can be summarized"}), 400
+        try:
+            summary_engine(model_name)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        webhook_error = webhooks.validate_url(data.get("webhook_url"))
+        if webhook_error:
+            return jsonify({"error": webhook_error}), 400
+
+    blob = get_bucket().blob(session["object"])
+    if not blob.exists():
+        return jsonify({"error": "Upload has not finished"}), 409
+    blob.reload()
+    if blob.size != session["size"]:
+        return jsonify({"error": f"Uploaded {blob.size} bytes, expected {session['size']}"}), 409
+
+    r = get_redis()
+    # Only the first completion registers the object and queues a job
+    if not r.set(_session_key(session_id) + ":completing", "1", nx=True, ex=UPLOAD_SESSION_TTL):
+        session = _load_session(session_id)
+        if session and session["state"] == "complete":
+            return jsonify(session["result"]), 200
+        return jsonify({"error": "Upload session is being completed"}), 409
+
+    result = {KINDS[session["kind"]][2]: blob.public_url}
+    try:
+        if summarize:
+            video_id = data.get("id") or os.path.splitext(os.path.basename(session["object"]))[0]
+            result["job_id"], result["estimated_wait_seconds"] = enqueue_video_job(
+                blob.public_url, video_id, model_name, admission.client_id(request), size_bytes=blob.size,
+                webhook_url=data.get("webhook_url"), storage_object=blob.name,
+            )
+        session.update(state="complete", result=result)
+        r.set(_session_key(session_id), json.dumps(session), ex=UPLOAD_SESSION_TTL)
+    except Exception as e:
+        # Leave the session open so the client can complete it again (after Retry-After if rejected)
+        r.delete(_session_key(session_id) + ":completing")
+        if isinstance(e, admission.AdmissionRejected):
+            return admission.rejection_response(e)
+        raise
+    metrics.inc("upload_sessions_total", kind=session["kind"], event="completed")
+    cloud_logger.info(f"[UPLOAD] Session {session_id} completed: {result}")
+    return jsonify(result), 200
+
+
+def local_upload_handler(name):
+    """
+    Receive a signed PUT for the local storage backend (GCS uploads go to Google).
+    Like a GCS session limited to the announced size, the body must be exactly
+    the size the URL was signed for; otherwise nothing is stored.
+    """
+    bucket = get_bucket()
+    if not isinstance(bucket, LocalBucket):
+        return jsonify({"error": "Not found"}), 404
+    try:
+        blob, expected = bucket.verify(
+            name, request.args.get("expires"), request.args.get("size"), request.args.get("signature"),
+        )
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    if request.content_length is not None and request.content_length != expected:
+        return jsonify({"error": f"Upload is {request.content_length} bytes, expected {expected}"}), 400
+
+    def chunks():
+        received = 0
+        while received <= expected:
+            chunk = request.stream.read(min(UPLOAD_CHUNK_SIZE, expected + 1 - received))
+            if not chunk:
+                break
+            received += len(chunk)
+            yield chunk
+        if received != expected:
+            raise ValueError(f"Upload is {'more than ' if received > expected else ''}{received} bytes, "
+                             f"expected {expected}")
+
+    try:
+        size = blob.upload_chunks(chunks())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileExistsError:
+        # A GCS session is create-only too (if_generation_match=0)
+        return jsonify({"error": "Object already exists"}), 409
+    return jsonify({"name": blob.name, "size": size}), 200
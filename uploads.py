@@ -0,0 +1,46 @@
+"""
+Streaming upload ingestion.
+
+Request bodies are copied to a spool file in fixed-size chunks and hashed in
+the same pass, so memory use per upload stays bounded and the file never has
+to be read again just to compute its content hash.
+"""
+import hashlib
+
+import metrics
+from config import UPLOAD_CHUNK_SIZE
+
+
+def spool_stream(stream, dest_path, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Copy `stream` to `dest_path`. Returns (sha256 hex digest, bytes written).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest_path, "wb") as out:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    metrics.inc("bytes_processed_total", size, source="upload")
+    return digest.hexdigest(), size
+
+
+def get_upload(request):
+    """
+    Return (stream, filename) for the uploaded media in `request`, or (None, None).
+
+    Accepts either a multipart "file" field or a raw application/octet-stream
+    body (filename taken from the X-Filename header or ?filename=). Raw bodies
+    are read straight from the socket, with no multipart buffering.
+    """
+    if "file" in request.files:
+        file = request.files["file"]
+        return file.stream, file.filename
+    if request.mimetype == "application/octet-stream":
+        filename = request.headers.get("X-Filename") or request.args.get("filename", "upload")
+        return request.stream, filename
+    return None, None
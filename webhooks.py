@@ -0,0 +1,202 @@
+"""
+Completion webhooks for background jobs.
+
+A job submitted with a `webhook_url` gets one POST when it finishes:
+{"job_id", "state": "done", "summary"} or {"job_id", "state": "failed", "error"}.
+Any 2xx answer counts as delivered.
+
+Deliveries wait in the sorted set webhooks:scheduled, scored by when they are
+next due. A webhook thread in worker.py claims a due delivery by pushing its
+score past the request timeout, so a delivery whose worker dies is picked up
+again. A failed delivery is rescheduled with exponential backoff, up to
+WEBHOOK_MAX_ATTEMPTS attempts. Receivers may see a delivery more than once and
+should key on job_id.
+
+A webhook URL may not point at loopback, private, link-local, multicast or
+reserved addresses (cloud metadata endpoints, the Redis next door) unless its
+host is in WEBHOOK_ALLOWED_HOSTS. The host is resolved when the job is
+submitted and again before each delivery, so a DNS record changed in between
+is still caught, and redirects are not followed.
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import random
+import socket
+import time
+from urllib.parse import urlparse
+
+import requests
+
+import job_queue
+import metrics
+from cloud_log import cloud_logger
+from config import (
+    JOB_RESULT_TTL, WEBHOOK_TIMEOUT, WEBHOOK_MAX_ATTEMPTS, WEBHOOK_RETRY_BASE_SECONDS, WEBHOOK_RETRY_MAX_SECONDS,
+    WEBHOOK_SIGNING_KEY, WEBHOOK_ALLOWED_HOSTS,
+)
+from redis_store import get_redis
+
+SCHEDULE_KEY = "webhooks:scheduled"
+# Seconds between checks for due deliveries when none are waiting
+POLL_SECONDS = 1.0
+
+# Take the earliest due delivery and hide it until ARGV[2]. ARGV: now, hidden-until.
+_CLAIM_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 1)
+if #due == 0 then
+    return false
+end
+redis.call('ZADD', KEYS[1], ARGV[2], due[1])
+return due[1]
+"""
+
+
+def _delivery_key(job_id):
+    return f"webhook:{job_id}"
+
+
+def _is_public(address):
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not (ip.is_loopback or ip.is_private or ip.is_link_local or ip.is_multicast
+                                 or ip.is_reserved or ip.is_unspecified)
+
+
+def _check_host(parsed):
+    """
+    Return an error message if the URL's host resolves to a non-public address, else None.
+    """
+    host = (parsed.hostname or "").lower()
+    if host in WEBHOOK_ALLOWED_HOSTS:
+        return None
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        infos = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError, ValueError):
+        return f"webhook_url host {host!r} does not resolve"
+    for info in infos:
+        if not _is_public(info[4][0]):
+            return f"webhook_url host {host!r} resolves to a non-public address"
+    return None
+
+
+def validate_url(url):
+    """
+    Return an error message if `url` is set but cannot be used as a webhook, else None.
+    """
+    if url is None or url == "":
+        return None
+    if not isinstance(url, str):
+        return "webhook_url must be a string"
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return "webhook_url must be an http(s) URL"
+    return _check_host(parsed)
+
+
+def schedule(job_id, url):
+    """
+    Queue a delivery of `job_id`'s outcome to `url`, due now.
+    """
+    pipe = get_redis().pipeline(transaction=True)
+    pipe.hset(_delivery_key(job_id), mapping={"url": url, "attempts": 0})
+    pipe.expire(_delivery_key(job_id), JOB_RESULT_TTL)
+    pipe.zadd(SCHEDULE_KEY, {job_id: time.time()})
+    pipe.execute()
+
+
+def _body(job):
+    body = {"job_id": job["job_id"], "state": job["state"]}
+    if job["state"] == job_queue.STATE_DONE:
+        body["summary"] = job.get("result")
+    else:
+        body["error"] = job.get("error", "")
+    return json.dumps(body)
+
+
+def _post(url, body):
+    headers = {"Content-Type": "application/json"}
+    if WEBHOOK_SIGNING_KEY:
+        digest = hmac.new(WEBHOOK_SIGNING_KEY.encode(), body.encode(), hashlib.sha256).hexdigest()
+        headers["X-Webhook-Signature"] = f"sha256={digest}"
+    response = requests.post(url, data=body.encode(), headers=headers, timeout=WEBHOOK_TIMEOUT,
+                             allow_redirects=False)
+    if not 200 <= response.status_code < 300:
+        raise RuntimeError(f"HTTP {response.status_code}")
+
+
+def _drop(job_id):
+    pipe = get_redis().pipeline(transaction=True)
+    pipe.zrem(SCHEDULE_KEY, job_id)
+    pipe.delete(_delivery_key(job_id))
+    pipe.execute()
+
+
+def _retry_delay(attempts):
+    # Half fixed, half jittered, so retries to one receiver spread out but never fire immediately
+    delay = min(WEBHOOK_RETRY_MAX_SECONDS, WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def deliver(job_id):
+    """
+    Attempt one delivery for `job_id` and reschedule or drop it. Returns the outcome.
+    """
+    r = get_redis()
+    url = r.hget(_delivery_key(job_id), "url")
+    job = job_queue.get_job(job_id)
+    if url is None or job is None:
+        # The job (or its delivery record) expired before it could be sent
+        _drop(job_id)
+        return "expired"
+
+    error = validate_url(url)
+    if error:
+        cloud_logger.error(f"[WEBHOOK] Not delivering job {job_id}: {error}")
+        _drop(job_id)
+        return "blocked"
+
+    attempts = r.hincrby(_delivery_key(job_id), "attempts", 1)
+    try:
+        _post(url, _body(job))
+    except Exception as e:
+        if attempts >= WEBHOOK_MAX_ATTEMPTS:
+            cloud_logger.error(f"[WEBHOOK] Giving up on job {job_id} after {attempts} attempts: {e}")
+            _drop(job_id)
+            return "dropped"
+        delay = _retry_delay(attempts)
+        cloud_logger.warning(f"[WEBHOOK] Delivery for job {job_id} failed (attempt {attempts}), retrying in {delay:.1f}s: {e}")
+        r.zadd(SCHEDULE_KEY, {job_id: time.time() + delay})
+        return "retried"
+    _drop(job_id)
+    cloud_logger.info(f"[WEBHOOK] Delivered job {job_id} to {url}")
+    return "delivered"
+
+
+def claim():
+    """
+    Take the earliest due delivery, or return None if nothing is due.
+    """
+    now = time.time()
+    return get_redis().eval(_CLAIM_SCRIPT, 1, SCHEDULE_KEY, now, now + WEBHOOK_TIMEOUT * 3)
+
+
+def run_delivery_loop(stop_event):
+    """
+    Deliver due webhooks until `stop_event` is set. Runs in worker.py's webhook threads.
+    """
+    while not stop_event.is_set():
+        try:
+            job_id = claim()
+            if job_id is None:
+                stop_event.wait(POLL_SECONDS)
+                continue
+            with metrics.timer("webhook_duration_seconds"):
+                outcome = deliver(job_id)
+            metrics.inc("webhook_deliveries_total", outcome=outcome)
+        except Exception as e:
+            cloud_logger.error(f"[WEBHOOK] Delivery loop error: {e}")
+            stop_event.wait(POLL_SECONDS)
@@ -0,0 +1,127 @@
+"""
+Interchangeable Whisper transcription engines.
+
+Each engine wraps one Whisper implementation behind the same two calls:
+load() and transcribe(audio, on_segment) -> {"text", "segments"}, taking a
+16 kHz mono float32 buffer. WHISPER_ENGINE picks the engine:
+
+- "openai": the reference PyTorch implementation (float32 on CPU).
+- "faster": faster-whisper on CTranslate2, with int8 weights on CPU by default.
+  It is several times faster than the reference at the same model size, so a
+  larger, more accurate model fits the same latency budget.
+"""
+import importlib.util
+
+from config import WHISPER_ENGINE, WHISPER_MODEL_SIZE, WHISPER_DEVICE, WHISPER_COMPUTE_TYPE, WHISPER_CPU_THREADS
+
+
+def _segment(start, end, text):
+    return {"start": start, "end": end, "text": text.strip()}
+
+
+class OpenAIWhisperEngine:
+    name = "openai"
+    module = "whisper"
+    compute_types = ("float32", "float16")
+
+    def __init__(self, model_size, device, compute_type, cpu_threads):
+        if device == "auto":
+            import torch
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        if compute_type == "auto":
+            compute_type = "float16" if device == "cuda" else "float32"
+        if compute_type not in self.compute_types:
+            raise ValueError(f"The openai engine supports {', '.join(self.compute_types)}, not {compute_type}")
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self._model = None
+
+    def describe(self):
+        return {
+            "engine": self.name, "model": self.model_size, "device": self.device,
+            "compute_type": self.compute_type, "cpu_threads": self.cpu_threads,
+        }
+
+    def load(self):
+        import whisper
+        if self.cpu_threads:
+            import torch
+            # Process-wide setting, shared with any other torch model in this process
+            torch.set_num_threads(self.cpu_threads)
+        self._model = whisper.load_model(self.model_size, device=self.device)
+        return self
+
+    def transcribe(self, audio, on_segment=None):
+        result = self._model.transcribe(audio, fp16=self.compute_type == "float16")
+        segments = [_segment(seg["start"], seg["end"], seg["text"]) for seg in result["segments"]]
+        if on_segment:
+            for seg in segments:
+                on_segment(seg)
+        return {"text": result["text"], "segments": segments}
+
+
+class FasterWhisperEngine:
+    name = "faster"
+    module = "faster_whisper"
+
+    def __init__(self, model_size, device, compute_type, cpu_threads):
+        if device == "auto":
+            import ctranslate2
+            device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        if compute_type == "auto":
+            compute_type = "float16" if device == "cuda" else "int8"
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self._model = None
+
+    def describe(self):
+        return {
+            "engine": self.name, "model": self.model_size, "device": self.device,
+            "compute_type": self.compute_type, "cpu_threads": self.cpu_threads,
+        }
+
+    def load(self):
+        from faster_whisper import WhisperModel
+        self._model = WhisperModel(
+            self.model_size, device=self.device, compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads or 0,
+        )
+        return self
+
+    def transcribe(self, audio, on_segment=None):
+        # Greedy decoding, like the openai engine's default
+        raw_segments, _ = self._model.transcribe(audio, beam_size=1)
+        texts = []
+        segments = []
+        # Segments are decoded lazily, so each one is reported as soon as it is ready
+        for raw in raw_segments:
+            texts.append(raw.text)
+            seg = _segment(raw.start, raw.end, raw.text)
+            segments.append(seg)
+            if on_segment:
+                on_segment(seg)
+        return {"text": "".join(texts), "segments": segments}
+
+
+ENGINES = {
+    OpenAIWhisperEngine.name: OpenAIWhisperEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+
+
+def create_engine(name=WHISPER_ENGINE, model_size=WHISPER_MODEL_SIZE, device=WHISPER_DEVICE,
+                  compute_type=WHISPER_COMPUTE_TYPE, cpu_threads=WHISPER_CPU_THREADS):
+    """
+    An unloaded engine; call load() before transcribe().
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown WHISPER_ENGINE {name!r}; expected one of {', '.join(ENGINES)}")
+    return ENGINES[name](model_size, device, compute_type, cpu_threads)
+
+
+def engine_available(name=WHISPER_ENGINE):
+    return name in ENGINES and importlib.util.find_spec(ENGINES[name].module) is not None
@@ -0,0 +1,132 @@
+"""
+Standalone worker entry point for the background job queue.
+
+    python worker.py --whisper-workers 2 --llm-workers 8 --webhook-workers 2
+
+Whisper workers are separate processes (transcription is CPU bound and each
+one loads its own model). LLM workers and the threads delivering completion
+webhooks run in the parent process, since they spend their time waiting on
+the network; summaries from local models (t5-small) go to a pool of
+CPU_SUMMARY_PROCESSES processes instead.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import job_events
+import job_queue
+import metrics
+import transcriber
+import webhooks
+from cloud_log import cloud_logger as logger, setup_cloud_logging
+from config import JOB_VISIBILITY_TIMEOUT, WHISPER_WORKERS, LLM_WORKERS, WEBHOOK_WORKERS, CPU_SUMMARY_PROCESSES
+
+
+def _keep_lease_alive(job, done):
+    # Renew well before the visibility timeout so long transcriptions are not requeued
+    while not done.wait(JOB_VISIBILITY_TIMEOUT / 3):
+        if not job_queue.extend_lease(job):
+            logger.warning(f"[WORKER] Lost lease on job {job['job_id']}")
+            return
+
+
+def run_worker_loop(queue, stop_event):
+    import job_processor
+    handler = job_processor.STAGE_HANDLERS[queue]
+    while not stop_event.is_set():
+        job_queue.reap_expired(queue)
+        job = job_queue.claim(queue)
+        if job is None:
+            continue
+        done = threading.Event()
+        threading.Thread(target=_keep_lease_alive, args=(job, done), daemon=True).start()
+        outcome = "ok"
+        start = time.perf_counter()
+        try:
+            with metrics.timer("job_duration_seconds", queue=queue):
+                handler(job)
+            # Feeds the wait estimates admission.py returns to clients
+            job_queue.record_duration(queue, time.perf_counter() - start)
+        except Exception as e:
+            outcome = "error"
+            logger.error(f"[WORKER] {queue} job {job['job_id']} failed: {e}")
+            if job_queue.fail(job, str(e)):
+                job_events.publish(job["job_id"], job_events.EVENT_FAILED, {"error": str(e)})
+        finally:
+            done.set()
+            metrics.inc("jobs_total", queue=queue, outcome=outcome)
+
+
+def _whisper_process_main(threads_per_worker):
+    setup_cloud_logging()
+    metrics.start_flusher()
+    import model_registry
+    import transcriber
+    # Parallel transcription in this process stays within the same share of the cores
+    transcriber.set_cpu_budget(threads_per_worker)
+    # Load the engine, limited to this process's share of the cores, while the worker waits for its first job
+    threading.Thread(target=model_registry.get_whisper_engine, args=(threads_per_worker,), daemon=True).start()
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    run_worker_loop(job_queue.QUEUE_WHISPER, stop_event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background Whisper and LLM workers.")
+    parser.add_argument("--whisper-workers", type=int, default=WHISPER_WORKERS)
+    parser.add_argument("--llm-workers", type=int, default=LLM_WORKERS)
+    parser.add_argument("--webhook-workers", type=int, default=WEBHOOK_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    setup_cloud_logging()
+    metrics.start_flusher()
+    # Split the cores between the Whisper processes and the local summary pool so they
+    # do not oversubscribe the CPU
+    cores = os.cpu_count() or 1
+    threads_per_worker = max(1, cores // max(1, args.whisper_workers + CPU_SUMMARY_PROCESSES))
+    # job_processor's summary pool divides what the Whisper processes leave
+    transcriber.set_cpu_budget(max(1, cores - threads_per_worker * args.whisper_workers))
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = []
+    for _ in range(args.whisper_workers):
+        p = ctx.Process(target=_whisper_process_main, args=(threads_per_worker,))
+        p.start()
+        processes.append(p)
+
+    stop_event = threading.Event()
+    threads = []
+    for _ in range(args.llm_workers):
+        t = threading.Thread(target=run_worker_loop, args=(job_queue.QUEUE_LLM, stop_event))
+        t.start()
+        threads.append(t)
+    for _ in range(args.webhook_workers):
+        t = threading.Thread(target=webhooks.run_delivery_loop, args=(stop_event,))
+        t.start()
+        threads.append(t)
+
+    def shutdown(*_):
+        stop_event.set()
+        for p in processes:
+            p.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    logger.info(
+        f"[WORKER] Started {args.whisper_workers} Whisper, {args.llm_workers} LLM and "
+        f"{args.webhook_workers} webhook workers"
+    )
+
+    for t in threads:
+        t.join()
+    for p in processes:
+        p.join()
+
+
+if __name__ == "__main__":
+    main()
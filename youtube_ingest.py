@@ -0,0 +1,121 @@
+"""
+YouTube-to-storage ingest behind /download-youtube-and-submit.
+
+A video is stored once as videos/<video_id>.mp4 and its metadata is cached
+by video ID, so repeat submissions return without touching YouTube. When the
+video is not stored yet, one request (across all workers, via singleflight)
+resolves the stream URLs with yt-dlp and has ffmpeg mux the first
+INGEST_MAX_SECONDS into a fragmented MP4 on a pipe. The pipe feeds a chunked,
+resumable upload, so the upload runs while the download is still in progress
+and no temp file is written.
+"""
+import json
+import subprocess
+import threading
+
+import metrics
+from audio_io import ffmpeg_header_args
+from cache import get_cache, video_metadata_key
+from cloud_log import cloud_logger
+from config import INGEST_FORMAT, INGEST_MAX_SECONDS
+from singleflight import compute_once
+from storage import get_bucket, upload_chunks
+from structured_output import dumps
+
+PIPE_CHUNK_SIZE = 1024 * 1024
+
+
+def video_blob_name(video_id):
+    return f"videos/{video_id}.mp4"
+
+
+def _metadata(video_id, video_url):
+    return {
+        "id": video_id,
+        "title": f"YouTube_{video_id}",
+        "thumbnailUrl": f"https://img.youtube.com/vi/{video_id}/0.jpg",
+        "videoUrl": video_url,
+    }
+
+
+def resolve_streams(url, cookiefile=None):
+    """
+    Media URLs and HTTP headers of the INGEST_FORMAT selection (one progressive
+    stream, or separate video and audio streams), without downloading.
+    """
+    import yt_dlp
+
+    opts = {"quiet": True, "format": INGEST_FORMAT, "noplaylist": True}
+    if cookiefile:
+        opts["cookiefile"] = cookiefile
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    return [(f["url"], f.get("http_headers") or {}) for f in info.get("requested_formats") or [info]]
+
+
+def _fragmented_mp4_chunks(streams):
+    """
+    Yield the muxed fragmented MP4 from ffmpeg's stdout as it is produced.
+    Raises RuntimeError at the end if ffmpeg failed, so a broken video is never committed.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+    for media_url, headers in streams:
+        cmd += [*ffmpeg_header_args(headers), "-i", media_url]
+    if len(streams) > 1:
+        cmd += ["-map", "0:v:0", "-map", "1:a:0"]
+    cmd += [
+        "-t", str(INGEST_MAX_SECONDS), "-c", "copy",
+        # Fragmented MP4 needs no seek back to write the index, so it can go to a pipe
+        "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+        "-f", "mp4", "pipe:1",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = []
+    err_reader = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+    err_reader.start()
+    try:
+        for chunk in iter(lambda: proc.stdout.read(PIPE_CHUNK_SIZE), b""):
+            yield chunk
+        proc.wait()
+        err_reader.join()
+        if proc.returncode != 0:
+            message = b"".join(stderr).decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg failed to mux the video: {message}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def _ingest(url, video_id, cookiefile):
+    blob = get_bucket().blob(video_blob_name(video_id))
+    if blob.exists():
+        cloud_logger.info(f"[INGEST] {video_id} already stored")
+        metrics.inc("ingest_total", result="exists")
+        return _metadata(video_id, blob.public_url)
+
+    with metrics.stage("ytdlp_resolve"):
+        streams = resolve_streams(url, cookiefile)
+    chunks = _fragmented_mp4_chunks(streams)
+    try:
+        with metrics.stage("ingest_upload"):
+            size = upload_chunks(blob, chunks, content_type="video/mp4")
+    finally:
+        chunks.close()
+    cloud_logger.info(f"[INGEST] Stored {video_id} ({size} bytes)")
+    metrics.inc("bytes_processed_total", size, source="ytdlp")
+    metrics.inc("ingest_total", result="uploaded")
+    return _metadata(video_id, blob.public_url)
+
+
+def ingest_video(url, video_id, cookiefile=None):
+    """
+    Make sure the first INGEST_MAX_SECONDS of `video_id` are stored and return
+    its metadata ({"id", "title", "thumbnailUrl", "videoUrl"}).
+    """
+    key = video_metadata_key(video_id)
+    cached = get_cache().get(key)
+    if cached is not None:
+        metrics.inc("ingest_total", result="cached")
+        return json.loads(cached)
+    return json.loads(compute_once(key, lambda: dumps(_ingest(url, video_id, cookiefile))))